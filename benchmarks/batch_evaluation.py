@@ -0,0 +1,53 @@
+import argparse
+import time
+from problems.fjs import FlexibleJobSchedulingProblem
+from problems.fjs_solution import FjsSolution
+
+
+def time_per_call(function, repeats: int) -> float:
+    start_time = time.perf_counter()
+    for _ in range(repeats):
+        function()
+    return (time.perf_counter() - start_time) / repeats
+
+
+def __main__():
+    arg_parser = argparse.ArgumentParser(
+        description='Compare scalar evaluate_solution against evaluate_batch on sets of random neighbors',
+        epilog='Example: python -m benchmarks.batch_evaluation data/input_0.txt'
+    )
+    arg_parser.add_argument('path_to_input_file',
+                            help='Path to the input file, refer to README.md for input format')
+    arg_parser.add_argument('--neighbor_counts', '-k',
+                            default=[10, 100, 500],
+                            type=int,
+                            nargs='+',
+                            help='Neighbor set sizes to benchmark. Defaults to 10 100 500')
+    arg_parser.add_argument('--repeats', '-r',
+                            default=20,
+                            type=int,
+                            help='How many times each measurement is repeated. Defaults to 20')
+    args = vars(arg_parser.parse_args())
+
+    # no evaluation cache, repeats would only measure lookups
+    fjs = FlexibleJobSchedulingProblem(args['path_to_input_file'], evaluation_cache_size=0)
+    current_solution = fjs.get_random_solution()
+    print(f'{fjs.input_file}: {fjs.number_of_jobs} jobs, {fjs.number_of_machines} machines, {fjs.number_of_ops} ops')
+    print(f'{"neighbors":>10} {"scalar (ms)":>12} {"batch (ms)":>12} {"speedup":>8}')
+
+    for neighbor_count in args['neighbor_counts']:
+        neighbors = [fjs.get_random_neighbor_solution(current_solution) for _ in range(neighbor_count)]
+        scalar_makespans = [fjs.evaluate_solution(neighbor) for neighbor in neighbors]
+        batch_makespans = fjs.evaluate_batch(FjsSolution.stack(neighbors)).tolist()
+        assert scalar_makespans == batch_makespans, 'batch and scalar evaluators disagree'
+
+        scalar_time = time_per_call(lambda: [fjs.evaluate_solution(neighbor) for neighbor in neighbors],
+                                    args['repeats'])
+        # stacking is part of the cost the search loop actually pays
+        batch_time = time_per_call(lambda: fjs.evaluate_batch(FjsSolution.stack(neighbors)), args['repeats'])
+        print(f'{neighbor_count:>10} {scalar_time * 1000:>12.3f} {batch_time * 1000:>12.3f} '
+              f'{scalar_time / batch_time:>7.1f}x')
+
+
+if __name__ == '__main__':
+    __main__()
@@ -0,0 +1,227 @@
+import argparse
+import csv
+import itertools
+import json
+import multiprocessing
+import os
+import resource
+import time
+from problems.fjs import FlexibleJobSchedulingProblem
+from metaheuristics.tabu_search import TabuSearch, TabuSearchRun
+from metaheuristics.neighborhood_sizing import NeighborhoodSizeController
+
+RESULT_COLUMNS = ['instance', 'seed', 'tabu_size', 'number_of_neighbors', 'stuck_reset_threshold',
+                  'best_makespan', 'time_to_best', 'completed_iterations', 'elapsed', 'evaluations_per_second',
+                  'peak_rss_mb']
+MICRO_COLUMNS = ['instance', 'function', 'calls', 'elapsed', 'calls_per_second', 'microseconds_per_call']
+
+
+def list_instances(path: str) -> list[str]:
+    if os.path.isfile(path):
+        return [path]
+    return sorted(os.path.join(path, filename) for filename in os.listdir(path)
+                  if filename.endswith(('.txt', '.fjs')))
+
+
+def get_peak_rss_mb() -> float:
+    # ru_maxrss is KB on linux, bytes on macOS
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak_rss / (1024 * 1024 if os.uname().sysname == 'Darwin' else 1024)
+
+
+def run_configuration(configuration: dict) -> dict:
+    """
+    One cell of the matrix, a full tabu search run driven iteration by iteration so the time the best makespan was
+    first reached can be recorded
+
+    :param configuration: One row of the matrix, see build_matrix.
+    :return: The same dict with the RESULT_COLUMNS measurements filled in.
+    """
+    fjs = FlexibleJobSchedulingProblem(configuration['instance'])
+    timeout_duration = configuration['timeout_duration']
+    # -1 is the adaptive size, like in main.py
+    neighborhood_sizer = None
+    if configuration['number_of_neighbors'] == -1:
+        neighborhood_sizer = NeighborhoodSizeController()
+        neighborhood_sizer.set_budget(time.time() + timeout_duration if timeout_duration >= 0 else None,
+                                      configuration['number_of_iterations'])
+        number_of_neighbors = neighborhood_sizer.min_size
+    else:
+        number_of_neighbors = TabuSearch.resolve_number_of_neighbors(fjs, configuration['number_of_neighbors'],
+                                                                     configuration['number_of_iterations'])
+    start_time = time.perf_counter()
+    search = TabuSearchRun(fjs, configuration['tabu_size'], configuration['stuck_reset_threshold'],
+                           number_of_neighbors, configuration['evaluator'], seed=configuration['seed'],
+                           neighborhood=configuration['neighborhood'], neighborhood_sizer=neighborhood_sizer)
+    best_makespan = search.best_makespan
+    time_to_best = time.perf_counter() - start_time
+    for _ in range(configuration['number_of_iterations']):
+        if 0 <= timeout_duration <= time.perf_counter() - start_time:
+            break
+        search.iterate()
+        if search.best_makespan < best_makespan:
+            best_makespan = search.best_makespan
+            time_to_best = time.perf_counter() - start_time
+    elapsed = time.perf_counter() - start_time
+    search.close()
+
+    result = {column: configuration[column] for column in RESULT_COLUMNS if column in configuration}
+    result.update({'instance': os.path.basename(configuration['instance']),
+                   'number_of_neighbors': number_of_neighbors if neighborhood_sizer is None else 'adaptive',
+                   'best_makespan': best_makespan,
+                   'time_to_best': round(time_to_best, 4),
+                   'completed_iterations': search.completed_iterations,
+                   'elapsed': round(elapsed, 4),
+                   # every evaluated neighbor goes through the archive
+                   'evaluations_per_second': round(search.archive.total_added / elapsed, 1),
+                   'peak_rss_mb': round(get_peak_rss_mb(), 1)})
+    return result
+
+
+def build_matrix(args: dict) -> list[dict]:
+    matrix = []
+    for instance, seed, tabu_size, number_of_neighbors, stuck_reset_threshold in itertools.product(
+            list_instances(args['path_to_instances']), args['seeds'], args['tabu_sizes'],
+            args['neighbor_counts'], args['stuck_reset_thresholds']):
+        matrix.append({'instance': instance, 'seed': seed, 'tabu_size': tabu_size,
+                       'number_of_neighbors': number_of_neighbors, 'stuck_reset_threshold': stuck_reset_threshold,
+                       'number_of_iterations': args['number_of_iterations'],
+                       'timeout_duration': args['timeout_duration'], 'evaluator': args['evaluator'],
+                       'neighborhood': args['neighborhood']})
+    return matrix
+
+
+def time_function(function, duration: float) -> tuple[int, float]:
+    calls = 0
+    start_time = time.perf_counter()
+    elapsed = 0.0
+    # check the clock every 64 calls so timing overhead stays out of the measurement
+    while elapsed < duration:
+        for _ in range(64):
+            function()
+        calls += 64
+        elapsed = time.perf_counter() - start_time
+    return calls, elapsed
+
+
+def run_micro(instance: str, duration: float, seed: int) -> list[dict]:
+    # no evaluation cache, it would turn every repeated evaluate_solution call into a lookup
+    fjs = FlexibleJobSchedulingProblem(instance, seed=seed, evaluation_cache_size=0)
+    current_solution = fjs.get_random_solution()
+    functions = {'evaluate_solution': lambda: fjs.evaluate_solution(current_solution),
+                 'get_random_neighbor_solution': lambda: fjs.get_random_neighbor_solution(current_solution),
+                 'get_random_solution': fjs.get_random_solution}
+    results = []
+    for function_name, function in functions.items():
+        calls, elapsed = time_function(function, duration)
+        results.append({'instance': os.path.basename(instance), 'function': function_name, 'calls': calls,
+                        'elapsed': round(elapsed, 4), 'calls_per_second': round(calls / elapsed, 1),
+                        'microseconds_per_call': round(elapsed / calls * 1e6, 3)})
+    return results
+
+
+def write_results(results: list[dict], columns: list[str], path: str):
+    if path.endswith('.csv'):
+        with open(path, 'wt', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=columns)
+            writer.writeheader()
+            writer.writerows(results)
+    else:
+        with open(path, 'wt') as f:
+            json.dump(results, f, indent=2)
+
+
+def print_results(results: list[dict], columns: list[str]):
+    widths = [max(len(column), *(len(str(result[column])) for result in results)) for column in columns]
+    print(' '.join(column.rjust(width) for column, width in zip(columns, widths)))
+    for result in results:
+        print(' '.join(str(result[column]).rjust(width) for column, width in zip(columns, widths)))
+
+
+def __main__():
+    arg_parser = argparse.ArgumentParser(
+        description='Run tabu search over every instance in a directory for a grid of seeds and parameters, or ' +
+                    'micro-benchmark the problem primitives alone',
+        epilog='Example: python -m benchmarks.bench data/ 1000 --seeds 0 1 2 -t 10 20 -n 50 100 -p 4 -r results.csv'
+    )
+    arg_parser.add_argument('path_to_instances',
+                            help='Directory of .txt/.fjs instances, or a single instance file')
+    arg_parser.add_argument('number_of_iterations',
+                            type=int,
+                            nargs='?',
+                            default=1000,
+                            help='Iterations per run. Defaults to 1000')
+    arg_parser.add_argument('--seeds',
+                            default=[0],
+                            type=int,
+                            nargs='+',
+                            help='Seeds to run every configuration with. Defaults to 0')
+    arg_parser.add_argument('--tabu_sizes', '-t',
+                            default=[10],
+                            type=int,
+                            nargs='+',
+                            help='tabu_size values to try. Defaults to 10')
+    arg_parser.add_argument('--neighbor_counts', '-n',
+                            default=[-1],
+                            type=int,
+                            nargs='+',
+                            help='number_of_neighbors values to try, same meaning as in main.py (-1 is the adaptive ' +
+                            'size). Defaults to -1')
+    arg_parser.add_argument('--stuck_reset_thresholds', '-s',
+                            default=[5],
+                            type=int,
+                            nargs='+',
+                            help='stuck_reset_threshold values to try. Defaults to 5')
+    arg_parser.add_argument('--timeout_duration', '-o',
+                            default=-1,
+                            type=float,
+                            help='Per-run time budget in seconds, -1 for none. Defaults to -1')
+    arg_parser.add_argument('--evaluator', '-e',
+                            default='batch',
+                            choices=['batch', 'delta'],
+                            help='Neighbor evaluator, see main.py. Defaults to batch')
+    arg_parser.add_argument('--neighborhood',
+                            default='random',
+                            choices=['random', 'critical'],
+                            help='Neighborhood, see main.py. Defaults to random')
+    arg_parser.add_argument('--processes', '-p',
+                            default=0,
+                            type=int,
+                            help='Run configurations in a pool of this many processes, each run gets a fresh ' +
+                            'process so peak RSS is per run. 0 runs them one after another in this process, where ' +
+                            'peak RSS is the peak so far. Defaults to 0')
+    arg_parser.add_argument('--results', '-r',
+                            default=None,
+                            help='Write the results table to this path, .csv for CSV, anything else for JSON')
+    arg_parser.add_argument('--micro',
+                            action='store_true',
+                            help='Only time evaluate_solution, get_random_neighbor_solution and get_random_solution ' +
+                            'per instance instead of running searches')
+    arg_parser.add_argument('--micro_duration',
+                            default=1.0,
+                            type=float,
+                            help='Seconds to time each function for in --micro mode. Defaults to 1.0')
+    args = vars(arg_parser.parse_args())
+
+    if args['micro']:
+        columns = MICRO_COLUMNS
+        results = []
+        for instance in list_instances(args['path_to_instances']):
+            results += run_micro(instance, args['micro_duration'], args['seeds'][0])
+    else:
+        columns = RESULT_COLUMNS
+        matrix = build_matrix(args)
+        if args['processes'] > 0:
+            with multiprocessing.Pool(args['processes'], maxtasksperchild=1) as pool:
+                results = pool.map(run_configuration, matrix, chunksize=1)
+        else:
+            results = [run_configuration(configuration) for configuration in matrix]
+
+    print_results(results, columns)
+    if args['results'] is not None:
+        write_results(results, columns, args['results'])
+        print(f'Results saved to {args["results"]}')
+
+
+if __name__ == '__main__':
+    __main__()
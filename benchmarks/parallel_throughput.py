@@ -0,0 +1,52 @@
+import argparse
+import time
+from problems.fjs import FlexibleJobSchedulingProblem
+from metaheuristics.parallel_neighborhood import ParallelNeighborhood
+
+
+def __main__():
+    arg_parser = argparse.ArgumentParser(
+        description='Measure neighbor generation + evaluation throughput of ParallelNeighborhood per worker count',
+        epilog='Example: python -m benchmarks.parallel_throughput data/input_0.txt -w 1 2 4 8 16'
+    )
+    arg_parser.add_argument('path_to_input_file',
+                            help='Path to the input file, refer to README.md for input format')
+    arg_parser.add_argument('--worker_counts', '-w',
+                            default=[1, 2, 4, 8, 16],
+                            type=int,
+                            nargs='+',
+                            help='Worker counts to benchmark. Defaults to 1 2 4 8 16')
+    arg_parser.add_argument('--number_of_neighbors', '-n',
+                            default=500,
+                            type=int,
+                            help='Neighbors generated per iteration. Defaults to 500')
+    arg_parser.add_argument('--duration', '-d',
+                            default=5.0,
+                            type=float,
+                            help='Seconds to measure each worker count for. Defaults to 5.0')
+    args = vars(arg_parser.parse_args())
+
+    # no evaluation cache, neighbors of one fixed solution would mostly measure cache hits
+    fjs = FlexibleJobSchedulingProblem(args['path_to_input_file'], seed=0, evaluation_cache_size=0)
+    current_solution = fjs.get_random_solution()
+    print(f'{fjs.input_file}: {fjs.number_of_jobs} jobs, {fjs.number_of_machines} machines, {fjs.number_of_ops} ops')
+    print(f'{"workers":>8} {"evals/s":>12}')
+
+    for worker_count in args['worker_counts']:
+        parallel_neighborhood = ParallelNeighborhood(fjs, worker_count)
+        # warm up so pool start-up isn't counted
+        parallel_neighborhood.generate(current_solution, 0, args['number_of_neighbors'])
+        number_of_evaluations = 0
+        iteration = 1
+        start_time = time.perf_counter()
+        while time.perf_counter() - start_time < args['duration']:
+            number_of_evaluations += len(parallel_neighborhood.generate(current_solution, iteration,
+                                                                        args['number_of_neighbors']))
+            iteration += 1
+        elapsed = time.perf_counter() - start_time
+        parallel_neighborhood.close()
+        print(f'{worker_count:>8} {number_of_evaluations / elapsed:>12.0f}')
+
+
+if __name__ == '__main__':
+    __main__()
@@ -1,5 +1,9 @@
 from problems.fjs import FlexibleJobSchedulingProblem
 from metaheuristics.tabu_search import TabuSearch
+from metaheuristics.island_model import IslandModel
+from metaheuristics.genetic_algorithm import GeneticAlgorithm
+from metaheuristics.run_log import MarkdownLogSink, JsonlLogSink
+from metaheuristics.solution_archive import SolutionArchive
 import datetime
 import os
 import argparse
@@ -15,18 +19,50 @@ def __main__():
                             help='Path to the input file, refer to README.md for input format')
     arg_parser.add_argument('number_of_iterations',
                             type=int,
-                            help='Number of iterations the tabu search should run for')
+                            help='Number of iterations the tabu search should run for, generations with ' +
+                            '--engine genetic')
+    arg_parser.add_argument('--engine',
+                            default='tabu',
+                            choices=['tabu', 'genetic'],
+                            help='tabu runs tabu search, genetic a genetic algorithm over a population (memetic with ' +
+                            '--local_search_iterations), both share the stop conditions, logs and schedule export. ' +
+                            'Defaults to tabu')
+    arg_parser.add_argument('--population_size',
+                            default=100,
+                            type=int,
+                            help='Solutions per generation with --engine genetic. Defaults to 100')
+    arg_parser.add_argument('--crossover_rate',
+                            default=0.9,
+                            type=float,
+                            help='Chance a pair of parents is recombined with --engine genetic. Defaults to 0.9')
+    arg_parser.add_argument('--mutation_rate',
+                            default=0.3,
+                            type=float,
+                            help='Chance a child gets a random move with --engine genetic. Defaults to 0.3')
+    arg_parser.add_argument('--local_search_iterations',
+                            default=0,
+                            type=int,
+                            help='With --engine genetic, improve the best child of every generation with a tabu ' +
+                            'search this long (using --tabu_size, --stuck_reset_threshold and ' +
+                            '--number_of_neighbors). ' +
+                            'Defaults to 0 (off)')
     arg_parser.add_argument('--number_of_neighbors', '-n',
                             default=100,
                             type=int,
                             help='The number of neighbors to generate each iteration. ' +
-                            'Defaults to 100. If -1 the program will infer from the given input, result ' +
-                            '= (!num_of_ops * (num_of_ops ** num_of_machines)) / 100, clamped between 50 and 500')
+                            'Defaults to 100. If -1 the size adapts every iteration, small while the search keeps ' +
+                            'improving, larger on plateaus, and capped so a timeout still fits enough iterations. ' +
+                            'Island runs infer a fixed size from the input instead')
     arg_parser.add_argument('--tabu_size', '-t',
                             default=500,
                             type=int,
                             help='The size of the tabu list, automatically removing older entries if exceeding. ' +
                             'Defaults to 500')
+    arg_parser.add_argument('--tabu_tenure',
+                            default=0,
+                            type=int,
+                            help='If > 0, moving an op back to a position or machine it just left is tabu for this ' +
+                            'many iterations unless it beats the best makespan so far. Defaults to 0 (off)')
     arg_parser.add_argument('--stuck_reset_threshold', '-s',
                             default=10,
                             type=int,
@@ -38,31 +74,223 @@ def __main__():
                             help='The search will automatically stop after this much time has passed. ' +
                             'Defaults to 15.0 seconds')
 
+    arg_parser.add_argument('--neighborhood',
+                            default='random',
+                            choices=['random', 'critical'],
+                            help='random relocates a random op to a random feasible slot, critical only tries ' +
+                            'swaps/insertions on critical blocks and machine reassignment of critical ops. ' +
+                            'Defaults to random')
+    arg_parser.add_argument('--init',
+                            default='random',
+                            choices=['random', 'spt', 'mwkr', 'least_loaded', 'grasp'],
+                            help='How the starting solution is built: random, or a greedy dispatching rule, spt ' +
+                            '(shortest op first), mwkr (most work remaining), least_loaded (least loaded machine) or ' +
+                            'grasp (randomized greedy). Defaults to random')
+    arg_parser.add_argument('--init_candidates',
+                            default=1,
+                            type=int,
+                            help='For random and grasp, build this many starting solutions and start from the best. ' +
+                            'Defaults to 1')
+    arg_parser.add_argument('--evaluator', '-e',
+                            default='batch',
+                            choices=['batch', 'delta'],
+                            help='How neighbors are scored: batch evaluates all neighbors of an iteration in one ' +
+                            'NumPy pass, delta replays only the part of the current solution a move touched. ' +
+                            'Defaults to batch')
+    arg_parser.add_argument('--workers', '-w',
+                            default=0,
+                            type=int,
+                            help='Generate and evaluate neighbors in this many worker processes, results for a ' +
+                            'given seed are the same for any worker count > 0, 0 draws neighbors differently and ' +
+                            'follows another trajectory. Workers evaluate in batches, so not with --evaluator delta. ' +
+                            'Defaults to 0 (single-threaded)')
+    arg_parser.add_argument('--seed',
+                            default=None,
+                            type=int,
+                            help='Seed for the search\'s random number generator. Defaults to none')
+    arg_parser.add_argument('--islands', '-i',
+                            default=1,
+                            type=int,
+                            help='Run this many independent tabu searches in separate processes, exchanging their ' +
+                            'best solutions every --migration_interval iterations. Defaults to 1 (no islands)')
+    arg_parser.add_argument('--migration_interval', '-m',
+                            default=50,
+                            type=int,
+                            help='Iterations between migrations when running islands. Defaults to 50')
+    arg_parser.add_argument('--island_tabu_sizes',
+                            default=None,
+                            type=int,
+                            nargs='+',
+                            help='One tabu size per island, overrides --tabu_size when running islands')
+    arg_parser.add_argument('--island_neighbor_counts',
+                            default=None,
+                            type=int,
+                            nargs='+',
+                            help='One neighbor count per island, overrides --number_of_neighbors when running islands')
+    arg_parser.add_argument('--log_format',
+                            default='markdown',
+                            choices=['markdown', 'jsonl'],
+                            help='Format of the log streamed to logs/ while the search runs. Defaults to markdown')
+    arg_parser.add_argument('--log_interval',
+                            default=1,
+                            type=int,
+                            help='Log every Nth iteration (migration epoch with --islands), 0 only logs the summary. ' +
+                            'Defaults to 1 (every iteration)')
+    arg_parser.add_argument('--archive_elite_size',
+                            default=100,
+                            type=int,
+                            help='Number of best distinct solutions the archive keeps exactly, also the most best ' +
+                            'makespan solutions shown at the end. Defaults to 100')
+    arg_parser.add_argument('--archive_max_buckets',
+                            default=256,
+                            type=int,
+                            help='Upper bound on makespan histogram buckets in the archive, each costs ~1KB. ' +
+                            'Defaults to 256')
+    arg_parser.add_argument('--instrument',
+                            action='store_true',
+                            help='Time each phase of every iteration, show evaluations per second and tabu hit ' +
+                            'rate on the progress bar and add a per-phase breakdown to the log summary')
+    arg_parser.add_argument('--evaluation_cache_size',
+                            default=65536,
+                            type=int,
+                            help='Number of makespans kept by canonical schedule key so revisited schedules aren\'t ' +
+                            'decoded again, 0 disables the cache. Defaults to 65536')
+    arg_parser.add_argument('--checkpoint',
+                            default=None,
+                            help='Save the whole search state to this path every --checkpoint_interval seconds and ' +
+                            'at the end, so a killed run can be picked up with --resume')
+    arg_parser.add_argument('--checkpoint_interval',
+                            default=300.0,
+                            type=float,
+                            help='Seconds between checkpoints. Defaults to 300')
+    arg_parser.add_argument('--resume',
+                            action='store_true',
+                            help='Continue the run saved in --checkpoint, search parameters come from the checkpoint')
+    arg_parser.add_argument('--target_makespan',
+                            default=None,
+                            type=int,
+                            help='Stop as soon as a solution this good or better is found')
+    arg_parser.add_argument('--stall_timeout',
+                            default=-1,
+                            type=float,
+                            help='Stop if the best makespan hasn\'t improved for this many seconds, -1 to never. ' +
+                            'Defaults to -1')
+    arg_parser.add_argument('--max_evaluations',
+                            default=-1,
+                            type=int,
+                            help='Stop after evaluating this many neighbors in total, -1 for no limit. Defaults to -1')
+    arg_parser.add_argument('--export_schedule',
+                            default=None,
+                            help='Also write the best schedule as (job, op, machine, start, end) intervals to this ' +
+                            'path, .csv for CSV, anything else for JSON')
+
     args = vars(arg_parser.parse_args())
+    if args['resume'] and args['checkpoint'] is None:
+        arg_parser.error('--resume needs --checkpoint')
+    if args['islands'] > 1 and (args['checkpoint'] is not None or args['resume']):
+        arg_parser.error('--islands doesn\'t support --checkpoint or --resume')
+    if args['workers'] > 0 and args['evaluator'] == 'delta':
+        arg_parser.error('--workers evaluates neighbors in batches, it doesn\'t support --evaluator delta')
+    if args['islands'] > 1 and (args['workers'] > 0 or args['instrument']):
+        arg_parser.error('--islands doesn\'t support --workers or --instrument, every island is already a process')
+    if args['engine'] == 'genetic' and (args['islands'] > 1 or args['checkpoint'] is not None or args['resume'] or
+                                        args['workers'] > 0 or args['instrument'] or args['evaluator'] != 'batch' or
+                                        args['neighborhood'] != 'random' or args['tabu_tenure'] != 0):
+        arg_parser.error('--engine genetic doesn\'t support --islands, --checkpoint, --resume, --workers, ' +
+                         '--instrument, --evaluator, --neighborhood or --tabu_tenure')
+
+    flexible_job_scheduling_problem = FlexibleJobSchedulingProblem(args['path_to_input_file'],
+                                                                   evaluation_cache_size=args['evaluation_cache_size'])
 
-    flexible_job_scheduling_problem = FlexibleJobSchedulingProblem(args['path_to_input_file'])
+    filename = ('log_' +
+                str(datetime.datetime.now()).replace(':', '_').replace(' ', '_') +
+                ('.jsonl' if args['log_format'] == 'jsonl' else '.txt'))
+    logs_path = os.path.join(os.path.dirname(__file__), 'logs')
+    os.makedirs(logs_path, exist_ok=True)
+    final_filepath = os.path.join(logs_path, filename)
 
-    best_makespan, best_visualized_solutions, log = (
-        TabuSearch.run_fjs(flexible_job_scheduling_problem,
-                           args['number_of_iterations'],
-                           args['tabu_size'],
-                           args['stuck_reset_threshold'],
-                           args['number_of_neighbors'],
-                           args['timeout_duration']))
+    log_sink_type = JsonlLogSink if args['log_format'] == 'jsonl' else MarkdownLogSink
+    if args['islands'] > 1:
+        best_makespan, best_visualized_solutions, island_stats, log = (
+            IslandModel.run_fjs(flexible_job_scheduling_problem,
+                                args['islands'],
+                                args['migration_interval'],
+                                args['number_of_iterations'],
+                                args['island_tabu_sizes'] or args['tabu_size'],
+                                args['stuck_reset_threshold'],
+                                args['island_neighbor_counts'] or args['number_of_neighbors'],
+                                args['timeout_duration'],
+                                args['seed'],
+                                args['export_schedule'],
+                                args['init'],
+                                args['init_candidates'],
+                                args['target_makespan'],
+                                args['stall_timeout'],
+                                args['max_evaluations'],
+                                args['evaluator'],
+                                args['tabu_tenure'],
+                                args['neighborhood'],
+                                log_sink_type(final_filepath, args['log_interval'], 'Island tabu search'),
+                                args['archive_elite_size']))
+        for stats in island_stats:
+            print(f'Island {stats["island"]}: best makespan {stats["best_makespan"]} after ' +
+                  f'{stats["completed_iterations"]} iterations, {stats["accepted_migrations"]} accepted migrants')
+    elif args['engine'] == 'genetic':
+        best_makespan, best_visualized_solutions, log, _ = (
+            GeneticAlgorithm.run_fjs(flexible_job_scheduling_problem,
+                                     args['number_of_iterations'],
+                                     args['population_size'],
+                                     args['timeout_duration'],
+                                     args['seed'],
+                                     log_sink_type(final_filepath, args['log_interval'], 'Genetic algorithm'),
+                                     SolutionArchive(args['archive_elite_size'], args['archive_max_buckets']),
+                                     crossover_rate=args['crossover_rate'],
+                                     mutation_rate=args['mutation_rate'],
+                                     local_search_iterations=args['local_search_iterations'],
+                                     tabu_size=args['tabu_size'],
+                                     reset_threshold=args['stuck_reset_threshold'],
+                                     number_of_neighbors=args['number_of_neighbors'],
+                                     schedule_export_path=args['export_schedule'],
+                                     target_makespan=args['target_makespan'],
+                                     stall_timeout=args['stall_timeout'],
+                                     max_evaluations=args['max_evaluations'],
+                                     initializer=args['init'],
+                                     number_of_initial_candidates=args['init_candidates']))
+    else:
+        best_makespan, best_visualized_solutions, log, _ = (
+            TabuSearch.run_fjs(flexible_job_scheduling_problem,
+                               args['number_of_iterations'],
+                               args['tabu_size'],
+                               args['stuck_reset_threshold'],
+                               args['number_of_neighbors'],
+                               args['timeout_duration'],
+                               args['evaluator'],
+                               args['workers'],
+                               args['seed'],
+                               log_sink_type(final_filepath, args['log_interval']),
+                               SolutionArchive(args['archive_elite_size'], args['archive_max_buckets']),
+                               args['tabu_tenure'],
+                               args['neighborhood'],
+                               args['export_schedule'],
+                               progress_postfix=args['instrument'],
+                               checkpoint_path=args['checkpoint'],
+                               checkpoint_interval=args['checkpoint_interval'],
+                               resume=args['resume'],
+                               target_makespan=args['target_makespan'],
+                               stall_timeout=args['stall_timeout'],
+                               max_evaluations=args['max_evaluations'],
+                               initializer=args['init'],
+                               number_of_initial_candidates=args['init_candidates']))
 
-    print(f'Tabu search returned {len(best_visualized_solutions)} best solution(s) with makespan of {best_makespan}')
+    engine_name = 'Genetic algorithm' if args['engine'] == 'genetic' else 'Tabu search'
+    print(f'{engine_name} returned {len(best_visualized_solutions)} best solution(s) with makespan of {best_makespan}')
 
     for best_visualized_solution in best_visualized_solutions:
         print(best_visualized_solution)
 
-    filename = ('log_' +
-                str(datetime.datetime.now()).replace(':', '_').replace(' ', '_') + '.txt')
-    logs_path = os.path.join(os.path.dirname(__file__), 'logs')
-    os.makedirs(logs_path, exist_ok=True)
-    final_filepath = os.path.join(logs_path, filename)
-    with open(f'{final_filepath}', 'wt+') as f:
-        f.write(log)
     print(f'Log saved to {final_filepath}')
+    if args['export_schedule'] is not None:
+        print(f'Best schedule exported to {args["export_schedule"]}')
 
 
 if __name__ == '__main__':
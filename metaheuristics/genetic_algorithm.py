@@ -0,0 +1,372 @@
+import time
+from array import array
+import numpy as np
+from tqdm.auto import tqdm
+from problems.fjs import FlexibleJobSchedulingProblem
+from problems.fjs_solution import FjsSolution
+from problems.schedule_export import ScheduleExport
+from problems.initializers import SolutionInitializer
+from metaheuristics.run_log import LogSink, InMemoryLogSink
+from metaheuristics.solution_archive import SolutionArchive
+from metaheuristics.tabu_search import TabuSearch, TabuSearchRun
+
+
+class GeneticAlgorithm(object):
+    @staticmethod
+    def run_fjs(fjs: FlexibleJobSchedulingProblem, number_of_generations: int, population_size: int = 100,
+                timeout_duration: float = 15.0, seed: int | None = None, log_sink: LogSink | None = None,
+                archive: SolutionArchive | None = None, crossover_rate: float = 0.9, mutation_rate: float = 0.3,
+                elite_size: int = 2, tournament_size: int = 3, local_search_iterations: int = 0,
+                local_search_count: int = 1, tabu_size: int = 10, reset_threshold: int = 5,
+                number_of_neighbors: int = 50, schedule_export_path: str | None = None,
+                target_makespan: int | None = None, stall_timeout: float = -1, max_evaluations: int = -1,
+                initializer: str = 'random', number_of_initial_candidates: int = 1,
+                initial_solution: FjsSolution | None = None) -> tuple[int, list[str], str, FjsSolution]:
+        """
+        Run a genetic (memetic if local_search_iterations > 0) algorithm against a Flexible Job Shop Scheduling
+        problem, same stop conditions, log sinks and return value as TabuSearch.run_fjs so both engines can be
+        compared on the same wall clock budget
+
+        :param fjs: An instance of Flexible Job Shop Scheduling problem
+        :param number_of_generations: The number of generations to run for
+        :param population_size: Number of solutions per generation
+        :param timeout_duration: The algo will only run for this amount of time, set to -1 if endless is desired
+        :param seed: Seed for every random draw of the search, None for a different run every time
+        :param log_sink: Where generation records and the summary go, defaults to the full log kept in memory
+        :param archive: Bounded-memory record of explored solutions, defaults to SolutionArchive()
+        :param crossover_rate: Chance a pair of parents is recombined rather than copied
+        :param mutation_rate: Chance a child gets one random relocate/reassign move
+        :param elite_size: Best distinct schedules carried over to the next generation unchanged
+        :param tournament_size: Parents are the best of this many individuals drawn at random
+        :param local_search_iterations: If > 0, improve the best local_search_count children of every generation
+            with a tabu search this many iterations long
+        :param local_search_count: Children improved by local search every generation
+        :param tabu_size: Tabu size of the local search
+        :param reset_threshold: Backtrack threshold of the local search
+        :param number_of_neighbors: Neighbors per iteration of the local search, -1 to infer it from the instance
+        :param schedule_export_path: If set, write the decoded best schedule there, .csv for CSV, otherwise JSON
+        :param target_makespan: Stop as soon as the best makespan is at or below this. The run always stops once it
+            reaches fjs.lower_bound since the solution is provably optimal then
+        :param stall_timeout: Stop if the best makespan hasn't improved for this many seconds, -1 to never
+        :param max_evaluations: Stop once this many solutions have been evaluated in total, -1 for no limit
+        :param initializer: How one individual of the first generation is built, see SolutionInitializer, the rest
+            are random
+        :param number_of_initial_candidates: For the random and grasp initializers, build this many and keep the best
+        :param initial_solution: Warm start, repaired to fit the problem and put in the first generation
+        :returns: tuple (best makespan: int, best visualized solutions: list, log: str, best solution: FjsSolution),
+            log is whatever the sink keeps in memory, see LogSink.get_log
+        """
+        log_sink = InMemoryLogSink(title='Genetic algorithm') if log_sink is None else log_sink
+        # the local search has no adaptive sizing, -1 falls back to the static size
+        number_of_neighbors = TabuSearch.resolve_number_of_neighbors(fjs, number_of_neighbors, local_search_iterations)
+        search = GeneticAlgorithmRun(fjs, population_size, seed, log_sink=log_sink, archive=archive,
+                                     crossover_rate=crossover_rate, mutation_rate=mutation_rate,
+                                     elite_size=elite_size, tournament_size=tournament_size,
+                                     local_search_iterations=local_search_iterations,
+                                     local_search_count=local_search_count, tabu_size=tabu_size,
+                                     reset_threshold=reset_threshold, number_of_neighbors=number_of_neighbors,
+                                     initializer=initializer,
+                                     number_of_initial_candidates=number_of_initial_candidates,
+                                     initial_solution=None if initial_solution is None
+                                     else fjs.repair_solution(initial_solution))
+        start_time = time.time()
+        last_improvement_time = start_time
+        best_makespan = search.best_makespan
+        stop_reason = None
+
+        for current_generation in tqdm(range(number_of_generations)):
+            # if run time exceeds timeout duration, end prematurely
+            now = time.time()
+            if 0 <= timeout_duration <= now - start_time:
+                print('Timed out!')
+                log_sink.record({'type': 'timeout', 'iteration': current_generation})
+                stop_reason = 'timed out'
+                break
+            if search.best_makespan <= fjs.lower_bound:
+                stop_reason = f'reached the lower bound {fjs.lower_bound}, optimal'
+            elif target_makespan is not None and search.best_makespan <= target_makespan:
+                stop_reason = f'reached target makespan {target_makespan}'
+            elif 0 <= stall_timeout <= now - last_improvement_time:
+                stop_reason = f'no improvement for {stall_timeout}s'
+            elif 0 <= max_evaluations <= search.archive.total_added:
+                stop_reason = f'used up {max_evaluations} evaluations'
+            if stop_reason is not None:
+                print(f'Stopped early, {stop_reason}')
+                log_sink.record({'type': 'early_stop', 'iteration': current_generation, 'reason': stop_reason})
+                break
+
+            search.iterate()
+            if search.best_makespan < best_makespan:
+                best_makespan = search.best_makespan
+                last_improvement_time = time.time()
+
+        visualized_best_solutions = search.get_visualized_best_solutions()
+        if schedule_export_path is not None:
+            ScheduleExport.write(fjs.get_full_schedule(search.get_best_solution()), schedule_export_path)
+
+        # logging
+        header_log = '# Genetic algorithm summary\n'
+        header_log += f'- Input obtained from {fjs.input_file}:\n\n'
+        with open(fjs.input_file, 'rt') as f:
+            header_log += f.read() + '\n\n'
+        if len(fjs.changes) > 0:
+            header_log += f'- Problem changed since it was loaded: {", ".join(fjs.changes)}\n'
+        header_log += (f'- Completed {search.completed_iterations} out of {number_of_generations} generations' +
+                       (f' ({stop_reason})' if stop_reason is not None else '') +
+                       f' in {time.time() - start_time:.2f}s\n')
+        header_log += f'- population_size was {search.population_size}\n'
+        header_log += f'- crossover_rate was {crossover_rate}\n'
+        header_log += f'- mutation_rate was {mutation_rate}\n'
+        header_log += f'- elite_size was {elite_size}\n'
+        header_log += f'- tournament_size was {tournament_size}\n'
+        header_log += f'- local_search_iterations was {local_search_iterations}'
+        if local_search_iterations > 0:
+            header_log += (f' on the best {local_search_count} children, tabu_size {tabu_size}, ' +
+                           f'reset_threshold {reset_threshold}, {number_of_neighbors} neighbors')
+        header_log += '\n'
+        header_log += f'- timeout_duration was {timeout_duration}\n'
+        header_log += f'- target_makespan was {target_makespan}\n'
+        header_log += f'- stall_timeout was {stall_timeout}\n'
+        header_log += f'- max_evaluations was {max_evaluations}\n'
+        if initial_solution is not None:
+            header_log += '- warm started from the given solution\n'
+        else:
+            header_log += f'- initializer was {initializer} (best of {number_of_initial_candidates})\n'
+        header_log += f'- seed was {seed}\n'
+        header_log += f'- log_interval was {log_sink.log_interval}\n'
+        header_log += search.get_summary_log(visualized_best_solutions)
+
+        log_sink.write_summary(header_log)
+        log_sink.close()
+
+        return search.best_makespan, visualized_best_solutions, log_sink.get_log(), search.get_best_solution()
+
+
+class GeneticAlgorithmRun(object):
+    """
+    State of one genetic algorithm run, advanced one generation at a time by iterate(), like TabuSearchRun.
+
+    Every generation keeps the elite_size best distinct schedules and breeds the rest from tournament-selected
+    parents. Recombination works on the whole mating pool at once in NumPy:
+    - sequence: precedence preserving order crossover (POX), a random half of the jobs keep their positions from
+      one parent and the other jobs fill the remaining positions in the order they have in the other parent, so
+      every job's ops stay in order
+    - machines: uniform crossover of the assignment, every op takes its machine from either parent
+    Children repeating a schedule already in the generation are replaced with random solutions to keep the population
+    diverse, then the whole generation is evaluated in one fjs.evaluate_solutions batch
+    """
+    fjs: FlexibleJobSchedulingProblem
+    population_size: int
+    population: list[FjsSolution]
+    makespans: list[int]
+    best_makespan: int
+    best_solutions: list[FjsSolution]
+    completed_iterations: int
+    log_sink: LogSink
+    archive: SolutionArchive
+
+    def __init__(self, fjs: FlexibleJobSchedulingProblem, population_size: int, seed: int | None = None,
+                 log_sink: LogSink | None = None, archive: SolutionArchive | None = None, crossover_rate: float = 0.9,
+                 mutation_rate: float = 0.3, elite_size: int = 2, tournament_size: int = 3,
+                 local_search_iterations: int = 0, local_search_count: int = 1, tabu_size: int = 10,
+                 reset_threshold: int = 5, number_of_neighbors: int = 50, initializer: str = 'random',
+                 number_of_initial_candidates: int = 1, initial_solution: FjsSolution | None = None):
+        if seed is not None:
+            fjs.seed(seed)
+        self.fjs = fjs
+        self.population_size = max(2, population_size)
+        self.crossover_rate = crossover_rate
+        self.mutation_rate = mutation_rate
+        self.elite_size = min(elite_size, self.population_size - 1)
+        self.tournament_size = max(1, tournament_size)
+        self.local_search_iterations = local_search_iterations
+        self.local_search_count = local_search_count
+        self.tabu_size = tabu_size
+        self.reset_threshold = reset_threshold
+        self.number_of_neighbors = number_of_neighbors
+        self.archive = SolutionArchive() if archive is None else archive
+        # summary-only by default, drivers that keep a log pass their own sink
+        self.log_sink = LogSink() if log_sink is None else log_sink
+        # numpy generator derived from rng so whole runs are reproducible from the problem's seed
+        self.generator = np.random.default_rng(fjs.rng.getrandbits(64))
+        self.op_offsets = np.cumsum([0] + fjs.ops_per_job)[:-1]
+        self.completed_iterations = 0
+        self.replaced_duplicates = 0
+        self.local_search_improvements = 0
+
+        population = fjs.get_random_solutions(self.population_size)
+        if initial_solution is not None:
+            population[0] = initial_solution
+        elif initializer != 'random' or number_of_initial_candidates > 1:
+            population[0] = SolutionInitializer.get_initial_solution(fjs, initializer, number_of_initial_candidates)
+        self.population = population
+        self.makespans = fjs.evaluate_solutions(population)
+        for solution, makespan in zip(population, self.makespans):
+            self.archive.add(solution, makespan)
+        self.best_makespan = min(self.makespans)
+        self.best_solutions = []
+        self.best_solution_keys: set[int] = set()
+        self.add_best_solutions([solution for solution, makespan in zip(population, self.makespans)
+                                 if makespan == self.best_makespan])
+
+    def iterate(self):
+        fjs = self.fjs
+        generator = self.generator
+        population = self.population
+        makespans = np.array(self.makespans)
+
+        # elites, the best distinct schedules of this generation
+        elites = []
+        elite_keys = set()
+        for index in np.argsort(makespans, kind='stable').tolist():
+            if len(elites) == self.elite_size:
+                break
+            if population[index].canonical_key not in elite_keys:
+                elite_keys.add(population[index].canonical_key)
+                elites.append(index)
+
+        # tournament selection, lowest makespan of tournament_size random individuals
+        number_of_children = self.population_size - len(elites)
+        number_of_pairs = -(-number_of_children // 2)
+        contestants = generator.integers(0, len(population), (number_of_pairs * 2, self.tournament_size))
+        parents = np.take_along_axis(contestants, makespans[contestants].argmin(axis=1)[:, None], axis=1)[:, 0]
+        children = self.__crossover([population[index] for index in parents[0::2]],
+                                    [population[index] for index in parents[1::2]])[:number_of_children]
+
+        # mutation, one random relocate/reassign move
+        for index in np.flatnonzero(generator.random(len(children)) < self.mutation_rate).tolist():
+            children[index] = fjs.get_random_neighbor_solution(children[index])
+
+        # children that repeat a schedule already in the generation make way for random newcomers
+        seen_keys = elite_keys
+        duplicate_indices = []
+        for index, canonical_key in enumerate(FjsSolution.compute_canonical_keys(children)):
+            if canonical_key in seen_keys:
+                duplicate_indices.append(index)
+            else:
+                seen_keys.add(canonical_key)
+        if len(duplicate_indices) > 0:
+            for index, newcomer in zip(duplicate_indices, fjs.get_random_solutions(len(duplicate_indices))):
+                children[index] = newcomer
+            self.replaced_duplicates += len(duplicate_indices)
+
+        # the whole generation in one batch
+        children_makespans = fjs.evaluate_solutions(children)
+
+        # memetic step, a short tabu search from the best children
+        if self.local_search_iterations > 0:
+            for index in np.argsort(children_makespans, kind='stable')[:self.local_search_count].tolist():
+                local_search = TabuSearchRun(fjs, self.tabu_size, self.reset_threshold, self.number_of_neighbors,
+                                             initial_solution=children[index], archive=self.archive)
+                for _ in range(self.local_search_iterations):
+                    local_search.iterate()
+                local_search.close()
+                if local_search.best_makespan < children_makespans[index]:
+                    children[index] = local_search.get_best_solution()
+                    children_makespans[index] = local_search.best_makespan
+                    self.local_search_improvements += 1
+
+        for child, makespan in zip(children, children_makespans):
+            self.archive.add(child, makespan)
+        self.population = [population[index] for index in elites] + children
+        self.makespans = [self.makespans[index] for index in elites] + children_makespans
+
+        generation_best_makespan = min(children_makespans)
+        best_children = [child for child, makespan in zip(children, children_makespans)
+                         if makespan == generation_best_makespan]
+        if generation_best_makespan < self.best_makespan:
+            self.best_makespan = generation_best_makespan
+            self.best_solutions = []
+            self.best_solution_keys = set()
+            self.add_best_solutions(best_children)
+        elif generation_best_makespan == self.best_makespan:
+            self.add_best_solutions(best_children)
+
+        if self.log_sink.wants(self.completed_iterations):
+            self.log_sink.record({'type': 'generation', 'generation': self.completed_iterations,
+                                  'best_makespan': self.best_makespan,
+                                  'generation_best_makespan': generation_best_makespan,
+                                  'mean_makespan': round(float(np.mean(self.makespans)), 2),
+                                  'replaced_duplicates': len(duplicate_indices)})
+        self.completed_iterations += 1
+
+    def __crossover(self, first_parents: list[FjsSolution], second_parents: list[FjsSolution]) -> list[FjsSolution]:
+        # POX on the sequence plus uniform crossover on the machine assignment, two children per pair
+        number_of_pairs = len(first_parents)
+        first_triples = FjsSolution.stack(first_parents).reshape(number_of_pairs, -1, 3)
+        second_triples = FjsSolution.stack(second_parents).reshape(number_of_pairs, -1, 3)
+        rows = np.arange(number_of_pairs)[:, None]
+        generator = self.generator
+
+        kept_jobs = generator.random((number_of_pairs, self.fjs.number_of_jobs)) < 0.5
+        first_children = first_triples.copy()
+        second_children = second_triples.copy()
+        # boolean indexing is row-major and every row fills as many positions as it takes ops, so rows line up
+        first_children[~kept_jobs[rows, first_triples[:, :, 0]]] = second_triples[~kept_jobs[rows,
+                                                                                              second_triples[:, :, 0]]]
+        second_children[kept_jobs[rows, second_triples[:, :, 0]]] = first_triples[kept_jobs[rows,
+                                                                                            first_triples[:, :, 0]]]
+
+        # machines indexed by flat op id, every op takes one parent's machine
+        number_of_ops = first_triples.shape[1]
+        first_machines = np.empty((number_of_pairs, number_of_ops), dtype=first_triples.dtype)
+        second_machines = np.empty((number_of_pairs, number_of_ops), dtype=second_triples.dtype)
+        first_machines[rows, self.op_offsets[first_triples[:, :, 0]] + first_triples[:, :, 1]] = first_triples[:, :, 2]
+        second_machines[rows, self.op_offsets[second_triples[:, :, 0]] + second_triples[:, :, 1]] = \
+            second_triples[:, :, 2]
+        from_first = generator.random((number_of_pairs, number_of_ops)) < 0.5
+        first_mix = np.where(from_first, first_machines, second_machines)
+        second_mix = np.where(from_first, second_machines, first_machines)
+        first_children[:, :, 2] = first_mix[rows, self.op_offsets[first_children[:, :, 0]] + first_children[:, :, 1]]
+        second_children[:, :, 2] = second_mix[rows,
+                                              self.op_offsets[second_children[:, :, 0]] + second_children[:, :, 1]]
+
+        # pairs that don't recombine pass on copies of the parents
+        copied = (generator.random(number_of_pairs) >= self.crossover_rate)[:, None, None]
+        first_children = np.where(copied, first_triples, first_children)
+        second_children = np.where(copied, second_triples, second_children)
+
+        children = np.stack((first_children, second_children), axis=1).astype(np.intc)
+        return [FjsSolution(array('i', row.tobytes())) for row in children.reshape(number_of_pairs * 2, -1)]
+
+    def add_best_solutions(self, solutions: list[FjsSolution]):
+        """
+        :param solutions: Solutions with the current best makespan, the ones whose schedule is already kept are skipped.
+        """
+        # a plateau can hold any number of distinct schedules, only the first archive.elite_size found are kept
+        best_solutions_limit = max(1, self.archive.elite_size)
+        for solution in solutions:
+            if len(self.best_solutions) >= best_solutions_limit:
+                break
+            if solution.canonical_key not in self.best_solution_keys:
+                self.best_solution_keys.add(solution.canonical_key)
+                self.best_solutions.append(solution)
+
+    def get_best_solution(self) -> FjsSolution:
+        return min(self.best_solutions)
+
+    def get_visualized_best_solutions(self) -> list[str]:
+        return [self.fjs.get_visualization(sol) for sol in self.fjs.get_unique_schedules(self.best_solutions)]
+
+    def get_summary_log(self, visualized_best_solutions: list[str]) -> str:
+        header_log = (f'- Explored ~{self.archive.distinct_count()} unique schedules ' +
+                      f'({self.archive.total_added} evaluated)\n')
+        header_log += (f'- Replaced {self.replaced_duplicates} children that repeated a schedule already in their ' +
+                       'generation\n')
+        if self.local_search_iterations > 0:
+            header_log += f'- Local search improved {self.local_search_improvements} children\n'
+        evaluation_cache = self.fjs.evaluation_cache
+        if evaluation_cache is not None:
+            header_log += (f'- Evaluation cache answered {evaluation_cache.hits} of ' +
+                           f'{evaluation_cache.hits + evaluation_cache.misses} lookups ' +
+                           f'({evaluation_cache.get_hit_rate():.2%}), holding {len(evaluation_cache)} makespans\n')
+        header_log += f'- Best makespan found was {self.best_makespan}\n'
+        header_log += TabuSearch.get_lower_bound_log(self.fjs, self.best_makespan)
+        header_log += (f'- Found these unique visualized solutions with makespan of {self.best_makespan} ' +
+                       f'(at most {max(1, self.archive.elite_size)} are kept):\n')
+        for uvs in visualized_best_solutions:
+            header_log += f'\n{uvs}\n'
+        return header_log
+
+    def close(self):
+        pass
@@ -0,0 +1,233 @@
+import time
+import multiprocessing
+from multiprocessing.connection import Connection
+from tqdm.auto import tqdm
+from problems.fjs import FlexibleJobSchedulingProblem
+from problems.fjs_solution import FjsSolution
+from problems.schedule_export import ScheduleExport
+from metaheuristics.tabu_search import TabuSearch, TabuSearchRun
+from metaheuristics.run_log import LogSink, InMemoryLogSink
+from metaheuristics.solution_archive import SolutionArchive
+
+
+def _island_main(connection: Connection, fjs: FlexibleJobSchedulingProblem, tabu_size: int, reset_threshold: int,
+                 number_of_neighbors: int, seed: int | None, initializer: str, number_of_initial_candidates: int,
+                 evaluator: str, tabu_tenure: int, neighborhood: str, archive_elite_size: int):
+    # each island owns one tabu search trajectory for the whole run and just follows the driver's commands
+    search = TabuSearchRun(fjs, tabu_size, reset_threshold, number_of_neighbors, evaluator, seed=seed,
+                           tabu_tenure=tabu_tenure, neighborhood=neighborhood, initializer=initializer,
+                           number_of_initial_candidates=number_of_initial_candidates,
+                           archive=SolutionArchive(archive_elite_size))
+    accepted_migrations = 0
+    while True:
+        command, payload = connection.recv()
+        if command == 'run':
+            number_of_iterations, deadline, stop_makespan = payload
+            for _ in range(number_of_iterations):
+                if deadline is not None and time.time() >= deadline:
+                    break
+                # nothing left to do once the target (or the lower bound) is reached
+                if search.best_makespan <= stop_makespan:
+                    break
+                search.iterate()
+            connection.send((search.best_makespan, search.get_best_solution().ops.tobytes(),
+                             search.archive.total_added))
+        elif command == 'migrate':
+            makespan, buffer = payload
+            accepted = search.migrate(FjsSolution.from_bytes(buffer), makespan)
+            accepted_migrations += int(accepted)
+            connection.send(accepted)
+        elif command == 'finish':
+            connection.send(({'completed_iterations': search.completed_iterations,
+                              'best_makespan': search.best_makespan,
+                              'accepted_migrations': accepted_migrations},
+                             [solution.ops.tobytes() for solution in search.best_solutions]))
+            search.close()
+            break
+
+
+class IslandModel(object):
+    @staticmethod
+    def run_fjs(fjs: FlexibleJobSchedulingProblem, number_of_islands: int, migration_interval: int,
+                number_of_iterations: int, tabu_size: int | list[int], reset_threshold: int,
+                number_of_neighbors: int | list[int], timeout_duration: float = 15.0, seed: int | None = None,
+                schedule_export_path: str | None = None, initializer: str = 'random',
+                number_of_initial_candidates: int = 1, target_makespan: int | None = None,
+                stall_timeout: float = -1, max_evaluations: int = -1, evaluator: str = 'batch', tabu_tenure: int = 0,
+                neighborhood: str = 'random', log_sink: LogSink | None = None, archive_elite_size: int = 100):
+        """
+        Run several independent tabu searches (islands) in separate processes, every migration_interval iterations
+        each island is offered the best solution of the island before it (ring topology)
+
+        :param fjs: An instance of Flexible Job Shop Scheduling problem
+        :param number_of_islands: Number of islands/processes
+        :param migration_interval: Number of iterations between migrations
+        :param number_of_iterations: The number of iterations each island runs for
+        :param tabu_size: Tabu size for all islands, or one per island
+        :param reset_threshold: Backtrack if an island can't find a better solution in this many iterations
+        :param number_of_neighbors: Neighbor count for all islands, or one per island, same meaning as in TabuSearch
+        :param timeout_duration: Wall clock budget shared by all islands, set to -1 if endless is desired
+        :param seed: Island i is seeded with seed + i, None for a different run every time
+        :param schedule_export_path: If set, write the decoded best schedule there, .csv for CSV, otherwise JSON
+        :param initializer: How each island builds its starting solution, see SolutionInitializer. With random or grasp
+            every island gets a different start
+        :param number_of_initial_candidates: For random and grasp, each island starts from the best of this many
+        :param target_makespan: Stop as soon as an island reaches this makespan or better, islands stop mid-epoch
+        :param stall_timeout: Stop if the best makespan of all islands hasn't improved for this many seconds, -1 to
+            never, checked between epochs
+        :param max_evaluations: Stop once the islands evaluated this many neighbors together, -1 for no limit,
+            checked between epochs
+        :param evaluator: How every island scores its neighbors, same meaning as in TabuSearch
+        :param tabu_tenure: Attribute tabu tenure of every island, same meaning as in TabuSearch
+        :param neighborhood: Neighborhood every island samples, same meaning as in TabuSearch
+        :param log_sink: Where epoch records and the summary go, log_interval counts epochs, defaults to the full log
+            kept in memory
+        :param archive_elite_size: Elite size of every island's SolutionArchive, also how many best solutions are
+            kept, per island and overall
+        :returns: tuple (best makespan: int, best visualized solutions: list, per-island stats: list[dict], log: str),
+            log is whatever the sink keeps in memory, see LogSink.get_log
+        """
+        tabu_sizes = tabu_size if isinstance(tabu_size, list) else [tabu_size] * number_of_islands
+        neighbor_counts = number_of_neighbors if isinstance(number_of_neighbors, list) \
+            else [number_of_neighbors] * number_of_islands
+        if len(tabu_sizes) != number_of_islands or len(neighbor_counts) != number_of_islands:
+            raise ValueError('Per-island tabu sizes and neighbor counts must have one entry per island')
+        neighbor_counts = [TabuSearch.resolve_number_of_neighbors(fjs, count, number_of_iterations)
+                           for count in neighbor_counts]
+        seeds = [None if seed is None else seed + island_index for island_index in range(number_of_islands)]
+        log_sink = InMemoryLogSink(title='Island tabu search') if log_sink is None else log_sink
+
+        start_time = time.time()
+        deadline = start_time + timeout_duration if timeout_duration >= 0 else None
+        connections: list[Connection] = []
+        processes = []
+        for island_index in range(number_of_islands):
+            driver_connection, island_connection = multiprocessing.Pipe()
+            process = multiprocessing.Process(target=_island_main, daemon=True,
+                                              args=(island_connection, fjs, tabu_sizes[island_index],
+                                                    reset_threshold, neighbor_counts[island_index],
+                                                    seeds[island_index], initializer,
+                                                    number_of_initial_candidates, evaluator, tabu_tenure,
+                                                    neighborhood, archive_elite_size))
+            process.start()
+            connections.append(driver_connection)
+            processes.append(process)
+
+        epoch = 0
+        stop_reason = None
+        stop_makespan = fjs.lower_bound if target_makespan is None else max(fjs.lower_bound, target_makespan)
+        best_makespan = None
+        last_improvement_time = start_time
+        remaining_iterations = number_of_iterations
+        progress_bar = tqdm(total=number_of_iterations)
+        while remaining_iterations > 0 and (deadline is None or time.time() < deadline):
+            epoch_iterations = min(migration_interval, remaining_iterations)
+            for connection in connections:
+                connection.send(('run', (epoch_iterations, deadline, stop_makespan)))
+            island_results = [connection.recv() for connection in connections]
+            island_bests = [(island_best_makespan, buffer) for island_best_makespan, buffer, _ in island_results]
+            remaining_iterations -= epoch_iterations
+            progress_bar.update(epoch_iterations)
+
+            # ring migration, island i gets island i-1's best
+            migrations = []
+            if remaining_iterations > 0:
+                for island_index, connection in enumerate(connections):
+                    connection.send(('migrate', island_bests[island_index - 1]))
+                for island_index, connection in enumerate(connections):
+                    if connection.recv():
+                        source_index = (island_index - 1) % number_of_islands
+                        migrations.append({'island': island_index, 'source': source_index,
+                                           'makespan': island_bests[source_index][0]})
+            if log_sink.wants(epoch):
+                log_sink.record({'type': 'epoch', 'epoch': epoch,
+                                 'island_best_makespans': [island_best_makespan
+                                                           for island_best_makespan, _ in island_bests],
+                                 'migrations': migrations})
+            epoch += 1
+            # same anytime stop conditions as TabuSearch.run_fjs, at epoch granularity
+            epoch_best_makespan = min(island_best_makespan for island_best_makespan, _ in island_bests)
+            if best_makespan is None or epoch_best_makespan < best_makespan:
+                best_makespan = epoch_best_makespan
+                last_improvement_time = time.time()
+            if remaining_iterations == 0:
+                break
+            if best_makespan <= fjs.lower_bound:
+                stop_reason = f'reached the lower bound {fjs.lower_bound}, optimal'
+            elif target_makespan is not None and best_makespan <= target_makespan:
+                stop_reason = f'reached target makespan {target_makespan}'
+            elif 0 <= stall_timeout <= time.time() - last_improvement_time:
+                stop_reason = f'no improvement for {stall_timeout}s'
+            elif 0 <= max_evaluations <= sum(evaluations for _, _, evaluations in island_results):
+                stop_reason = f'used up {max_evaluations} evaluations'
+            if stop_reason is not None:
+                print(f'Stopped early, {stop_reason}')
+                log_sink.record({'type': 'early_stop', 'iteration': number_of_iterations - remaining_iterations,
+                                 'reason': stop_reason})
+                break
+        progress_bar.close()
+        timed_out = remaining_iterations > 0 and stop_reason is None
+        if timed_out:
+            log_sink.record({'type': 'timeout', 'iteration': number_of_iterations - remaining_iterations})
+
+        island_stats = []
+        island_best_solutions = []
+        for island_index, connection in enumerate(connections):
+            connection.send(('finish', None))
+            stats, best_buffers = connection.recv()
+            stats.update({'island': island_index, 'seed': seeds[island_index],
+                          'tabu_size': tabu_sizes[island_index],
+                          'number_of_neighbors': neighbor_counts[island_index]})
+            island_stats.append(stats)
+            island_best_solutions.append([FjsSolution.from_bytes(buffer) for buffer in best_buffers])
+        for process in processes:
+            process.join()
+
+        best_makespan = min(stats['best_makespan'] for stats in island_stats)
+        best_solutions = set()
+        for stats, solutions in zip(island_stats, island_best_solutions):
+            if stats['best_makespan'] == best_makespan:
+                best_solutions.update(solutions)
+        unique_best_solutions = fjs.get_unique_schedules(sorted(best_solutions))[:max(1, archive_elite_size)]
+        visualized_best_solutions = [fjs.get_visualization(sol) for sol in unique_best_solutions]
+        if schedule_export_path is not None:
+            ScheduleExport.write(fjs.get_full_schedule(unique_best_solutions[0]), schedule_export_path)
+
+        header_log = '# Island tabu search summary\n'
+        header_log += f'- Input obtained from {fjs.input_file}:\n\n'
+        with open(fjs.input_file, 'rt') as f:
+            header_log += f.read() + '\n\n'
+        header_log += (f'- Completed {epoch} migration epochs' + (' (timed out)' if timed_out else '') +
+                       (f' ({stop_reason})' if stop_reason is not None else '') +
+                       f' in {time.time() - start_time:.2f}s\n')
+        header_log += f'- number_of_islands was {number_of_islands}\n'
+        header_log += f'- migration_interval was {migration_interval}\n'
+        header_log += f'- number_of_iteration was {number_of_iterations}\n'
+        header_log += f'- reset_threshold was {reset_threshold}\n'
+        header_log += f'- timeout_duration was {timeout_duration}\n'
+        header_log += f'- target_makespan was {target_makespan}\n'
+        header_log += f'- stall_timeout was {stall_timeout}\n'
+        header_log += f'- max_evaluations was {max_evaluations}\n'
+        header_log += f'- seed was {seed}\n'
+        header_log += f'- log_interval was {log_sink.log_interval}\n'
+        header_log += f'- initializer was {initializer} (best of {number_of_initial_candidates})\n'
+        header_log += f'- tabu_tenure was {tabu_tenure}\n'
+        header_log += f'- neighborhood was {neighborhood}\n'
+        header_log += f'- evaluator was {evaluator}\n'
+        for stats in island_stats:
+            header_log += (f'  + Island {stats["island"]}: seed {stats["seed"]}, tabu_size {stats["tabu_size"]}, ' +
+                           f'number_of_neighbors {stats["number_of_neighbors"]}, ' +
+                           f'{stats["completed_iterations"]} iterations, ' +
+                           f'{stats["accepted_migrations"]} accepted migrants, ' +
+                           f'best makespan {stats["best_makespan"]}\n')
+        header_log += f'- Best makespan found was {best_makespan}\n'
+        header_log += TabuSearch.get_lower_bound_log(fjs, best_makespan)
+        header_log += (f'- Found these unique visualized solutions with makespan of {best_makespan} ' +
+                       f'(at most {max(1, archive_elite_size)} are kept):\n')
+        for uvs in visualized_best_solutions:
+            header_log += f'\n{uvs}\n'
+
+        log_sink.write_summary(header_log)
+        log_sink.close()
+
+        return best_makespan, visualized_best_solutions, island_stats, log_sink.get_log()
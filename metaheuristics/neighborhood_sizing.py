@@ -0,0 +1,86 @@
+import time
+
+
+class NeighborhoodSizeController(object):
+    """
+    Picks the number of neighbors to sample each iteration. The size follows the recent improvement rate (an
+    exponential moving average of "the all-time best improved this iteration"): while the search is still descending
+    it stays near min_size so iterations are cheap, on a plateau it grows towards max_size to look harder. The slow
+    smoothing and the modest max_size are deliberate, under a time budget many cheap iterations beat a few thorough
+    ones.
+
+    With a deadline it is also capped by the measured evaluation throughput so the remaining time still fits at least
+    MIN_ITERATIONS_LEFT more iterations. That cap depends on wall clock timing, without a deadline the sizes only
+    depend on the trajectory and seeded runs stay reproducible
+    """
+    IMPROVEMENT_SMOOTHING = 0.05
+    THROUGHPUT_SMOOTHING = 0.2
+    MIN_ITERATIONS_LEFT = 20
+
+    min_size: int
+    max_size: int
+    improvement_rate: float
+    seconds_per_evaluation: float | None
+    deadline: float | None
+    size_counts: dict[int, int]
+
+    def __init__(self, min_size: int = 20, max_size: int = 200):
+        self.min_size = min_size
+        self.max_size = max_size
+        # start as if every iteration improves, i.e. small
+        self.improvement_rate = 1.0
+        self.seconds_per_evaluation = None
+        self.deadline = None
+        self.number_of_iterations = None
+        self.best_makespan = None
+        self.size = min_size
+        self.size_counts = dict()
+
+    def set_budget(self, deadline: float | None, number_of_iterations: int):
+        """
+        :param deadline: time.time() by which the run has to end, None for no time limit.
+        :param number_of_iterations: Total iterations of the run.
+        """
+        self.deadline = deadline
+        self.number_of_iterations = number_of_iterations
+
+    def get_size(self, completed_iterations: int) -> int:
+        size = self.min_size + (self.max_size - self.min_size) * (1.0 - self.improvement_rate)
+        if self.deadline is not None and self.seconds_per_evaluation is not None:
+            remaining_iterations = max(1, min(self.number_of_iterations - completed_iterations,
+                                              NeighborhoodSizeController.MIN_ITERATIONS_LEFT))
+            remaining_time = max(0.0, self.deadline - time.time())
+            size = min(size, remaining_time / self.seconds_per_evaluation / remaining_iterations)
+        self.size = max(self.min_size, min(self.max_size, int(size)))
+        self.size_counts[self.size] = self.size_counts.get(self.size, 0) + 1
+        return self.size
+
+    def update(self, best_makespan: int, iteration_seconds: float):
+        improved = self.best_makespan is not None and best_makespan < self.best_makespan
+        self.best_makespan = best_makespan
+        smoothing = NeighborhoodSizeController.IMPROVEMENT_SMOOTHING
+        self.improvement_rate = (1 - smoothing) * self.improvement_rate + smoothing * float(improved)
+        seconds_per_evaluation = iteration_seconds / self.size
+        if self.seconds_per_evaluation is None:
+            self.seconds_per_evaluation = seconds_per_evaluation
+        else:
+            smoothing = NeighborhoodSizeController.THROUGHPUT_SMOOTHING
+            self.seconds_per_evaluation = ((1 - smoothing) * self.seconds_per_evaluation +
+                                           smoothing * seconds_per_evaluation)
+
+    def get_summary_log(self) -> str:
+        number_of_iterations = sum(self.size_counts.values())
+        if number_of_iterations == 0:
+            return '- Adaptive neighborhood sizing ran no iterations\n'
+        mean_size = sum(size * count for size, count in self.size_counts.items()) / number_of_iterations
+        summary_log = (f'- Adaptive neighborhood sizing between {self.min_size} and {self.max_size}: ' +
+                       f'mean {mean_size:.1f}, smallest {min(self.size_counts)}, largest {max(self.size_counts)}, ' +
+                       f'last {self.size}\n')
+        # iterations per size range, 5 equal-width ranges
+        range_width = max(1, -(-(self.max_size - self.min_size + 1) // 5))
+        for lowest_size in range(self.min_size, self.max_size + 1, range_width):
+            highest_size = min(self.max_size, lowest_size + range_width - 1)
+            count = sum(count for size, count in self.size_counts.items() if lowest_size <= size <= highest_size)
+            summary_log += (f'  + {lowest_size}-{highest_size} neighbors: {count} iterations ' +
+                            f'({count / number_of_iterations:.2%})\n')
+        return summary_log
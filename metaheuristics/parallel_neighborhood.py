@@ -0,0 +1,95 @@
+import copy
+import random
+from concurrent.futures import ProcessPoolExecutor
+from problems.fjs import FlexibleJobSchedulingProblem
+from problems.fjs_solution import FjsSolution
+
+# set once per worker process by the pool initializer, so the instance is never pickled per task
+_worker_fjs: FlexibleJobSchedulingProblem | None = None
+
+
+def _init_worker(fjs: FlexibleJobSchedulingProblem):
+    global _worker_fjs
+    _worker_fjs = fjs
+
+
+def _generate_and_evaluate_chunk(task: tuple[bytes, int, int]) -> tuple[bytes, list[int], list[tuple[int, int, int]]]:
+    return generate_and_evaluate_chunk(_worker_fjs, *task)
+
+
+def generate_and_evaluate_chunk(fjs: FlexibleJobSchedulingProblem, current_ops: bytes, chunk_seed: int,
+                                number_of_neighbors: int) -> tuple[bytes, list[int], list[tuple[int, int, int]]]:
+    """
+    Generate and batch-evaluate one chunk of neighbors with an RNG derived only from chunk_seed
+
+    :param fjs: An instance of Flexible Job Shop Scheduling problem, its rng gets replaced.
+    :param current_ops: Raw buffer of the current array solution.
+    :param chunk_seed: Seed for this chunk's neighbors.
+    :param number_of_neighbors: Number of neighbors to generate in this chunk.
+    :returns: tuple (raw buffer of all neighbors back to back, makespans and moves in the same order)
+    """
+    fjs.rng = random.Random(chunk_seed)
+    current_solution = FjsSolution.from_bytes(current_ops)
+    moves = [fjs.get_random_neighbor_move(current_solution) for _ in range(number_of_neighbors)]
+    neighbors = [fjs.apply_move(current_solution, move) for move in moves]
+    makespans = fjs.evaluate_solutions(neighbors)
+    return b''.join([neighbor.ops.tobytes() for neighbor in neighbors]), makespans, moves
+
+
+class ParallelNeighborhood(object):
+    """
+    Fans neighbor generation + evaluation of one iteration out to a process pool. The neighbor set is cut into
+    fixed-size chunks, each seeded from (iteration seed, chunk index), so the result only depends on the seed and
+    never on how many workers there are. The single-threaded path of TabuSearchRun (workers=0) doesn't go through
+    here and draws from the problem's RNG directly, so it follows a different trajectory
+    """
+    CHUNK_SIZE = 25
+
+    fjs: FlexibleJobSchedulingProblem
+    workers: int
+    executor: ProcessPoolExecutor | None
+    local_fjs: FlexibleJobSchedulingProblem | None
+
+    def __init__(self, fjs: FlexibleJobSchedulingProblem, workers: int):
+        self.fjs = fjs
+        self.workers = workers
+        # workers reseed their own copy of fjs per chunk, the search's rng is never touched
+        # a single worker just runs the same chunks in-process on a shallow copy, same chunks, same results
+        self.executor = None
+        self.local_fjs = None
+        if workers > 1:
+            self.executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(fjs,))
+        else:
+            self.local_fjs = copy.copy(fjs)
+
+    def generate(self, current_solution: FjsSolution, iteration_seed: int,
+                 number_of_neighbors: int) -> list[tuple[FjsSolution, int, tuple[int, int, int]]]:
+        """
+        :param current_solution: Solution to generate neighbors of.
+        :param iteration_seed: Seed for this iteration, chunk seeds are derived from it.
+        :param number_of_neighbors: Total number of neighbors to generate.
+        :returns: list of (neighbor, makespan, move) in a deterministic order
+        """
+        current_ops = current_solution.ops.tobytes()
+        tasks = []
+        for chunk_index, chunk_start in enumerate(range(0, number_of_neighbors, ParallelNeighborhood.CHUNK_SIZE)):
+            chunk_size = min(ParallelNeighborhood.CHUNK_SIZE, number_of_neighbors - chunk_start)
+            tasks.append((current_ops, (iteration_seed << 16) | chunk_index, chunk_size))
+
+        if self.executor is None:
+            chunk_results = [generate_and_evaluate_chunk(self.local_fjs, *task) for task in tasks]
+        else:
+            chunk_results = list(self.executor.map(_generate_and_evaluate_chunk, tasks))
+
+        results = []
+        op_bytes = len(current_ops)
+        for buffer, makespans, moves in chunk_results:
+            for index, (makespan, move) in enumerate(zip(makespans, moves)):
+                results.append((FjsSolution.from_bytes(buffer[index * op_bytes:(index + 1) * op_bytes]), makespan,
+                                move))
+        return results
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
@@ -0,0 +1,134 @@
+import json
+
+
+class LogSink(object):
+    """
+    Receives a run's per-iteration records as they happen and its summary at the very end
+
+    log_interval controls verbosity: 0 keeps only the summary, 1 keeps every iteration, N keeps every Nth iteration.
+    Searches call wants() before building a record so a summary-only sink costs next to nothing per iteration.
+    The base class itself drops every record and only keeps the summary. title names the engine in the markdown
+    details heading
+    """
+    log_interval: int
+    summary: str
+    title: str
+
+    def __init__(self, log_interval: int = 0, title: str = 'Tabu search'):
+        self.log_interval = log_interval
+        self.summary = ''
+        self.title = title
+
+    def wants(self, iteration: int) -> bool:
+        return self.log_interval > 0 and iteration % self.log_interval == 0
+
+    def record(self, record: dict):
+        pass
+
+    def write_summary(self, summary: str):
+        self.summary = summary
+
+    def get_log(self) -> str:
+        """
+        :return: Whatever the sink keeps in memory, the full log for InMemoryLogSink, only the summary otherwise.
+        """
+        return self.summary
+
+    def close(self):
+        pass
+
+    @staticmethod
+    def format_markdown(record: dict) -> str:
+        record_type = record['type']
+        if record_type == 'iteration':
+            text = f'## Iteration {record["iteration"]}\n'
+            text += f'- Current solution: {record["current_solution"]} with makespan {record["current_makespan"]}\n'
+            text += f'- All-time best makespan: {record["best_makespan"]}\n'
+            text += f'- This iteration\'s best makespan: {record["iteration_best_makespan"]}\n'
+            if 'stuck_counter' in record:
+                text += f'- Stuck counter: {record["stuck_counter"]}/{record["reset_threshold"]}\n'
+            if 'backtrack_solution' in record:
+                text += (f'- !!! Stuck for too long, backtracking to {record["backtrack_solution"]} ' +
+                         f'with makespan {record["backtrack_makespan"]}!\n')
+            return text + '\n'
+        if record_type == 'generation':
+            text = f'## Generation {record["generation"]}\n'
+            text += f'- All-time best makespan: {record["best_makespan"]}\n'
+            text += f'- This generation\'s best makespan: {record["generation_best_makespan"]}\n'
+            text += f'- Mean makespan: {record["mean_makespan"]}\n'
+            text += f'- Duplicate children replaced: {record["replaced_duplicates"]}\n'
+            return text + '\n'
+        if record_type == 'epoch':
+            text = f'## Epoch {record["epoch"]}\n'
+            for island_index, island_best_makespan in enumerate(record['island_best_makespans']):
+                text += f'- Island {island_index} best makespan: {island_best_makespan}\n'
+            for migration in record['migrations']:
+                text += (f'- Island {migration["island"]} accepted migrant from island {migration["source"]} ' +
+                         f'with makespan {migration["makespan"]}\n')
+            return text + '\n'
+        if record_type == 'timeout':
+            return f'## Iteration {record["iteration"]}\n- !!! Timed out!\n\n'
+        if record_type == 'early_stop':
+            return f'## Iteration {record["iteration"]}\n- !!! Stopped early, {record["reason"]}!\n\n'
+        if record_type == 'migration':
+            return f'## Migration\n- Accepted {record["solution"]} with makespan {record["makespan"]}\n\n'
+        return f'## {record_type}\n' + ''.join(f'- {key}: {value}\n' for key, value in record.items()) + '\n'
+
+
+class InMemoryLogSink(LogSink):
+    """
+    Keeps the classic markdown log (summary first, then details) in memory, parts are joined only once at the end
+    """
+
+    def __init__(self, log_interval: int = 1, title: str = 'Tabu search'):
+        super().__init__(log_interval, title)
+        self.parts: list[str] = []
+
+    def record(self, record: dict):
+        self.parts.append(LogSink.format_markdown(record))
+
+    def get_log(self) -> str:
+        return self.summary + f'\n# {self.title} details\n' + ''.join(self.parts)
+
+
+class MarkdownLogSink(LogSink):
+    """
+    Streams the markdown details to a file as they happen, the summary is appended last
+    """
+
+    def __init__(self, path: str, log_interval: int = 1, title: str = 'Tabu search'):
+        super().__init__(log_interval, title)
+        self.path = path
+        self.file = open(path, 'wt')
+        self.file.write(f'# {title} details\n')
+
+    def record(self, record: dict):
+        self.file.write(LogSink.format_markdown(record))
+
+    def write_summary(self, summary: str):
+        self.summary = summary
+        self.file.write('\n' + summary)
+
+    def close(self):
+        self.file.close()
+
+
+class JsonlLogSink(LogSink):
+    """
+    Streams one JSON object per record to a file, the last line is {"type": "summary", "text": ...}
+    """
+
+    def __init__(self, path: str, log_interval: int = 1, title: str = 'Tabu search'):
+        super().__init__(log_interval, title)
+        self.path = path
+        self.file = open(path, 'wt')
+
+    def record(self, record: dict):
+        self.file.write(json.dumps(record, default=str) + '\n')
+
+    def write_summary(self, summary: str):
+        self.summary = summary
+        self.file.write(json.dumps({'type': 'summary', 'text': summary}) + '\n')
+
+    def close(self):
+        self.file.close()
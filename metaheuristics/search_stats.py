@@ -0,0 +1,85 @@
+import time
+
+
+class SearchStats(object):
+    """
+    Counters and per-phase wall clock timers for a TabuSearchRun. The run calls lap(phase) after each phase of an
+    iteration, which charges the time since the previous lap to that phase, so timing costs one perf_counter call per
+    phase. Runs without a SearchStats skip all of it
+    """
+    PHASES = ('generation', 'evaluation', 'tabu_filtering', 'archive', 'selection', 'backtracking')
+    phase_times: dict[str, float]
+    iterations: int
+    generated: int
+    evaluations: int
+    tabu_hits: int
+    backtracks: int
+    start_time: float
+    last_lap: float
+
+    def __init__(self):
+        self.phase_times = {phase: 0.0 for phase in SearchStats.PHASES}
+        self.iterations = 0
+        self.generated = 0
+        self.evaluations = 0
+        self.tabu_hits = 0
+        self.backtracks = 0
+        self.start_time = time.perf_counter()
+        self.last_lap = self.start_time
+
+    def start_iteration(self):
+        self.last_lap = time.perf_counter()
+
+    def lap(self, phase: str):
+        now = time.perf_counter()
+        self.phase_times[phase] += now - self.last_lap
+        self.last_lap = now
+
+    def end_iteration(self, generated: int, evaluations: int, tabu_hits: int, backtracked: bool):
+        self.iterations += 1
+        self.generated += generated
+        self.evaluations += evaluations
+        self.tabu_hits += tabu_hits
+        self.backtracks += int(backtracked)
+
+    def get_elapsed(self) -> float:
+        return time.perf_counter() - self.start_time
+
+    def get_evaluations_per_second(self) -> float:
+        elapsed = self.get_elapsed()
+        return self.evaluations / elapsed if elapsed > 0 else 0.0
+
+    def get_tabu_hit_rate(self) -> float:
+        """
+        :return: Fraction of generated neighbors dropped as tabu, by canonical key or by move attribute.
+        """
+        return self.tabu_hits / self.generated if self.generated > 0 else 0.0
+
+    def as_dict(self) -> dict:
+        return {'iterations': self.iterations,
+                'elapsed': self.get_elapsed(),
+                'generated': self.generated,
+                'evaluations': self.evaluations,
+                'evaluations_per_second': self.get_evaluations_per_second(),
+                'tabu_hits': self.tabu_hits,
+                'tabu_hit_rate': self.get_tabu_hit_rate(),
+                'backtracks': self.backtracks,
+                'phase_times': dict(self.phase_times)}
+
+    def get_postfix(self) -> dict[str, str]:
+        """
+        :return: Short fields for tqdm's set_postfix.
+        """
+        return {'evals/s': f'{self.get_evaluations_per_second():.0f}',
+                'tabu': f'{self.get_tabu_hit_rate():.1%}',
+                'backtracks': str(self.backtracks)}
+
+    def get_summary_log(self) -> str:
+        timed_total = sum(self.phase_times.values())
+        summary_log = f'- Instrumentation over {self.iterations} iterations:\n'
+        summary_log += (f'  + {self.evaluations} evaluations, {self.get_evaluations_per_second():.0f} per second, ' +
+                        f'tabu hit rate {self.get_tabu_hit_rate():.1%}, {self.backtracks} backtracks\n')
+        for phase, phase_time in self.phase_times.items():
+            share = phase_time / timed_total if timed_total > 0 else 0.0
+            summary_log += f'  + {phase}: {phase_time:.3f}s ({share:.1%})\n'
+        return summary_log
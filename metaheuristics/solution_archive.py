@@ -0,0 +1,113 @@
+import heapq
+import math
+from problems.fjs_solution import FjsSolution
+
+
+class HyperLogLog(object):
+    """
+    Approximate distinct counter over 64-bit fingerprints, 2 ** precision one-byte registers, ~1.04 / sqrt(2 ** p)
+    relative error
+    """
+    __slots__ = ('precision', 'registers')
+
+    def __init__(self, precision: int = 10):
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+
+    def add(self, fingerprint: int):
+        index = fingerprint & ((1 << self.precision) - 1)
+        remaining_bits = 64 - self.precision
+        rank = remaining_bits - (fingerprint >> self.precision).bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other: 'HyperLogLog'):
+        self.registers = bytearray(map(max, self.registers, other.registers))
+
+    def count(self) -> int:
+        number_of_registers = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / number_of_registers)
+        estimate = alpha * number_of_registers ** 2 / sum(2.0 ** -register for register in self.registers)
+        # small range correction, linear counting is much more accurate while most registers are still empty
+        number_of_empty_registers = self.registers.count(0)
+        if estimate <= 2.5 * number_of_registers and number_of_empty_registers > 0:
+            estimate = number_of_registers * math.log(number_of_registers / number_of_empty_registers)
+        return round(estimate)
+
+
+class SolutionArchive(object):
+    """
+    Bounded-memory record of every solution a search has seen: an exact elite set of the elite_size best distinct
+    solutions, plus approximate distinct counts overall and per makespan bucket. Buckets start 1 makespan wide and
+    double in width (merging sketches) whenever there would be more than max_buckets of them, so memory stays under
+    roughly (max_buckets + 1) * 2 ** precision bytes plus the elite set no matter how long the run is
+    """
+    elite_size: int
+    max_buckets: int
+    precision: int
+    bucket_width: int
+    total_added: int
+
+    def __init__(self, elite_size: int = 100, max_buckets: int = 256, precision: int = 10):
+        self.elite_size = elite_size
+        self.max_buckets = max_buckets
+        self.precision = precision
+        self.bucket_width = 1
+        self.total_added = 0
+        self.distinct_sketch = HyperLogLog(precision)
+        self.bucket_sketches: dict[int, HyperLogLog] = dict()
+        # max-heap on makespan (negated) so the worst elite is the one that gets replaced
+        self.elite_heap: list[tuple[int, int, FjsSolution]] = []
+        self.elite_fingerprints: set[int] = set()
+
+    def add(self, solution: FjsSolution, makespan: int):
+        # keyed by schedule, sequences that only interleave machines differently count once
+        fingerprint = solution.canonical_key
+        self.total_added += 1
+        self.distinct_sketch.add(fingerprint)
+
+        bucket = makespan // self.bucket_width
+        if bucket not in self.bucket_sketches:
+            self.bucket_sketches[bucket] = HyperLogLog(self.precision)
+            if len(self.bucket_sketches) > self.max_buckets:
+                self.__widen_buckets()
+                bucket = makespan // self.bucket_width
+        self.bucket_sketches[bucket].add(fingerprint)
+
+        if fingerprint in self.elite_fingerprints:
+            return
+        if len(self.elite_heap) < self.elite_size:
+            heapq.heappush(self.elite_heap, (-makespan, fingerprint, solution))
+            self.elite_fingerprints.add(fingerprint)
+        elif makespan < -self.elite_heap[0][0]:
+            _, removed_fingerprint, _ = heapq.heapreplace(self.elite_heap, (-makespan, fingerprint, solution))
+            self.elite_fingerprints.discard(removed_fingerprint)
+            self.elite_fingerprints.add(fingerprint)
+
+    def __widen_buckets(self):
+        while len(self.bucket_sketches) > self.max_buckets:
+            self.bucket_width *= 2
+            merged_sketches: dict[int, HyperLogLog] = dict()
+            for bucket, sketch in self.bucket_sketches.items():
+                merged_bucket = bucket // 2
+                if merged_bucket in merged_sketches:
+                    merged_sketches[merged_bucket].merge(sketch)
+                else:
+                    merged_sketches[merged_bucket] = sketch
+            self.bucket_sketches = merged_sketches
+
+    def distinct_count(self) -> int:
+        return self.distinct_sketch.count()
+
+    def histogram(self) -> list[tuple[int, int, int]]:
+        """
+        :return: list of (lowest makespan, highest makespan, approximate distinct solutions) sorted by makespan.
+        """
+        return [(bucket * self.bucket_width, (bucket + 1) * self.bucket_width - 1, self.bucket_sketches[bucket].count())
+                for bucket in sorted(self.bucket_sketches.keys())]
+
+    def get_elite(self) -> list[tuple[int, FjsSolution]]:
+        """
+        :return: list of (makespan, solution) of the elite set, best first.
+        """
+        return sorted([(-negative_makespan, solution) for negative_makespan, _, solution in self.elite_heap])
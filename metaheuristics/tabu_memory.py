@@ -0,0 +1,78 @@
+from collections import deque
+from problems.fjs_solution import FjsSolution
+
+
+class TabuMemory(object):
+    """
+    Per-run tabu memory. Always keeps the fingerprints of the last tabu_size visited solutions in a deque + set, so
+    push, eviction and membership are all O(1) regardless of tabu_size.
+
+    With tenure > 0 it also keeps move attributes: when a move relocates op (job, op) away from a position and a
+    machine, putting that op back at that position or on that machine is tabu for the next tenure iterations, which
+    blocks whole classes of cycling moves rather than single solutions. A tabu move is still allowed if it leads to
+    a solution better than the all-time best (aspiration)
+    """
+    tabu_size: int
+    tenure: int
+    iteration: int
+
+    def __init__(self, tabu_size: int, tenure: int = 0):
+        self.tabu_size = tabu_size
+        self.tenure = tenure
+        self.iteration = 0
+        self.fingerprint_queue: deque[int] = deque()
+        self.fingerprint_set: set[int] = set()
+        # attribute -> last iteration it is still tabu at
+        self.attribute_expiry: dict[tuple[int, int, str, int], int] = dict()
+
+    def push(self, fingerprint: int):
+        if fingerprint in self.fingerprint_set:
+            return
+        self.fingerprint_set.add(fingerprint)
+        self.fingerprint_queue.append(fingerprint)
+        while len(self.fingerprint_queue) > self.tabu_size:
+            self.fingerprint_set.remove(self.fingerprint_queue.popleft())
+
+    def __len__(self):
+        return len(self.fingerprint_queue)
+
+    def __contains__(self, fingerprint: int):
+        return fingerprint in self.fingerprint_set
+
+    def is_move_tabu(self, solution: FjsSolution, move: tuple[int, int, int]) -> bool:
+        """
+        :param solution: Solution the move is applied to.
+        :param move: Move as returned by FlexibleJobSchedulingProblem.get_random_neighbor_move.
+        :return: Whether the move puts an op back at a position or on a machine it recently left.
+        """
+        if self.tenure <= 0:
+            return False
+        from_index, to_index, machine_id = move
+        job_id = solution.ops[from_index * 3]
+        op_id = solution.ops[from_index * 3 + 1]
+        attribute_expiry = self.attribute_expiry
+        return (attribute_expiry.get((job_id, op_id, 'position', to_index), -1) >= self.iteration or
+                attribute_expiry.get((job_id, op_id, 'machine', machine_id), -1) >= self.iteration)
+
+    def forbid_move(self, solution: FjsSolution, move: tuple[int, int, int]):
+        """
+        Record the attributes an accepted move just left behind, call before advance() for the same iteration
+
+        :param solution: Solution the move was applied to.
+        :param move: The accepted move.
+        """
+        if self.tenure <= 0:
+            return
+        from_index, _, machine_id = move
+        job_id, op_id, old_machine_id = solution.get_op(from_index)
+        expiry = self.iteration + self.tenure
+        self.attribute_expiry[(job_id, op_id, 'position', from_index)] = expiry
+        if old_machine_id != machine_id:
+            self.attribute_expiry[(job_id, op_id, 'machine', old_machine_id)] = expiry
+
+    def advance(self):
+        self.iteration += 1
+        # sweep expired attributes every so often so the dict stays bounded on long runs
+        if self.tenure > 0 and self.iteration % (self.tenure * 16) == 0:
+            self.attribute_expiry = {attribute: expiry for attribute, expiry in self.attribute_expiry.items()
+                                     if expiry >= self.iteration}
@@ -1,14 +1,36 @@
 import math
+import os
+import pickle
 import time
-import heapq
+from typing import Callable
 from tqdm.auto import tqdm
 from problems.fjs import FlexibleJobSchedulingProblem
+from problems.fjs_solution import FjsSolution
+from problems.delta_evaluation import DeltaEvaluator
+from problems.disjunctive_graph import DisjunctiveGraph
+from problems.schedule_export import ScheduleExport
+from problems.initializers import SolutionInitializer
+from metaheuristics.parallel_neighborhood import ParallelNeighborhood
+from metaheuristics.run_log import LogSink, InMemoryLogSink
+from metaheuristics.solution_archive import SolutionArchive
+from metaheuristics.tabu_memory import TabuMemory
+from metaheuristics.search_stats import SearchStats
+from metaheuristics.neighborhood_sizing import NeighborhoodSizeController
 
 
 class TabuSearch(object):
     @staticmethod
     def run_fjs(fjs: FlexibleJobSchedulingProblem, number_of_iterations: int, tabu_size: int,
-                reset_threshold: int, number_of_neighbors: int, timeout_duration: float = 15.0) -> list[str]:
+                reset_threshold: int, number_of_neighbors: int, timeout_duration: float = 15.0,
+                evaluator: str = 'batch', workers: int = 0, seed: int | None = None,
+                log_sink: LogSink | None = None, archive: SolutionArchive | None = None,
+                tabu_tenure: int = 0, neighborhood: str = 'random',
+                schedule_export_path: str | None = None, on_iteration: Callable[[SearchStats], None] | None = None,
+                progress_postfix: bool = False, checkpoint_path: str | None = None,
+                checkpoint_interval: float = 300.0, resume: bool = False, target_makespan: int | None = None,
+                stall_timeout: float = -1, max_evaluations: int = -1, initializer: str = 'random',
+                number_of_initial_candidates: int = 1,
+                initial_solution: FjsSolution | None = None) -> tuple[int, list[str], str, FjsSolution]:
         """
         Run Tabu Search against a Flexible Job Shop Scheduling problem
 
@@ -16,191 +38,594 @@ class TabuSearch(object):
         :param number_of_iterations: The number of iterations to run for this tabu search
         :param tabu_size: The size of the tabu list, automatically removing older entries if exceeding this limit
         :param reset_threshold: Backtrack if algo can't find a better solution in this many iterations
-        :param number_of_neighbors: Number of neighbors to generate for each iteration before tabu filtering
+        :param number_of_neighbors: Number of neighbors to generate for each iteration before tabu filtering, -1 to let
+            a NeighborhoodSizeController pick it every iteration from the improvement rate (and the remaining time
+            and measured throughput if there is a timeout)
         :param timeout_duration: The algo will only run for this amount of time, set to -1 if endless is desired
-        :returns: tuple (best visualized solutions: list, best makespan: int, log: str)
+        :param evaluator: How neighbors are scored, 'batch' evaluates the whole neighbor set in one NumPy pass,
+            'delta' replays only the part of the current solution each move touched
+        :param workers: If > 0, generate and evaluate neighbors in this many processes (1 runs in-process), results
+            for a given seed are the same for any worker count > 0. 0 keeps the single-threaded path, which draws its
+            neighbors differently so it follows another trajectory than workers > 0 for the same seed
+        :param seed: Seed for every random draw of the search, None for a different run every time
+        :param log_sink: Where iteration records and the summary go, defaults to the full log kept in memory
+        :param archive: Bounded-memory record of explored solutions, defaults to SolutionArchive()
+        :param tabu_tenure: If > 0, also make moves that put an op back where it just came from tabu for this many
+            iterations, unless they beat the all-time best
+        :param neighborhood: 'random' relocates a random op to a random feasible slot, 'critical' only tries N5/N7 style
+            moves on the critical blocks plus machine reassignment of critical ops (sampled down to
+            number_of_neighbors if there are more, generated and evaluated in-process even with workers)
+        :param schedule_export_path: If set, write the decoded best schedule there, .csv for CSV, otherwise JSON
+        :param on_iteration: If set, called after every iteration with the run's SearchStats (per-phase times,
+            evaluations per second, tabu hit rate), don't hold on to it as it keeps changing
+        :param progress_postfix: Show evaluations per second, tabu hit rate and backtracks on the progress bar.
+            Instrumentation is only switched on if this or on_iteration is set, and goes in the summary log then
+        :param checkpoint_path: If set, save the whole search state there every checkpoint_interval seconds and once
+            more at the end, see TabuSearchRun.save_checkpoint
+        :param checkpoint_interval: Seconds between checkpoints
+        :param resume: Continue from checkpoint_path instead of starting over, the search parameters (tabu size,
+            neighbors, evaluator, ...) come from the checkpoint and the run picks up at the iteration it was saved at,
+            following the exact trajectory the uninterrupted run would have. timeout_duration counts from the resume
+        :param target_makespan: Stop as soon as the best makespan is at or below this. The run always stops once it
+            reaches fjs.lower_bound since the solution is provably optimal then
+        :param stall_timeout: Stop if the best makespan hasn't improved for this many seconds, -1 to never
+        :param max_evaluations: Stop once this many neighbors have been evaluated in total, -1 for no limit
+        :param initializer: How the starting solution is built, see SolutionInitializer
+        :param number_of_initial_candidates: For the random and grasp initializers, build this many starting
+            solutions and start from the best
+        :param initial_solution: Warm start, e.g. the best solution of an earlier run before the problem changed
+            (see FlexibleJobSchedulingProblem.freeze), repaired to fit the problem as it is now. Overrides initializer
+        :returns: tuple (best visualized solutions: list, best makespan: int, log: str, best solution: FjsSolution),
+            log is whatever the sink keeps in memory, see LogSink.get_log. The best solution is what to freeze and
+            warm start from when the problem changes
         """
-        all_solutions_dict_with_makespan_as_key: dict[int, set[str]] = dict()
-        all_solutions = []
-        all_solutions_dict_with_sol_as_key: dict[str, int] = dict()
-        best_solutions: list[str] = []
-        tabu_list: UniqueQueue = UniqueQueue()
-        initial_solution = fjs.get_random_solution()
-        current_solution = initial_solution
-        best_makespan: int = fjs.evaluate_solution(initial_solution)
-        rollback_stack: set[str] = set()
-        stuck_counter = 0
-        start_time = time.time()
-        log = ''
-        current_iteration = 0
-        timed_out = False
-        tabu_block_counter = 0
-
         init_non = number_of_neighbors
+        neighborhood_sizer = None
         if number_of_neighbors == -1:
-            number_of_neighbors = int(float(math.factorial(fjs.number_of_ops) *
-                                            (fjs.number_of_machines ** fjs.number_of_ops)) / number_of_iterations)
-        number_of_neighbors = min(500, max(50, number_of_neighbors))
+            neighborhood_sizer = NeighborhoodSizeController()
+            number_of_neighbors = neighborhood_sizer.min_size
+        else:
+            number_of_neighbors = TabuSearch.resolve_number_of_neighbors(fjs, number_of_neighbors,
+                                                                         number_of_iterations)
+        log_sink = InMemoryLogSink() if log_sink is None else log_sink
+        stats = SearchStats() if on_iteration is not None or progress_postfix else None
+        if resume:
+            search = TabuSearchRun.load_checkpoint(checkpoint_path, fjs, workers, log_sink=log_sink, stats=stats)
+        else:
+            search = TabuSearchRun(fjs, tabu_size, reset_threshold, number_of_neighbors, evaluator, workers, seed,
+                                   log_sink=log_sink, archive=archive, tabu_tenure=tabu_tenure,
+                                   neighborhood=neighborhood, stats=stats, initializer=initializer,
+                                   number_of_initial_candidates=number_of_initial_candidates,
+                                   initial_solution=None if initial_solution is None
+                                   else fjs.repair_solution(initial_solution),
+                                   neighborhood_sizer=neighborhood_sizer)
+        resumed_at = search.completed_iterations if resume else None
+        start_time = time.time()
+        if search.neighborhood_sizer is not None:
+            search.neighborhood_sizer.set_budget(start_time + timeout_duration if timeout_duration >= 0 else None,
+                                                 number_of_iterations)
+        last_improvement_time = start_time
+        last_checkpoint_time = start_time
+        best_makespan = search.best_makespan
+        stop_reason = None
 
-        for current_iteration in tqdm(range(number_of_iterations)):
-            log += f'## Iteration {current_iteration}\n'
-            current_makespan = fjs.evaluate_solution(current_solution)
-            log += f'- Current solution: {current_solution} with makespan {current_makespan}\n'
+        progress_bar = tqdm(range(search.completed_iterations, number_of_iterations),
+                            initial=search.completed_iterations, total=number_of_iterations)
+        for current_iteration in progress_bar:
             # if run time exceeds timeout duration, end prematurely
-            elapsed = time.time() - start_time
-            if elapsed >= timeout_duration:
+            now = time.time()
+            if 0 <= timeout_duration <= now - start_time:
                 print('Timed out!')
-                log += f'- !!! Timed out!\n'
-                timed_out = True
+                log_sink.record({'type': 'timeout', 'iteration': current_iteration})
+                stop_reason = 'timed out'
+                break
+            # anytime stop conditions, reaching the lower bound means nothing better exists
+            if search.best_makespan <= fjs.lower_bound:
+                stop_reason = f'reached the lower bound {fjs.lower_bound}, optimal'
+            elif target_makespan is not None and search.best_makespan <= target_makespan:
+                stop_reason = f'reached target makespan {target_makespan}'
+            elif 0 <= stall_timeout <= now - last_improvement_time:
+                stop_reason = f'no improvement for {stall_timeout}s'
+            elif 0 <= max_evaluations <= search.archive.total_added:
+                stop_reason = f'used up {max_evaluations} evaluations'
+            if stop_reason is not None:
+                print(f'Stopped early, {stop_reason}')
+                log_sink.record({'type': 'early_stop', 'iteration': current_iteration, 'reason': stop_reason})
                 break
+            if checkpoint_path is not None and now - last_checkpoint_time >= checkpoint_interval:
+                search.save_checkpoint(checkpoint_path)
+                last_checkpoint_time = now
 
-            # gen list of neighbors
-            neighbors = set()
-            for i in range(number_of_neighbors):
-                new_neighbor = fjs.get_random_neighbor_solution(current_solution)
-                neighbors.add(new_neighbor)
-                # remove neighbor who's in the tabu
-                if new_neighbor in tabu_list:  # maybe add a valid check here?
-                    neighbors.remove(new_neighbor)
-                    tabu_block_counter += 1
-            neighbor_solutions_with_makespan = dict()
-            neighbors = list(neighbors)
+            search.iterate()
+            if search.best_makespan < best_makespan:
+                best_makespan = search.best_makespan
+                last_improvement_time = time.time()
+            if on_iteration is not None:
+                on_iteration(stats)
+            # formatting the postfix isn't free, tqdm only redraws a few times a second anyway
+            if progress_postfix and current_iteration % 16 == 0:
+                progress_bar.set_postfix(stats.get_postfix(), refresh=False)
+
+        search.close()
+        if checkpoint_path is not None:
+            search.save_checkpoint(checkpoint_path)
+
+        # actually finish making the final solution
+        # string results are only partially completed and may yield duplicate result
+        visualized_best_solutions = search.get_visualized_best_solutions()
+        if schedule_export_path is not None:
+            ScheduleExport.write(fjs.get_full_schedule(search.get_best_solution()), schedule_export_path)
+
+        # logging
+        header_log = '# Tabu search summary\n'
+        header_log += f'- Input obtained from {fjs.input_file}:\n\n'
+        with open(fjs.input_file, 'rt') as f:
+            header_log += f.read() + '\n\n'
+        if len(fjs.changes) > 0:
+            header_log += f'- Problem changed since it was loaded: {", ".join(fjs.changes)}\n'
+        header_log += (f'- Completed {search.completed_iterations} out of {number_of_iterations} iterations' +
+                       (f' ({stop_reason})' if stop_reason is not None else '') + '\n')
+        if resumed_at is not None:
+            header_log += f'- Resumed from {checkpoint_path} at iteration {resumed_at}\n'
+        header_log += f'- number_of_iteration was {number_of_iterations}\n'
+        # taken from the run rather than the arguments, a resumed run keeps the checkpoint's parameters
+        header_log += f'- tabu_size was {search.tabu_size}\n'
+        header_log += f'- tabu_tenure was {search.tabu_list.tenure}\n'
+        header_log += f'- reset_threshold was {search.reset_threshold}\n'
+        if search.neighborhood_sizer is None:
+            header_log += f'- number_of_neighbors was {init_non} -> {search.number_of_neighbors}\n'
+        else:
+            header_log += f'- number_of_neighbors was {init_non} -> adaptive\n'
+            header_log += search.neighborhood_sizer.get_summary_log()
+        header_log += f'- timeout_duration was {timeout_duration}\n'
+        header_log += f'- target_makespan was {target_makespan}\n'
+        header_log += f'- stall_timeout was {stall_timeout}\n'
+        header_log += f'- max_evaluations was {max_evaluations}\n'
+        if initial_solution is not None:
+            header_log += '- warm started from the given solution, starting makespan ' + \
+                          f'{fjs.evaluate_solution(search.initial_solution)}\n'
+        else:
+            header_log += f'- initializer was {initializer} (best of {number_of_initial_candidates}), ' + \
+                          f'starting makespan {fjs.evaluate_solution(search.initial_solution)}\n'
+        header_log += f'- neighborhood was {search.neighborhood}\n'
+        header_log += f'- evaluator was {search.evaluator}\n'
+        header_log += f'- workers was {workers}\n'
+        header_log += f'- seed was {seed}\n'
+        header_log += f'- log_interval was {log_sink.log_interval}\n'
+        header_log += search.get_summary_log(visualized_best_solutions)
+        if stats is not None:
+            header_log += stats.get_summary_log()
+
+        log_sink.write_summary(header_log)
+        log_sink.close()
+
+        return search.best_makespan, visualized_best_solutions, log_sink.get_log(), search.get_best_solution()
+
+    @staticmethod
+    def get_lower_bound_log(fjs: FlexibleJobSchedulingProblem, best_makespan: int) -> str:
+        gap = (best_makespan - fjs.lower_bound) / best_makespan if best_makespan > 0 else 0.0
+        return (f'- Lower bound was {fjs.lower_bound}, optimality gap {gap:.2%}' +
+                (' (proven optimal)' if best_makespan <= fjs.lower_bound else '') + '\n')
+
+    @staticmethod
+    def resolve_number_of_neighbors(fjs: FlexibleJobSchedulingProblem, number_of_neighbors: int,
+                                    number_of_iterations: int) -> int:
+        if number_of_neighbors == -1:
+            # ops! * machines^ops / iterations, in log space since the product overflows a float past ~150 ops
+            log_number_of_neighbors = (math.lgamma(fjs.number_of_ops + 1) +
+                                       fjs.number_of_ops * math.log(max(1, fjs.number_of_machines)) -
+                                       math.log(max(1, number_of_iterations)))
+            number_of_neighbors = 500 if log_number_of_neighbors > math.log(500) else \
+                int(math.exp(log_number_of_neighbors))
+        return min(500, max(50, number_of_neighbors))
+
+
+class TabuSearchRun(object):
+    """
+    State of a single tabu search trajectory, advanced one iteration at a time so drivers (run_fjs, islands) can
+    interleave their own logic between iterations
+    """
+    CHECKPOINT_VERSION = 3
+    fjs: FlexibleJobSchedulingProblem
+    tabu_size: int
+    reset_threshold: int
+    number_of_neighbors: int
+    evaluator: str
+    neighborhood: str
+    tabu_list: TabuMemory
+    initial_solution: FjsSolution
+    current_solution: FjsSolution
+    best_makespan: int
+    best_solutions: list[FjsSolution]
+    completed_iterations: int
+    log_sink: LogSink
+    archive: SolutionArchive
+    stats: SearchStats | None
+    neighborhood_sizer: NeighborhoodSizeController | None
+
+    def __init__(self, fjs: FlexibleJobSchedulingProblem, tabu_size: int, reset_threshold: int,
+                 number_of_neighbors: int, evaluator: str = 'batch', workers: int = 0, seed: int | None = None,
+                 initial_solution: FjsSolution | None = None, log_sink: LogSink | None = None,
+                 archive: SolutionArchive | None = None, tabu_tenure: int = 0, neighborhood: str = 'random',
+                 stats: SearchStats | None = None, initializer: str = 'random', number_of_initial_candidates: int = 1,
+                 neighborhood_sizer: NeighborhoodSizeController | None = None):
+        if seed is not None:
+            fjs.seed(seed)
+        self.fjs = fjs
+        self.tabu_size = tabu_size
+        self.reset_threshold = reset_threshold
+        self.number_of_neighbors = number_of_neighbors
+        self.evaluator = evaluator
+        self.neighborhood = neighborhood
+        self.archive = SolutionArchive() if archive is None else archive
+        self.best_solutions = []
+        self.best_solution_keys: set[int] = set()
+        self.tabu_list = TabuMemory(tabu_size, tabu_tenure)
+        if initial_solution is None:
+            initial_solution = SolutionInitializer.get_initial_solution(fjs, initializer, number_of_initial_candidates)
+        self.initial_solution = initial_solution
+        self.current_solution = self.initial_solution
+        self.best_makespan = fjs.evaluate_solution(self.initial_solution)
+        # the start is the best so far, a run that stops right away still has a solution to show
+        self.add_best_solutions([self.initial_solution])
+        # insertion ordered so backtracking picks the latest target, and so that order survives a checkpoint
+        self.rollback_stack: dict[FjsSolution, None] = dict()
+        self.stuck_counter = 0
+        self.tabu_block_counter = 0
+        # neighbors dropped because another neighbor of the same iteration already had their schedule
+        self.duplicate_counter = 0
+        self.completed_iterations = 0
+        # summary-only by default, drivers that keep a log pass their own sink
+        self.log_sink = LogSink() if log_sink is None else log_sink
+        # instrumentation is opt-in, every hook in iterate is behind a None check
+        self.stats = stats
+        # if set, overrides number_of_neighbors at the start of every iteration
+        self.neighborhood_sizer = neighborhood_sizer
+        self.parallel_neighborhood = None
+        if workers > 0 and neighborhood == 'random':
+            self.parallel_neighborhood = ParallelNeighborhood(fjs, workers)
+
+    def iterate(self):
+        fjs = self.fjs
+        tabu_list = self.tabu_list
+        current_solution = self.current_solution
+        best_makespan = self.best_makespan
+        stats = self.stats
+        neighborhood_sizer = self.neighborhood_sizer
+        if neighborhood_sizer is not None:
+            self.number_of_neighbors = neighborhood_sizer.get_size(self.completed_iterations)
+            iteration_start_time = time.perf_counter()
+        if stats is not None:
+            stats.start_iteration()
+            tabu_block_counter_before = self.tabu_block_counter
+        # only build a record (and stringify solutions) if the sink is going to keep it
+        record = None
+        if self.log_sink.wants(self.completed_iterations):
+            record = {'type': 'iteration', 'iteration': self.completed_iterations}
+        # workers score their neighbors themselves, a delta evaluator would only be built to be thrown away
+        if self.evaluator == 'delta' and self.parallel_neighborhood is None:
+            delta_evaluator = DeltaEvaluator(fjs, current_solution)
+            current_makespan = delta_evaluator.makespan
+        elif record is not None:
+            current_makespan = fjs.evaluate_solution(current_solution)
+        if record is not None:
+            record['current_solution'] = str(current_solution)
+            record['current_makespan'] = current_makespan
+        if stats is not None:
+            stats.lap('evaluation')
+
+        # gen list of neighbors, keeping the move that produced each one for delta evaluation and attribute tabu
+        neighbors_with_move: dict[FjsSolution, tuple[int, int, int]] = dict()
+        if self.parallel_neighborhood is not None:
+            # workers generate and evaluate in one go, only tabu filtering happens here
+            neighbors_with_makespan: dict[FjsSolution, int] = dict()
+            generated_neighbors = self.parallel_neighborhood.generate(current_solution, fjs.rng.getrandbits(48),
+                                                                      self.number_of_neighbors)
+            number_generated = len(generated_neighbors)
+            if stats is not None:
+                # evaluation happens in the workers, so with workers it is counted as generation
+                stats.lap('generation')
+            FjsSolution.compute_canonical_keys([new_neighbor for new_neighbor, _, _ in generated_neighbors])
+            seen_keys = {current_solution.canonical_key}
+            for new_neighbor, makespan, move in generated_neighbors:
+                canonical_key = new_neighbor.canonical_key
+                # another sequence of the current schedule or of one already in the neighborhood
+                if canonical_key in seen_keys:
+                    self.duplicate_counter += 1
+                elif canonical_key in tabu_list:
+                    self.tabu_block_counter += 1
+                else:
+                    seen_keys.add(canonical_key)
+                    neighbors_with_makespan[new_neighbor] = makespan
+                    neighbors_with_move[new_neighbor] = move
+            neighbors = list(neighbors_with_makespan.keys())
+            neighbor_makespans = list(neighbors_with_makespan.values())
+            if stats is not None:
+                stats.lap('tabu_filtering')
+        else:
+            moves = None
+            if self.neighborhood == 'critical':
+                moves = DisjunctiveGraph(fjs, current_solution).get_critical_moves()
+                if len(moves) > self.number_of_neighbors:
+                    moves = fjs.rng.sample(moves, self.number_of_neighbors)
+            # random neighborhood, or nothing critical to try (e.g. a single op on the critical path)
+            if not moves:
+                moves = [fjs.get_random_neighbor_move(current_solution) for i in range(self.number_of_neighbors)]
+            new_neighbors = [fjs.apply_move(current_solution, move) for move in moves]
+            number_generated = len(new_neighbors)
+            if stats is not None:
+                stats.lap('generation')
+            # tabu and dedup work on canonical keys, computed for the whole neighborhood in one batch
+            FjsSolution.compute_canonical_keys(new_neighbors)
+            # the current schedule counts as seen, moves that only reinterleave machines lead nowhere
+            seen_keys = {current_solution.canonical_key}
+            for move, new_neighbor in zip(moves, new_neighbors):
+                canonical_key = new_neighbor.canonical_key
+                # another sequence of a schedule already in the neighborhood, evaluating it again is wasted work
+                if canonical_key in seen_keys:
+                    self.duplicate_counter += 1
+                # remove neighbor who's in the tabu, tabu only keeps canonical keys
+                elif canonical_key in tabu_list:  # maybe add a valid check here?
+                    self.tabu_block_counter += 1
+                else:
+                    seen_keys.add(canonical_key)
+                    neighbors_with_move[new_neighbor] = move
+            neighbors = list(neighbors_with_move.keys())
+            if stats is not None:
+                stats.lap('tabu_filtering')
+
+            # eval make span for all neighbors, either in one batch or move by move
+            if self.evaluator == 'delta':
+                neighbor_makespans = [delta_evaluator.evaluate_move(move)
+                                      for move in neighbors_with_move.values()]
+            else:
+                neighbor_makespans = fjs.evaluate_solutions(neighbors)
+            if stats is not None:
+                stats.lap('evaluation')
+        number_evaluated = len(neighbors)
 
-            # eval make span for all neighbors
-            # add every new sol to all sol list
-            for neighbor_solution in neighbors:
-                makespan = fjs.evaluate_solution(neighbor_solution)
+        # add every new sol to the archive
+        for neighbor_solution, makespan in zip(neighbors, neighbor_makespans):
+            self.archive.add(neighbor_solution, makespan)
+        if stats is not None:
+            stats.lap('archive')
+
+        # attribute tabu, drop neighbors reached through a tabu move unless they beat the all-time best (aspiration)
+        # if that would drop every neighbor, ignore the attributes for this iteration instead of stalling
+        if tabu_list.tenure > 0:
+            admissible_indices = [index for index, neighbor_solution in enumerate(neighbors)
+                                  if neighbor_makespans[index] < best_makespan or
+                                  not tabu_list.is_move_tabu(current_solution, neighbors_with_move[neighbor_solution])]
+            if 0 < len(admissible_indices) < len(neighbors):
+                self.tabu_block_counter += len(neighbors) - len(admissible_indices)
+                neighbors = [neighbors[index] for index in admissible_indices]
+                neighbor_makespans = [neighbor_makespans[index] for index in admissible_indices]
+            if stats is not None:
+                stats.lap('tabu_filtering')
+
+        if len(neighbors) == 0:
+            # every neighbor was tabu or a duplicate, count it as a stuck iteration so backtracking kicks in eventually
+            self.stuck_counter += 1
+            if record is not None:
+                record['best_makespan'] = best_makespan
+                record['iteration_best_makespan'] = None
+                record['stuck_counter'] = self.stuck_counter
+                record['reset_threshold'] = self.reset_threshold
+        else:
+            neighbor_solutions_with_makespan = dict()
+            for neighbor_solution, makespan in zip(neighbors, neighbor_makespans):
                 if makespan not in neighbor_solutions_with_makespan:
                     neighbor_solutions_with_makespan[makespan] = set()
                 neighbor_solutions_with_makespan[makespan].add(neighbor_solution)
-                if makespan not in all_solutions_dict_with_makespan_as_key:
-                    lst = set()
-                    all_solutions_dict_with_makespan_as_key[makespan] = lst
-                all_solutions_dict_with_makespan_as_key[makespan].add(neighbor_solution)
-                if neighbor_solution not in all_solutions_dict_with_sol_as_key:
-                    all_solutions_dict_with_sol_as_key[neighbor_solution] = makespan
-                    heapq.heappush(all_solutions, neighbor_solution)
             makespans = list(neighbor_solutions_with_makespan.keys())
             best_makespan_this_iter = min(makespans)
-            log += f'- All-time best makespan: {best_makespan}\n'
-            log += f'- This iteration\'s best makespan: {best_makespan_this_iter}\n'
+            if record is not None:
+                record['best_makespan'] = best_makespan
+                record['iteration_best_makespan'] = best_makespan_this_iter
 
             # best neighbors of this iter
             best_neighbors = sorted(neighbor_solutions_with_makespan[best_makespan_this_iter])
 
             # if there are sols with similar makespans, add them to current best sol list
+            # one solution per schedule, on a plateau the same schedules keep coming back as other sequences
             if best_makespan_this_iter == best_makespan or best_makespan == -1:
-                best_solutions += best_neighbors
+                self.add_best_solutions(best_neighbors)
             # if there are better sols, update all-time bests, else increase stuck counter
             if best_makespan_this_iter < best_makespan or best_makespan == -1:
-                best_makespan = best_makespan_this_iter
-                best_solutions = best_neighbors
-                stuck_counter = 0
+                self.best_makespan = best_makespan_this_iter
+                self.best_solutions = []
+                self.best_solution_keys = set()
+                self.add_best_solutions(best_neighbors)
+                self.stuck_counter = 0
             else:
-                stuck_counter += 1
-                log += f'- Stuck counter: {stuck_counter}/{reset_threshold}\n'
+                self.stuck_counter += 1
+                if record is not None:
+                    record['stuck_counter'] = self.stuck_counter
+                    record['reset_threshold'] = self.reset_threshold
 
-            tabu_list.push(best_neighbors[0])
-            while len(tabu_list) > tabu_size:
-                tabu_list.pop()
-            current_solution = best_neighbors[0]
+            tabu_list.push(best_neighbors[0].canonical_key)
+            tabu_list.forbid_move(current_solution, neighbors_with_move[best_neighbors[0]])
+            self.current_solution = best_neighbors[0]
             for best_neighbor in reversed(best_neighbors):
-                rollback_stack.add(best_neighbor)
-
-            # if stuck for too long, backtrack to an earlier neighbor
-            if stuck_counter >= reset_threshold:
-                stuck_counter = 0
-                tmp_rollback_stack = rollback_stack.copy()
-                rollback_solution = None
-                # choose backtrack target that's not in tabu, if none is found then use initial sol
-                while len(tmp_rollback_stack) > 0:
-                    rollback_solution = tmp_rollback_stack.pop()
-                    # if backtrack is in tabu then reject it to make it consistent with when filtering new neighbors
-                    if rollback_solution in tabu_list:
-                        rollback_solution = None
-                    # add backtrack target to tabu to make it consistent with when promoting a better neighbor
-                    else:
-                        tabu_list.push(rollback_solution)
-                        while len(tabu_list) > tabu_size:
-                            tabu_list.pop()
-                        break
-                # if can't find any valid rollback then use initial sol
-                if rollback_solution is None:
-                    rollback_solution = initial_solution
-                current_solution = rollback_solution
-                rollback_makespan = fjs.evaluate_solution(current_solution)
-                log += f'- !!! Stuck for too long, backtracking to {current_solution} with makespan {rollback_makespan}!\n'
-
-            log += '\n'
+                self.rollback_stack[best_neighbor] = None
+        if stats is not None:
+            stats.lap('selection')
 
-        # actually finish making the final solution
-        # string results are only partially completed and may yield duplicate result
-        visualized_best_solutions = list(set([fjs.get_evaluated_visualization(sol) for sol in best_solutions]))
+        # if stuck for too long, backtrack to an earlier neighbor
+        backtracked = self.stuck_counter >= self.reset_threshold
+        if backtracked:
+            self.stuck_counter = 0
+            rollback_solution = None
+            # choose backtrack target that's not in tabu, if none is found then use initial sol
+            for rollback_solution in reversed(self.rollback_stack):
+                # if backtrack is in tabu then reject it to make it consistent with when filtering new neighbors
+                if rollback_solution.canonical_key in tabu_list:
+                    rollback_solution = None
+                # add backtrack target to tabu to make it consistent with when promoting a better neighbor
+                else:
+                    tabu_list.push(rollback_solution.canonical_key)
+                    break
+            # if can't find any valid rollback then use initial sol
+            if rollback_solution is None:
+                rollback_solution = self.initial_solution
+            self.current_solution = rollback_solution
+            if record is not None:
+                record['backtrack_solution'] = str(self.current_solution)
+                record['backtrack_makespan'] = fjs.evaluate_solution(self.current_solution)
 
-        # logging
-        header_log = '# Tabu search summary\n'
-        header_log += f'- Input obtained from {fjs.input_file}:\n\n'
-        with open(fjs.input_file, 'rt') as f:
-            header_log += f.read() + '\n\n'
-        num_of_completed_iterations = current_iteration if timed_out else current_iteration + 1
-        header_log += f'- Completed {num_of_completed_iterations} out of {number_of_iterations} iterations\n'
-        header_log += f'- number_of_iteration was {number_of_iterations}\n'
-        header_log += f'- tabu_size was {tabu_size}\n'
-        header_log += f'- reset_threshold was {reset_threshold}\n'
-        header_log += f'- number_of_neighbors was {init_non} -> {number_of_neighbors}\n'
-        header_log += f'- timeout_duration was {timeout_duration}\n'
-        num_of_all_sols = sum([len(x) for x in all_solutions_dict_with_makespan_as_key.values()])
-        header_log += (f'- Explored {num_of_all_sols} ' +
-                       'unique string solutions, distribution is as follows:\n')
-        for key in sorted(all_solutions_dict_with_makespan_as_key.keys()):
-            num_of_sols = len(all_solutions_dict_with_makespan_as_key[key])
-            percentage = '{:.2f}'.format((float(num_of_sols) / float(num_of_all_sols) * 100))
-            header_log += f'  + Makespan of {key}: {num_of_sols} unique string solutions ({percentage}%)\n'
-        header_log += f'- Tabu list prevented {tabu_block_counter} unique string solutions from being revisited\n'
-        # header_log += f'- Best makespan found was {min(all_solutions_dict_with_makespan_as_key.keys())}\n'
-        header_log += f'- Best makespan found was {best_makespan}\n'
-        header_log += f'- Found these unique visualized solutions with makespan of {best_makespan}:\n'
-        for uvs in visualized_best_solutions:
-            header_log += f'\n{uvs}\n'
+        if stats is not None:
+            stats.lap('backtracking')
+            stats.end_iteration(number_generated, number_evaluated, self.tabu_block_counter - tabu_block_counter_before,
+                                backtracked)
 
-        log = header_log + '\n# Tabu search details\n' + log
+        if neighborhood_sizer is not None:
+            neighborhood_sizer.update(self.best_makespan, time.perf_counter() - iteration_start_time)
+        if record is not None:
+            self.log_sink.record(record)
+        tabu_list.advance()
+        self.completed_iterations += 1
 
-        # Do not uncomment this unless you can plot this in a real plot with a real plotting lib
-        # or if you like flooding your log file with a LOT of ########
-        # sol_space_log = '\n# Solution space visualization, sorted by string solution\n'
-        # while len(all_solutions) > 0:
-        #     solution = heapq.heappop(all_solutions)
-        #     makespan = all_solutions_dict_with_sol_as_key[solution]
-        #     sol_space_log += ''.ljust(makespan, '#') + '\n'
-        #
-        # log = log + sol_space_log
+    def migrate(self, solution: FjsSolution, makespan: int) -> bool:
+        """
+        Offer a solution found elsewhere (e.g. another island), it is only taken if it beats this run's best
+
+        :param solution: Immigrant solution in array format.
+        :param makespan: Its makespan.
+        :return: Whether the immigrant was accepted and became the current solution.
+        """
+        if makespan >= self.best_makespan:
+            return False
+        self.best_makespan = makespan
+        self.best_solutions = [solution]
+        self.best_solution_keys = {solution.canonical_key}
+        self.current_solution = solution
+        self.rollback_stack[solution] = None
+        self.stuck_counter = 0
+        self.tabu_list.push(solution.canonical_key)
+        self.log_sink.record({'type': 'migration', 'solution': str(solution), 'makespan': makespan})
+        return True
+
+    def add_best_solutions(self, solutions: list[FjsSolution]):
+        """
+        :param solutions: Solutions with the current best makespan, the ones whose schedule is already kept are skipped.
+        """
+        # a plateau can hold any number of distinct schedules, only the first archive.elite_size found are kept
+        best_solutions_limit = max(1, self.archive.elite_size)
+        for solution in solutions:
+            if len(self.best_solutions) >= best_solutions_limit:
+                break
+            if solution.canonical_key not in self.best_solution_keys:
+                self.best_solution_keys.add(solution.canonical_key)
+                self.best_solutions.append(solution)
 
-        return best_makespan, visualized_best_solutions, log
+    def get_best_solution(self) -> FjsSolution:
+        return min(self.best_solutions)
 
+    def save_checkpoint(self, path: str):
+        """
+        Pickle everything the trajectory depends on (solutions, tabu memory, rollback targets, archive, counters and
+        the problem's RNG state), written to a temp file first so a kill mid-write leaves the previous checkpoint intact
 
-class UniqueQueue(object):
-    inner_set = set()
-    inner_list = []
+        :param path: Checkpoint file path.
+        """
+        state = {'version': TabuSearchRun.CHECKPOINT_VERSION,
+                 'input_file': self.fjs.input_file,
+                 'number_of_ops': self.fjs.number_of_ops,
+                 'tabu_size': self.tabu_size,
+                 'reset_threshold': self.reset_threshold,
+                 'number_of_neighbors': self.number_of_neighbors,
+                 'evaluator': self.evaluator,
+                 'neighborhood': self.neighborhood,
+                 'tabu_list': self.tabu_list,
+                 'archive': self.archive,
+                 'initial_solution': self.initial_solution,
+                 'current_solution': self.current_solution,
+                 'best_makespan': self.best_makespan,
+                 'best_solutions': self.best_solutions,
+                 'rollback_stack': list(self.rollback_stack),
+                 'stuck_counter': self.stuck_counter,
+                 'tabu_block_counter': self.tabu_block_counter,
+                 'duplicate_counter': self.duplicate_counter,
+                 'completed_iterations': self.completed_iterations,
+                 'neighborhood_sizer': self.neighborhood_sizer,
+                 'rng_state': self.fjs.rng.getstate()}
+        temporary_path = path + '.tmp'
+        with open(temporary_path, 'wb') as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary_path, path)
 
-    def push(self, item):
-        if item in self.inner_set:
-            return
-        self.inner_set.add(item)
-        self.inner_list.append(item)
+    @staticmethod
+    def load_checkpoint(path: str, fjs: FlexibleJobSchedulingProblem, workers: int = 0,
+                        log_sink: LogSink | None = None, stats: SearchStats | None = None) -> 'TabuSearchRun':
+        """
+        :param path: Checkpoint written by save_checkpoint.
+        :param fjs: The same problem the checkpointed run was solving, its RNG is restored too.
+        :param workers: Worker processes to use from now on, doesn't change the trajectory as long as it is 0 or > 0
+            in both the checkpointed and the resumed run.
+        :param log_sink: Sink for the resumed part of the run.
+        :param stats: Instrumentation for the resumed part of the run.
+        :return: A run that continues exactly where the checkpointed one stopped.
+        """
+        with open(path, 'rb') as f:
+            state = pickle.load(f)
+        if state['version'] != TabuSearchRun.CHECKPOINT_VERSION:
+            raise ValueError(f'Checkpoint {path} has version {state["version"]}, ' +
+                             f'expected {TabuSearchRun.CHECKPOINT_VERSION}')
+        if state['number_of_ops'] != fjs.number_of_ops:
+            raise ValueError(f'Checkpoint {path} was made for {state["input_file"]}, not {fjs.input_file}')
+        search = TabuSearchRun(fjs, state['tabu_size'], state['reset_threshold'], state['number_of_neighbors'],
+                               state['evaluator'], workers, initial_solution=state['initial_solution'],
+                               log_sink=log_sink, archive=state['archive'], neighborhood=state['neighborhood'],
+                               stats=stats, neighborhood_sizer=state['neighborhood_sizer'])
+        search.tabu_list = state['tabu_list']
+        search.current_solution = state['current_solution']
+        search.best_makespan = state['best_makespan']
+        # older checkpoints could hold none if no neighbor ever matched the initial solution
+        search.best_solutions = state['best_solutions'] or [search.initial_solution]
+        search.best_solution_keys = set(FjsSolution.compute_canonical_keys(search.best_solutions))
+        search.rollback_stack = dict.fromkeys(state['rollback_stack'])
+        search.stuck_counter = state['stuck_counter']
+        search.tabu_block_counter = state['tabu_block_counter']
+        search.duplicate_counter = state['duplicate_counter']
+        search.completed_iterations = state['completed_iterations']
+        fjs.rng.setstate(state['rng_state'])
+        return search
 
-    def pop(self):
-        item = self.inner_list.pop(0)
-        self.inner_set.remove(item)
-        return item
+    def close(self):
+        if self.parallel_neighborhood is not None:
+            self.parallel_neighborhood.close()
+            self.parallel_neighborhood = None
 
-    def remove(self, item):
-        if item not in self:
-            return
-        self.inner_set.remove(item)
-        self.inner_list.remove(item)
+    def get_visualized_best_solutions(self) -> list[str]:
+        return [self.fjs.get_visualization(sol) for sol in self.fjs.get_unique_schedules(self.best_solutions)]
 
-    def __len__(self):
-        return len(self.inner_list)
+    def get_summary_log(self, visualized_best_solutions: list[str]) -> str:
+        header_log = ''
+        # counts are HyperLogLog estimates, exact-ish while small and within a few percent after that
+        histogram = self.archive.histogram()
+        num_of_all_sols = max(1, sum([num_of_sols for _, _, num_of_sols in histogram]))
+        header_log += (f'- Explored ~{self.archive.distinct_count()} ' +
+                       f'unique schedules ({self.archive.total_added} evaluated), ' +
+                       'distribution is as follows:\n')
+        for lowest_makespan, highest_makespan, num_of_sols in histogram:
+            key = lowest_makespan if lowest_makespan == highest_makespan else f'{lowest_makespan}-{highest_makespan}'
+            percentage = '{:.2f}'.format((float(num_of_sols) / float(num_of_all_sols) * 100))
+            header_log += f'  + Makespan of {key}: ~{num_of_sols} unique schedules ({percentage}%)\n'
+        header_log += (f'- Tabu list prevented {self.tabu_block_counter} ' +
+                       'unique schedules from being revisited\n')
+        header_log += (f'- Skipped {self.duplicate_counter} neighbors that were another sequence of the current ' +
+                       'schedule or of one already in their neighborhood\n')
+        evaluation_cache = self.fjs.evaluation_cache
+        if evaluation_cache is not None:
+            header_log += (f'- Evaluation cache answered {evaluation_cache.hits} of ' +
+                           f'{evaluation_cache.hits + evaluation_cache.misses} lookups ' +
+                           f'({evaluation_cache.get_hit_rate():.2%}), holding {len(evaluation_cache)} makespans\n')
+        # header_log += f'- Best makespan found was {min(all_solutions_dict_with_makespan_as_key.keys())}\n'
+        header_log += f'- Best makespan found was {self.best_makespan}\n'
+        header_log += TabuSearch.get_lower_bound_log(self.fjs, self.best_makespan)
+        header_log += (f'- Found these unique visualized solutions with makespan of {self.best_makespan} ' +
+                       f'(at most {max(1, self.archive.elite_size)} are kept):\n')
+        for uvs in visualized_best_solutions:
+            header_log += f'\n{uvs}\n'
 
-    def __contains__(self, item):
-        return item in self.inner_set
+        return header_log
@@ -0,0 +1,84 @@
+from problems.fjs import FlexibleJobSchedulingProblem
+from problems.fjs_solution import FjsSolution
+
+
+class DeltaEvaluator(object):
+    """
+    Evaluates single relocate/reassign moves against one fixed solution by caching the machine and job ready times
+    before every position, so a move only replays the sequence from min(from_index, to_index) onward and stops as
+    soon as the replayed state matches the cached one again
+    """
+    fjs: FlexibleJobSchedulingProblem
+    solution: FjsSolution
+    makespan: int
+    # ready times *before* the op at each position is scheduled, index n holds the final state
+    machine_ready_prefix: list[list[int]]
+    job_ready_prefix: list[list[int]]
+
+    def __init__(self, fjs: FlexibleJobSchedulingProblem, solution: FjsSolution):
+        self.fjs = fjs
+        self.solution = solution
+        self.machine_ready_prefix = []
+        self.job_ready_prefix = []
+
+        time_required_for_job_op = fjs.time_required_for_job_op
+        ops = solution.ops
+        machine_ready_times = fjs.machine_release_times[:]
+        job_ready_times = fjs.job_release_times[:]
+        for index in range(0, len(ops), 3):
+            self.machine_ready_prefix.append(machine_ready_times[:])
+            self.job_ready_prefix.append(job_ready_times[:])
+            job_id = ops[index]
+            machine_id = ops[index + 2]
+            end_time = (max(machine_ready_times[machine_id], job_ready_times[job_id]) +
+                        time_required_for_job_op[job_id][ops[index + 1]][machine_id])
+            machine_ready_times[machine_id] = end_time
+            job_ready_times[job_id] = end_time
+        self.machine_ready_prefix.append(machine_ready_times[:])
+        self.job_ready_prefix.append(job_ready_times[:])
+
+        # the first op in any sequence starts at t=0 (or a release time), so makespan is the latest machine end time
+        self.makespan = max(machine_ready_times)
+
+    def evaluate_move(self, move: tuple[int, int, int]) -> int:
+        """
+        :param move: Move as returned by FlexibleJobSchedulingProblem.get_random_neighbor_move.
+        :return: Makespan of FlexibleJobSchedulingProblem.apply_move(self.solution, move).
+        """
+        from_index, to_index, new_machine_id = move
+        ops = self.solution.ops
+        time_required_for_job_op = self.fjs.time_required_for_job_op
+        start_index = min(from_index, to_index)
+        end_index = max(from_index, to_index)
+        machine_ready_times = self.machine_ready_prefix[start_index][:]
+        job_ready_times = self.job_ready_prefix[start_index][:]
+
+        # positions [start_index, end_index] are the only ones whose order changed
+        if from_index < to_index:
+            changed_positions = list(range(from_index + 1, to_index + 1)) + [from_index]
+        else:
+            changed_positions = [from_index] + list(range(to_index, from_index))
+
+        for position in changed_positions:
+            offset = position * 3
+            job_id = ops[offset]
+            machine_id = new_machine_id if position == from_index else ops[offset + 2]
+            end_time = (max(machine_ready_times[machine_id], job_ready_times[job_id]) +
+                        time_required_for_job_op[job_id][ops[offset + 1]][machine_id])
+            machine_ready_times[machine_id] = end_time
+            job_ready_times[job_id] = end_time
+
+        # past end_index the sequence is the same as the cached one, once the states converge so does the rest
+        for position in range(end_index + 1, len(ops) // 3):
+            if (job_ready_times == self.job_ready_prefix[position] and
+                    machine_ready_times == self.machine_ready_prefix[position]):
+                return self.makespan
+            offset = position * 3
+            job_id = ops[offset]
+            machine_id = ops[offset + 2]
+            end_time = (max(machine_ready_times[machine_id], job_ready_times[job_id]) +
+                        time_required_for_job_op[job_id][ops[offset + 1]][machine_id])
+            machine_ready_times[machine_id] = end_time
+            job_ready_times[job_id] = end_time
+
+        return max(machine_ready_times)
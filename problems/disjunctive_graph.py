@@ -0,0 +1,141 @@
+from problems.fjs import FlexibleJobSchedulingProblem
+from problems.fjs_solution import FjsSolution
+
+
+class DisjunctiveGraph(object):
+    """
+    Disjunctive graph view of a decoded solution: every op (identified by its sequence position) has at most one job
+    predecessor (previous op of the same job) and one machine predecessor (previous op on the same machine in the
+    sequence), and starts as soon as both are done, exactly like evaluate_solution decodes it.
+
+    A critical path is a chain of ops with no idle time between them that ends at the makespan, a critical block is
+    a maximal run of consecutive critical ops on the same machine. Only moves touching critical ops can shorten the
+    makespan, which is what the critical neighborhood exploits
+    """
+    fjs: FlexibleJobSchedulingProblem
+    solution: FjsSolution
+    start_times: list[int]
+    end_times: list[int]
+    job_predecessors: list[int]
+    job_successors: list[int]
+    machine_predecessors: list[int]
+    makespan: int
+    critical_path: list[int]
+    critical_blocks: list[list[int]]
+
+    def __init__(self, fjs: FlexibleJobSchedulingProblem, solution: FjsSolution):
+        self.fjs = fjs
+        self.solution = solution
+        ops = solution.ops
+        number_of_ops = len(ops) // 3
+        self.start_times = [0] * number_of_ops
+        self.end_times = [0] * number_of_ops
+        self.job_predecessors = [-1] * number_of_ops
+        self.job_successors = [number_of_ops] * number_of_ops
+        self.machine_predecessors = [-1] * number_of_ops
+        last_index_for_job = [-1] * fjs.number_of_jobs
+        last_index_for_machine = [-1] * fjs.number_of_machines
+
+        for index in range(number_of_ops):
+            job_id, op_id, machine_id = ops[index * 3], ops[index * 3 + 1], ops[index * 3 + 2]
+            job_predecessor = last_index_for_job[job_id]
+            machine_predecessor = last_index_for_machine[machine_id]
+            self.job_predecessors[index] = job_predecessor
+            self.machine_predecessors[index] = machine_predecessor
+            if job_predecessor != -1:
+                self.job_successors[job_predecessor] = index
+            # ops without a predecessor start at their job's or machine's release time, 0 unless frozen ops came first
+            start_time = max(self.end_times[job_predecessor] if job_predecessor != -1
+                             else fjs.job_release_times[job_id],
+                             self.end_times[machine_predecessor] if machine_predecessor != -1
+                             else fjs.machine_release_times[machine_id])
+            self.start_times[index] = start_time
+            self.end_times[index] = start_time + fjs.time_required_for_job_op[job_id][op_id][machine_id]
+            last_index_for_job[job_id] = index
+            last_index_for_machine[machine_id] = index
+
+        self.makespan = max(self.end_times, default=0)
+        self.critical_path = self.__trace_critical_path()
+        self.critical_blocks = self.__split_critical_blocks()
+
+    def __trace_critical_path(self) -> list[int]:
+        if len(self.end_times) == 0:
+            return []
+        # walk back from the op that ends last, always through a predecessor that ends exactly when we start
+        # machine predecessors win ties so blocks come out as long as possible
+        index = self.end_times.index(self.makespan)
+        path = [index]
+        while self.start_times[index] > 0:
+            machine_predecessor = self.machine_predecessors[index]
+            job_predecessor = self.job_predecessors[index]
+            if machine_predecessor != -1 and self.end_times[machine_predecessor] == self.start_times[index]:
+                index = machine_predecessor
+            elif job_predecessor != -1 and self.end_times[job_predecessor] == self.start_times[index]:
+                index = job_predecessor
+            else:
+                # starts at a release time, nothing earlier in the sequence holds it back
+                break
+            path.append(index)
+        path.reverse()
+        return path
+
+    def __split_critical_blocks(self) -> list[list[int]]:
+        blocks = []
+        for index in self.critical_path:
+            if len(blocks) > 0 and self.machine_predecessors[index] == blocks[-1][-1]:
+                blocks[-1].append(index)
+            else:
+                blocks.append([index])
+        return blocks
+
+    def get_machine(self, index: int) -> int:
+        return self.solution.ops[index * 3 + 2]
+
+    def __move_after(self, index: int, target_index: int) -> tuple[int, int, int] | None:
+        # relocate op at index (earlier) to right after target_index (later) in the sequence, if precedence allows
+        if self.job_successors[index] <= target_index:
+            return None
+        return index, target_index, self.get_machine(index)
+
+    def __move_before(self, index: int, target_index: int) -> tuple[int, int, int] | None:
+        # relocate op at index (later) to right before target_index (earlier) in the sequence, if precedence allows
+        if self.job_predecessors[index] >= target_index:
+            return None
+        return index, target_index, self.get_machine(index)
+
+    def get_critical_moves(self) -> list[tuple[int, int, int]]:
+        """
+        N5/N7 style neighborhood over the critical blocks plus machine reassignment of critical ops. Block moves only
+        reorder ops on their machine (in the sequence, a relocation), reassignments keep the sequence position
+
+        :return: Moves in the same (from_index, to_index, machine) format as get_random_neighbor_move.
+        """
+        moves = set()
+        number_of_blocks = len(self.critical_blocks)
+        for block_index, block in enumerate(self.critical_blocks):
+            if len(block) < 2:
+                continue
+            first, last = block[0], block[-1]
+            # N5 pruning: reordering the head of the first block or the tail of the last block can't shorten the
+            # critical path, unless there is only one block and nothing else to try
+            move_head = block_index > 0 or number_of_blocks == 1
+            move_tail = block_index < number_of_blocks - 1 or number_of_blocks == 1
+            # N7: head goes after any other op of the block / any op goes before the head, same for the tail
+            if move_head:
+                for other in block[1:]:
+                    moves.add(self.__move_after(first, other))
+                    moves.add(self.__move_before(other, first))
+            if move_tail:
+                for other in block[:-1]:
+                    moves.add(self.__move_before(last, other))
+                    moves.add(self.__move_after(other, last))
+        moves.discard(None)
+
+        available_machines_for_job_op = self.fjs.available_machines_for_job_op
+        ops = self.solution.ops
+        for index in self.critical_path:
+            for machine_id in available_machines_for_job_op[ops[index * 3]][ops[index * 3 + 1]]:
+                if machine_id != ops[index * 3 + 2]:
+                    moves.add((index, index, machine_id))
+
+        return sorted(moves)
@@ -0,0 +1,39 @@
+from collections import OrderedDict
+
+
+class EvaluationCache(object):
+    """
+    Bounded LRU map from solution canonical key to makespan. Keys are the 64-bit canonical keys solutions already carry
+    for tabu membership, so a lookup costs one dict access and an entry ~100 bytes regardless of the instance size
+    """
+    capacity: int
+    hits: int
+    misses: int
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        self.makespans: OrderedDict[int, int] = OrderedDict()
+
+    def __len__(self):
+        return len(self.makespans)
+
+    def get(self, key: int) -> int | None:
+        makespan = self.makespans.get(key)
+        if makespan is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.makespans.move_to_end(key)
+        return makespan
+
+    def put(self, key: int, makespan: int):
+        self.makespans[key] = makespan
+        self.makespans.move_to_end(key)
+        if len(self.makespans) > self.capacity:
+            self.makespans.popitem(last=False)
+
+    def get_hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups > 0 else 0.0
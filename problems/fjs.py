@@ -1,4 +1,10 @@
 import random
+from array import array
+import numpy as np
+from problems.fjs_solution import FjsSolution
+from problems.instance_loader import InstanceLoader
+from problems.evaluation_cache import EvaluationCache
+from problems.schedule_export import ScheduleExport
 
 
 class FlexibleJobSchedulingProblem(object):
@@ -8,103 +14,388 @@ class FlexibleJobSchedulingProblem(object):
     ops_per_job: list[int]
     time_required_for_job_op: list[list[list[int]]]
     available_machines_for_job_op: list[list[list[int]]]
+    processing_time_tensor: np.ndarray
+    lower_bound: int
     input_file: str
+    rng: random.Random
+    # rescheduling state, see freeze: ops already started are out of the sequence, jobs and machines only become
+    # free again once their frozen ops are done
+    job_release_times: list[int]
+    machine_release_times: list[int]
+    frozen_ops_per_job: list[int]
+    frozen_schedule: np.ndarray
+    disabled_machines: set[int]
+    changes: list[str]
+    evaluation_cache: EvaluationCache | None
 
     SWITCH_MACHINE_CHANCE = 0.8
 
-    def __init__(self, input_file_path: str):
-        self.__read_input(input_file_path)
+    def __init__(self, input_file_path: str, seed: int | None = None, use_cache: bool = True,
+                 evaluation_cache_size: int = 65536):
+        self.__read_input(input_file_path, use_cache)
+        # every random draw goes through this so runs can be reproduced from a seed
+        self.rng = random.Random(seed)
+        # makespans by canonical key, searches keep re-scoring schedules they've already seen
+        self.evaluation_cache = EvaluationCache(evaluation_cache_size) if evaluation_cache_size > 0 else None
 
-    def __read_input(self, input_file_path: str):
-        self.number_of_jobs = 0
-        self.number_of_ops = 0
-        self.number_of_machines = 0
-        self.ops_per_job = []
-        self.time_required_for_job_op = []
-        self.available_machines_for_job_op = []
+    def seed(self, seed: int | None):
+        self.rng.seed(seed)
+
+    def __read_input(self, input_file_path: str, use_cache: bool = True):
         self.input_file = input_file_path
+        instance = InstanceLoader.load(input_file_path, use_cache)
+
+        self.number_of_jobs = instance.number_of_jobs
+        self.number_of_machines = instance.number_of_machines
+        self.ops_per_job = instance.ops_per_job.tolist()
+        self.number_of_ops = sum(self.ops_per_job)
+        # the search's hot paths index nested python lists, much faster than indexing numpy scalars one by one
+        rows = instance.processing_times.tolist()
+        op_offsets = instance.op_offsets.tolist()
+        self.time_required_for_job_op = [rows[op_offsets[job_id]:op_offsets[job_id + 1]]
+                                         for job_id in range(self.number_of_jobs)]
+        self.available_machines_for_job_op = [
+            [[machine_id for machine_id, time_required in enumerate(times) if time_required >= 0] for times in job]
+            for job in self.time_required_for_job_op]
+
+        self.job_release_times = [0] * self.number_of_jobs
+        self.machine_release_times = [0] * self.number_of_machines
+        self.frozen_ops_per_job = [0] * self.number_of_jobs
+        self.frozen_schedule = np.zeros((0, 5), dtype=np.int64)
+        self.disabled_machines = set()
+        self.changes = []
+
+        self.__build_processing_time_tensor()
+        self.lower_bound = FlexibleJobSchedulingProblem.compute_lower_bound(instance.processing_times,
+                                                                           instance.op_offsets)
+
+    def __build_processing_time_tensor(self):
+        # dense (job, op, machine) -> time lookup for batched evaluation, -1 where unavailable or padded
+        max_num_of_ops_across_jobs = max(self.ops_per_job, default=0)
+        self.processing_time_tensor = np.full(
+            (self.number_of_jobs, max_num_of_ops_across_jobs, self.number_of_machines), -1, dtype=np.int64)
+        for job_id in range(self.number_of_jobs):
+            for op_id in range(self.ops_per_job[job_id]):
+                self.processing_time_tensor[job_id, op_id, :] = self.time_required_for_job_op[job_id][op_id]
 
-        with open(input_file_path, "r") as fin:
-            lines = [line.strip() for line in fin.readlines() if (line and not line.startswith(('#', '//')))]
-
-            line_0_words = lines[0].split()
-            self.number_of_jobs = int(line_0_words[0].strip())
-            self.number_of_machines = int(line_0_words[1].strip())
-
-            line_index = 0
-
-            for i in range(self.number_of_jobs):
-                line_index += 1
-                current_line = lines[line_index]
-                number_of_ops_for_this_job = int(current_line[0].strip())
-                self.number_of_ops += number_of_ops_for_this_job
-                self.ops_per_job.append(number_of_ops_for_this_job)
-                self.time_required_for_job_op.append([])
-                self.available_machines_for_job_op.append([])
-                for j in range(number_of_ops_for_this_job):
-                    line_index += 1
-                    current_line = lines[line_index]
-                    times_for_this_op = current_line.split()
-                    self.time_required_for_job_op[i].append([])
-                    self.available_machines_for_job_op[i].append([])
-                    for k in range(self.number_of_machines):
-                        time_required_by_machine = int(times_for_this_op[k].strip())
-                        self.time_required_for_job_op[i][j].append(time_required_by_machine)
-                        if time_required_by_machine >= 0:
-                            self.available_machines_for_job_op[i][j].append(k)
+    @staticmethod
+    def compute_lower_bound(processing_times: np.ndarray, op_offsets: np.ndarray,
+                            job_release_times: np.ndarray | None = None,
+                            machine_release_times: np.ndarray | None = None) -> int:
+        """
+        Makespan lower bound from the instance data alone, the best of
+        - job bound: no job can finish before the sum of its ops' shortest processing times
+        - machine set bound: ops that can only run on machines in some set S need at least the sum of their shortest
+          times on S spread over |S| machines, tried for S = all machines and S = every distinct eligible machine set
+          (an op only eligible on one machine puts its whole time on that machine)
+        With release times a job's ops start at its release at the earliest, and a machine set only starts working
+        at its machines' releases, which count as work already on the set. The latest release is a bound on its own
+
+        :param processing_times: (number of ops, number of machines) times, -1 where not eligible, see CompiledInstance.
+        :param op_offsets: First row of every job plus the total number of ops.
+        :param job_release_times: Time every job's first op can start at, zeros if None.
+        :param machine_release_times: Time every machine is free from, zeros if None.
+        :return: A makespan no solution can beat, a solution that reaches it is optimal.
+        """
+        number_of_jobs = len(op_offsets) - 1
+        number_of_machines = processing_times.shape[1]
+        job_release_times = np.zeros(number_of_jobs, dtype=np.int64) if job_release_times is None \
+            else np.asarray(job_release_times, dtype=np.int64)
+        machine_release_times = np.zeros(number_of_machines, dtype=np.int64) if machine_release_times is None \
+            else np.asarray(machine_release_times, dtype=np.int64)
+        lower_bound = int(machine_release_times.max(initial=0))
+        if len(processing_times) == 0:
+            return lower_bound
+        eligible = processing_times >= 0
+        shortest_times = np.where(eligible, processing_times, np.iinfo(np.int64).max).min(axis=1)
+        # jobs without ops left add nothing, reduceat would give them the next job's first op
+        job_ops = np.diff(op_offsets) > 0
+        job_totals = np.add.reduceat(shortest_times, op_offsets[:-1][job_ops])
+        lower_bound = max(lower_bound, int((job_totals + job_release_times[job_ops]).max()))
+
+        for machine_set in np.unique(np.vstack((eligible, np.ones(eligible.shape[1], dtype=bool))), axis=0):
+            # ops that can't leave the set, with their shortest time on it (= overall shortest since they can't leave)
+            confined = ~(eligible & ~machine_set).any(axis=1)
+            total_time = int(shortest_times[confined].sum()) + int(machine_release_times[machine_set].sum())
+            number_of_machines_in_set = int(machine_set.sum())
+            lower_bound = max(lower_bound, -(-total_time // number_of_machines_in_set))
+        return lower_bound
+
+    def add_job(self, times_per_op: list[list[int]]) -> int:
+        """
+        A job that arrived after the instance was loaded, it can start as soon as a machine is free. Disabled machines
+        are masked out of its times
 
-    def __str__(self):
-        return f'{str(self.time_required_for_job_op)}\n{str(self.available_machines_for_job_op)}'
+        :param times_per_op: For every op of the job in order, its processing time on every machine, -1 where it
+            can't run.
+        :return: Id of the new job.
+        """
+        for times in times_per_op:
+            if len(times) != self.number_of_machines:
+                raise ValueError(f'Expected a time for each of the {self.number_of_machines} machines, got {times}')
+            if not any(time_required >= 0 for time_required in times):
+                raise ValueError(f'Op with times {times} can\'t run on any machine')
+            if not any(time_required >= 0 for machine_id, time_required in enumerate(times)
+                       if machine_id not in self.disabled_machines):
+                raise ValueError(f'Op with times {times} can only run on disabled machines ' +
+                                 f'{sorted(self.disabled_machines)}')
+        job_id = self.number_of_jobs
+        self.number_of_jobs += 1
+        self.time_required_for_job_op.append([[-1 if machine_id in self.disabled_machines else time_required
+                                               for machine_id, time_required in enumerate(times)]
+                                              for times in times_per_op])
+        self.job_release_times.append(0)
+        self.frozen_ops_per_job.append(0)
+        self.changes.append(f'added job {job_id} with {len(times_per_op)} ops')
+        self.__refresh()
+        return job_id
+
+    def remove_job(self, job_id: int):
+        """
+        Drop every op of the job that isn't frozen. The id stays taken by a job without ops so other jobs keep theirs
 
-    def get_random_solution(self) -> str:
-        string = ''
+        :param job_id: Job to cancel.
+        """
+        self.time_required_for_job_op[job_id] = []
+        self.changes.append(f'removed job {job_id}')
+        self.__refresh()
 
-        # fill random pool with op 0 from all jobs
-        pool: dict[int, list] = {}
-        for job_id in range(self.number_of_jobs):
-            pool[job_id] = [0] if self.ops_per_job[job_id] > 0 else []
+    def disable_machine(self, machine_id: int):
+        """
+        The machine is down from the last freeze on: no op that isn't frozen can run on it anymore, frozen ops that
+        already started on it are assumed to finish, and jobs added later can't use it either. Freeze at the outage
+        time first to take it down at that time
 
-        while len(pool) > 0:
-            # draw a random op and a random machine available for that op
-            random_job_id = random.choice(list(pool.keys()))
-            random_op_id = random.choice(pool[random_job_id])
-            random_machine_id = random.choice(self.available_machines_for_job_op[random_job_id][random_op_id])
+        :param machine_id: Machine that went down.
+        """
+        for job_id, job in enumerate(self.time_required_for_job_op):
+            for op_id, times in enumerate(job):
+                if all(time_required < 0 for other_machine_id, time_required in enumerate(times)
+                       if other_machine_id != machine_id):
+                    raise ValueError(f'Job {job_id} op {op_id + self.frozen_ops_per_job[job_id]} can only run on ' +
+                                     f'machine {machine_id}')
+        for job in self.time_required_for_job_op:
+            for times in job:
+                times[machine_id] = -1
+        self.disabled_machines.add(machine_id)
+        self.changes.append(f'disabled machine {machine_id}')
+        self.__refresh()
+
+    def freeze(self, solution: FjsSolution | str, time: int) -> FjsSolution:
+        """
+        Commit to the part of a schedule that is already running at time: ops of solution that start before time
+        keep their machine and times and leave the problem, every job and machine is released once its frozen ops
+        are done, and nothing else can start before time. Op ids of the remaining ops are shifted so every job
+        starts at op 0 again, frozen_ops_per_job maps them back
+
+        :param solution: The schedule being executed, in array or string format, repaired first if the problem
+            changed since it was made.
+        :param time: Current time.
+        :return: The rest of solution renumbered for the reduced problem, a warm start for the next search.
+        """
+        intervals = self.decode_schedule(self.repair_solution(solution))
+        started = intervals[:, 3] < time
+        frozen_intervals = intervals[started].copy()
+        frozen_intervals[:, 1] += np.array(self.frozen_ops_per_job, dtype=np.int64)[frozen_intervals[:, 0]]
+        self.frozen_schedule = np.vstack((self.frozen_schedule, frozen_intervals))
+
+        # a job's started ops are always its first remaining ones, they run in order
+        started_ops_per_job = np.bincount(intervals[started, 0], minlength=self.number_of_jobs).tolist()
+        for job_id, op_id, machine_id, start_time, end_time in intervals[started].tolist():
+            self.job_release_times[job_id] = max(self.job_release_times[job_id], end_time)
+            self.machine_release_times[machine_id] = max(self.machine_release_times[machine_id], end_time)
+        self.machine_release_times = [max(machine_release_time, time)
+                                      for machine_release_time in self.machine_release_times]
+        for job_id, number_of_started_ops in enumerate(started_ops_per_job):
+            self.time_required_for_job_op[job_id] = self.time_required_for_job_op[job_id][number_of_started_ops:]
+            self.frozen_ops_per_job[job_id] += number_of_started_ops
+        self.changes.append(f'froze {int(started.sum())} started ops at t={time}')
+        self.__refresh()
+
+        remaining_intervals = intervals[~started]
+        remaining_intervals[:, 1] -= np.array(started_ops_per_job, dtype=np.int64)[remaining_intervals[:, 0]]
+        return FjsSolution(array('i', remaining_intervals[:, :3].astype(np.intc).tobytes()))
+
+    def repair_solution(self, solution: FjsSolution | str) -> FjsSolution:
+        """
+        Turn a solution of an earlier version of this problem into a valid one, keeping the order of its ops: ops of
+        removed jobs are dropped, ops on a machine they can't use anymore (disabled ones included) go to the machine
+        where they finish earliest, and ops it doesn't have (new jobs) are merged in as a list scheduler would,
+        whenever one can start before the next kept op, on the machine where it finishes earliest
 
-            string += f'{random_job_id}-{random_op_id}-{random_machine_id} '
-            (pool[random_job_id]).remove(random_op_id)
+        :param solution: Solution in array or string format.
+        :return: A valid solution, solution itself if it already was one.
+        """
+        ops = FlexibleJobSchedulingProblem.as_array_solution(solution).ops
+        time_required_for_job_op = self.time_required_for_job_op
+        available_machines_for_job_op = self.available_machines_for_job_op
+        ops_per_job = self.ops_per_job
+        next_op_ids = [0] * self.number_of_jobs
+        job_ready_times = self.job_release_times[:]
+        machine_ready_times = self.machine_release_times[:]
+        repaired_ops = array('i')
+
+        # ops that still exist, in their old order, each job's ops in increasing order
+        kept_ops = []
+        last_kept_op_ids = [-1] * self.number_of_jobs
+        for index in range(0, len(ops), 3):
+            job_id, op_id, machine_id = ops[index], ops[index + 1], ops[index + 2]
+            if 0 <= job_id < self.number_of_jobs and last_kept_op_ids[job_id] < op_id < ops_per_job[job_id]:
+                kept_ops.append((job_id, op_id, machine_id))
+                last_kept_op_ids[job_id] = op_id
+
+        def get_start_time(job_id: int, op_id: int, machine_id: int) -> tuple[int, int]:
+            times = time_required_for_job_op[job_id][op_id]
+            if machine_id < 0 or machine_id >= self.number_of_machines or times[machine_id] < 0 or \
+                    machine_id in self.disabled_machines:
+                machine_id = min(available_machines_for_job_op[job_id][op_id],
+                                 key=lambda m: max(job_ready_times[job_id], machine_ready_times[m]) + times[m])
+            return max(job_ready_times[job_id], machine_ready_times[machine_id]), machine_id
+
+        def schedule(job_id: int, op_id: int, machine_id: int):
+            start_time, machine_id = get_start_time(job_id, op_id, machine_id)
+            end_time = start_time + time_required_for_job_op[job_id][op_id][machine_id]
+            job_ready_times[job_id] = end_time
+            machine_ready_times[machine_id] = end_time
+            next_op_ids[job_id] += 1
+            repaired_ops.extend((job_id, op_id, machine_id))
+
+        kept_index = 0
+        while len(repaired_ops) < self.number_of_ops * 3:
+            # earliest starting op past the last kept one of its job, versus the next kept op
+            new_op = None
+            for job_id in range(self.number_of_jobs):
+                op_id = next_op_ids[job_id]
+                if last_kept_op_ids[job_id] < op_id < ops_per_job[job_id]:
+                    start_time, machine_id = get_start_time(job_id, op_id, -1)
+                    if new_op is None or start_time < new_op[0]:
+                        new_op = (start_time, job_id, op_id, machine_id)
+            if kept_index < len(kept_ops):
+                job_id, op_id, machine_id = kept_ops[kept_index]
+                # kept ops win ties so an unchanged solution comes back as is
+                if new_op is None or get_start_time(job_id, next_op_ids[job_id], machine_id)[0] <= new_op[0]:
+                    kept_index += 1
+                    # ops missing in between go right before the one that needs them
+                    while next_op_ids[job_id] <= op_id:
+                        schedule(job_id, next_op_ids[job_id], machine_id if next_op_ids[job_id] == op_id else -1)
+                    continue
+            _, job_id, op_id, machine_id = new_op
+            schedule(job_id, op_id, machine_id)
+
+        if repaired_ops == ops and isinstance(solution, FjsSolution):
+            return solution
+        return FjsSolution(repaired_ops)
+
+    def get_full_schedule(self, solution: FjsSolution | str) -> np.ndarray:
+        """
+        :param solution: Solution in array or string format.
+        :return: Frozen intervals followed by solution's, same format as decode_schedule but with the op ids the
+            jobs had before any freeze.
+        """
+        intervals = self.decode_schedule(solution)
+        intervals[:, 1] += np.array(self.frozen_ops_per_job, dtype=np.int64)[intervals[:, 0]]
+        return np.vstack((self.frozen_schedule, intervals))
+
+    def __refresh(self):
+        # everything derived from time_required_for_job_op, after a change to the problem
+        self.ops_per_job = [len(job) for job in self.time_required_for_job_op]
+        self.number_of_ops = sum(self.ops_per_job)
+        self.available_machines_for_job_op = [
+            [[machine_id for machine_id, time_required in enumerate(times) if time_required >= 0] for times in job]
+            for job in self.time_required_for_job_op]
+        self.__build_processing_time_tensor()
+        processing_times = np.array([times for job in self.time_required_for_job_op for times in job],
+                                    dtype=np.int64).reshape(-1, self.number_of_machines)
+        op_offsets = np.cumsum([0] + self.ops_per_job)
+        self.lower_bound = FlexibleJobSchedulingProblem.compute_lower_bound(
+            processing_times, op_offsets, self.job_release_times, self.machine_release_times)
+        # makespans of the old problem are meaningless now
+        if self.evaluation_cache is not None:
+            self.evaluation_cache = EvaluationCache(self.evaluation_cache.capacity)
+
+    def __str__(self):
+        return f'{str(self.time_required_for_job_op)}\n{str(self.available_machines_for_job_op)}'
 
-            # if op is the last op (highest possible op id) in the job, remove job from pool
+    def get_random_solution(self) -> FjsSolution:
+        ops = array('i')
+        next_op_ids = [0] * self.number_of_jobs
+
+        # jobs that still have ops left, a drawn job is swapped to the end and popped once done so every draw is O(1)
+        active_job_ids = [job_id for job_id in range(self.number_of_jobs) if self.ops_per_job[job_id] > 0]
+        while len(active_job_ids) > 0:
+            # draw a random job, its next op and a random machine available for that op
+            index = self.rng.randrange(len(active_job_ids))
+            random_job_id = active_job_ids[index]
+            random_op_id = next_op_ids[random_job_id]
+            random_machine_id = self.rng.choice(self.available_machines_for_job_op[random_job_id][random_op_id])
+            ops.extend((random_job_id, random_op_id, random_machine_id))
+            next_op_ids[random_job_id] += 1
+
+            # if op is the last op in the job, remove job from the active list
             if random_op_id == self.ops_per_job[random_job_id] - 1:
-                pool.pop(random_job_id)
-            # else add the next available op
-            else:
-                pool[random_job_id].append(random_op_id + 1)
+                active_job_ids[index] = active_job_ids[-1]
+                active_job_ids.pop()
+
+        return FjsSolution(ops)
+
+    def get_random_solutions(self, number_of_solutions: int) -> list[FjsSolution]:
+        """
+        Many random solutions at once: every row draws one random key per op, keys are sorted within each job so ops
+        keep their precedence, and the sequence is the ops in key order, which is a uniformly random interleaving of
+        the jobs. Machines are drawn uniformly from each op's available machines
 
-        return string.strip()
+        :param number_of_solutions: How many solutions to generate.
+        :return: Array solutions, generated in O(number_of_solutions * number_of_ops * log(number_of_ops)) NumPy work.
+        """
+        # numpy generator derived from rng so the batch is reproducible from the problem's seed
+        generator = np.random.default_rng(self.rng.getrandbits(64))
+        job_of_op = np.repeat(np.arange(self.number_of_jobs), self.ops_per_job)
+        op_in_job = np.concatenate([np.arange(ops_for_job) for ops_for_job in self.ops_per_job] or [np.zeros(0, int)])
+        keys = np.sort(generator.random((number_of_solutions, self.number_of_ops)) + job_of_op, axis=1) - job_of_op
+        order = np.argsort(keys, axis=1)
+
+        # padded (op, k) table of available machines, pick column (random % number of available machines)
+        available_machines = [machines for job in self.available_machines_for_job_op for machines in job]
+        number_of_available_machines = np.array([len(machines) for machines in available_machines], dtype=np.int64)
+        machine_table = np.zeros((self.number_of_ops, self.number_of_machines), dtype=np.int64)
+        for flat_op_id, machines in enumerate(available_machines):
+            machine_table[flat_op_id, :len(machines)] = machines
+        columns = generator.integers(0, np.iinfo(np.int64).max, (number_of_solutions, self.number_of_ops)) % \
+            number_of_available_machines
+        machine_ids = machine_table[np.arange(self.number_of_ops), columns]
+
+        triples = np.stack((job_of_op[order], op_in_job[order], np.take_along_axis(machine_ids, order, axis=1)),
+                           axis=2).astype(np.intc).reshape(number_of_solutions, -1)
+        return [FjsSolution(array('i', row.tobytes())) for row in triples]
+
+    def get_random_neighbor_solution(self, current_solution: FjsSolution) -> FjsSolution:
+        return FlexibleJobSchedulingProblem.apply_move(current_solution,
+                                                       self.get_random_neighbor_move(current_solution))
+
+    def get_random_neighbor_move(self, current_solution: FjsSolution) -> tuple[int, int, int]:
+        """
+        Pick a random relocate (and maybe reassign) move that keeps the solution valid
 
-    def get_random_neighbor_solution(self, current_solution: str):
-        struct_solution = FlexibleJobSchedulingProblem.parse_solution(current_solution)
-        number_of_ops = len(struct_solution)
+        :param current_solution: Solution in array format.
+        :return: Move as (index of the op to relocate, index to re-insert it at, machine to run it on).
+        """
+        ops = current_solution.ops
+        number_of_ops = len(ops) // 3
         lower_index = 0
         upper_index = 0
         random_op_index = 0
 
         # honestly idk why, prolly to catch some edge cases i can't think of atm
         while lower_index >= upper_index:
-            random_op_index = random.randint(0, number_of_ops - 1)
-            chosen_op = struct_solution[random_op_index]
-            job_id = chosen_op[0]
-            op_id = chosen_op[1]
+            random_op_index = self.rng.randint(0, number_of_ops - 1)
+            job_id = ops[random_op_index * 3]
+            op_id = ops[random_op_index * 3 + 1]
 
             # explore backward until start of array
             lower_index = random_op_index - 1
             while lower_index >= 0:
-                target_op = struct_solution[lower_index]
-                target_job_id = target_op[0]
-                target_op_id = target_op[1]
-
                 # if we encounter a prereq op on the way (aka same job_id but target_op_id < by 1) then stop
-                if target_job_id == job_id and target_op_id == op_id - 1:
+                if ops[lower_index * 3] == job_id and ops[lower_index * 3 + 1] == op_id - 1:
                     break
                 lower_index -= 1
 
@@ -115,11 +406,8 @@ class FlexibleJobSchedulingProblem(object):
             # explore forward until end of array
             upper_index = random_op_index + 1
             while upper_index <= number_of_ops - 1:
-                target_op = struct_solution[upper_index]
-                target_job_id = target_op[0]
-                target_op_id = target_op[1]
                 # if we encounter a postreq op on the way (aka same job_id but target_op_id > by 1) then stop
-                if target_job_id == job_id and target_op_id == op_id + 1:
+                if ops[upper_index * 3] == job_id and ops[upper_index * 3 + 1] == op_id + 1:
                     break
                 upper_index += 1
 
@@ -130,29 +418,57 @@ class FlexibleJobSchedulingProblem(object):
         index_to_insert_at = random_op_index
         # roll gacha until we get an index that's different from our starting random index
         while index_to_insert_at == random_op_index:
-            index_to_insert_at = random.randint(lower_index, upper_index)
+            index_to_insert_at = self.rng.randint(lower_index, upper_index)
 
-        # temp remove op from solution
-        chosen_op = struct_solution[random_op_index]
-        struct_solution.pop(random_op_index)
+        chosen_job_id = ops[random_op_index * 3]
+        chosen_op_id = ops[random_op_index * 3 + 1]
+        new_machine_index = ops[random_op_index * 3 + 2]
 
         # x% chance to randomly switch op to a new machine
-        roll = random.random()
+        roll = self.rng.random()
         # only if there are more than 1 machine available tho
-        if len(self.available_machines_for_job_op[chosen_op[0]][chosen_op[1]]) > 1:
+        if len(self.available_machines_for_job_op[chosen_job_id][chosen_op_id]) > 1:
             if roll < FlexibleJobSchedulingProblem.SWITCH_MACHINE_CHANCE:
-                current_machine_index = chosen_op[2]
-                new_machine_index = current_machine_index
+                current_machine_index = new_machine_index
                 # roll until we get a different machine index
                 while new_machine_index == current_machine_index:
-                    new_machine_index = random.choice(
-                        self.available_machines_for_job_op[chosen_op[0]][chosen_op[1]])
-                chosen_op[2] = new_machine_index
+                    new_machine_index = self.rng.choice(
+                        self.available_machines_for_job_op[chosen_job_id][chosen_op_id])
+
+        return random_op_index, index_to_insert_at, new_machine_index
+
+    @staticmethod
+    def apply_move(current_solution: FjsSolution, move: tuple[int, int, int]) -> FjsSolution:
+        """
+        :param current_solution: Solution in array format, left untouched.
+        :param move: Move as returned by get_random_neighbor_move.
+        :return: New solution with the move applied.
+        """
+        from_index, to_index, machine_id = move
+        ops = current_solution.ops
+
+        # temp remove op from solution
+        offset = from_index * 3
+        chosen_op = ops[offset:offset + 3]
+        chosen_op[2] = machine_id
+        new_ops = ops[:offset] + ops[offset + 3:]
 
         # re-insert at new index
-        struct_solution.insert(index_to_insert_at, chosen_op)
+        new_ops[to_index * 3:to_index * 3] = chosen_op
+
+        return FjsSolution(new_ops)
+
+    @staticmethod
+    def as_array_solution(solution: FjsSolution | str) -> FjsSolution:
+        """
+        Accept either format at the I/O boundary, everything past this point works on array solutions
 
-        return FlexibleJobSchedulingProblem.stringify_solution(struct_solution)
+        :param solution: Solution in array or string format.
+        :return: Solution in array format.
+        """
+        if isinstance(solution, FjsSolution):
+            return solution
+        return FjsSolution.from_string(solution)
 
     @staticmethod
     def parse_solution(string_solution: str) -> list[list[int]]:
@@ -175,30 +491,65 @@ class FlexibleJobSchedulingProblem(object):
             result += '-'.join([str(num) for num in op]) + ' '
         return result.strip()
 
-    def solution_is_valid(self, string_solution: str) -> bool:
-        struct_sol = FlexibleJobSchedulingProblem.parse_solution(string_solution)
+    def solution_is_valid(self, solution: FjsSolution | str) -> bool:
+        ops = FlexibleJobSchedulingProblem.as_array_solution(solution).ops
         finished_ops = {job_id: -1 for job_id in range(self.number_of_jobs)}
 
-        for op in struct_sol:
-            job_id = op[0]
-            op_id = op[1]
+        for index in range(0, len(ops), 3):
+            job_id = ops[index]
+            op_id = ops[index + 1]
             if finished_ops[job_id] != op_id - 1:
                 return False
             finished_ops[job_id] += 1
         return True
 
-    def evaluate_solution(self, string_solution: str) -> int:
-        struct_solution = FlexibleJobSchedulingProblem.parse_solution(string_solution)
-        machine_time_table = {machine_id: [-1, 0] for machine_id in range(self.number_of_machines)}
+    def evaluate_solution(self, solution: FjsSolution | str) -> int:
+        solution = FlexibleJobSchedulingProblem.as_array_solution(solution)
+        evaluation_cache = self.evaluation_cache
+        if evaluation_cache is None:
+            return self.__decode_makespan(solution.ops)
+        makespan = evaluation_cache.get(solution.canonical_key)
+        if makespan is None:
+            makespan = self.__decode_makespan(solution.ops)
+            evaluation_cache.put(solution.canonical_key, makespan)
+        return makespan
+
+    def evaluate_solutions(self, solutions: list[FjsSolution]) -> list[int]:
+        """
+        Evaluate a list of solutions, looking them up in the evaluation cache first and batch evaluating the rest,
+        the cache is keyed by canonical key so any sequence of an already seen schedule is a hit
+
+        :param solutions: Array solutions, all with the same number of ops.
+        :return: Makespans in the same order.
+        """
+        if len(solutions) == 0:
+            return []
+        evaluation_cache = self.evaluation_cache
+        if evaluation_cache is None:
+            return self.evaluate_batch(FjsSolution.stack(solutions)).tolist()
+        canonical_keys = FjsSolution.compute_canonical_keys(solutions)
+        makespans = [evaluation_cache.get(canonical_key) for canonical_key in canonical_keys]
+        missing_indices = [index for index, makespan in enumerate(makespans) if makespan is None]
+        if len(missing_indices) > 0:
+            missing_makespans = self.evaluate_batch(FjsSolution.stack([solutions[index]
+                                                                       for index in missing_indices])).tolist()
+            for index, makespan in zip(missing_indices, missing_makespans):
+                makespans[index] = makespan
+                evaluation_cache.put(canonical_keys[index], makespan)
+        return makespans
+
+    def __decode_makespan(self, ops: array) -> int:
+        machine_time_table = {machine_id: [-1, self.machine_release_times[machine_id]]
+                              for machine_id in range(self.number_of_machines)}
         earliest_start_time_for_ops = [[-1] * self.ops_per_job[job_id] for job_id in range(self.number_of_jobs)]
         for job_id in range(self.number_of_jobs):
             if self.ops_per_job[job_id] > 0:
-                earliest_start_time_for_ops[job_id][0] = 0
+                earliest_start_time_for_ops[job_id][0] = self.job_release_times[job_id]
 
-        for op in struct_solution:
-            job_id = op[0]
-            op_id = op[1]
-            machine_id = op[2]
+        for index in range(0, len(ops), 3):
+            job_id = ops[index]
+            op_id = ops[index + 1]
+            machine_id = ops[index + 2]
             time_required = self.time_required_for_job_op[job_id][op_id][machine_id]
             earliest_possible_start_time = max(machine_time_table[machine_id][1],
                                                earliest_start_time_for_ops[job_id][op_id])
@@ -212,18 +563,101 @@ class FlexibleJobSchedulingProblem(object):
             if next_op_id <= len(earliest_start_time_for_ops[job_id]) - 1:
                 earliest_start_time_for_ops[job_id][next_op_id] = machine_time_table[machine_id][1]
 
-        start_times = [machine_time[0] for machine_time in machine_time_table.values()]
+        # the first op in any sequence starts at t=0 (or a release time), so makespan is the latest machine end time,
+        # which also covers frozen ops through the machine release times
         end_times = [machine_time[1] for machine_time in machine_time_table.values()]
-        earliest_machine_start_time = 0 if min(start_times) == -1 else min(start_times)
-        latest_machine_end_time = max(end_times)
+        return max(end_times, default=0)
+
+    def evaluate_batch(self, solutions: np.ndarray) -> np.ndarray:
+        """
+        Evaluate many solutions at once, stepping through sequence positions and updating every row in one go
+
+        :param solutions: 2-D integer array, one solution per row in flat (job, op, machine) triples,
+            see FjsSolution.stack.
+        :return: 1-D array of makespans, one per row.
+        """
+        solutions = np.asarray(solutions)
+        number_of_solutions = solutions.shape[0]
+        if number_of_solutions == 0:
+            return np.zeros(0, dtype=np.int64)
+        triples = solutions.reshape(number_of_solutions, -1, 3)
+        number_of_ops = triples.shape[1]
+        job_ids = triples[:, :, 0].T
+        machine_ids = triples[:, :, 2].T
+        durations = self.processing_time_tensor[job_ids, triples[:, :, 1].T, machine_ids]
+
+        # flat indices into the per-row ready time tables so each step is a 1-D gather/scatter
+        row_ids = np.arange(number_of_solutions)
+        flat_job_ids = job_ids + row_ids * self.number_of_jobs
+        flat_machine_ids = machine_ids + row_ids * self.number_of_machines
+        job_ready_times = np.tile(np.array(self.job_release_times, dtype=np.int64), number_of_solutions)
+        machine_ready_times = np.tile(np.array(self.machine_release_times, dtype=np.int64), number_of_solutions)
+
+        for position in range(number_of_ops):
+            job_index = flat_job_ids[position]
+            machine_index = flat_machine_ids[position]
+            end_times = np.maximum(job_ready_times[job_index], machine_ready_times[machine_index])
+            end_times += durations[position]
+            job_ready_times[job_index] = end_times
+            machine_ready_times[machine_index] = end_times
+
+        # the first op in any sequence starts at t=0 (or a release time), so makespan is the latest machine end time
+        return machine_ready_times.reshape(number_of_solutions, self.number_of_machines).max(axis=1)
+
+    def decode_schedule(self, solution: FjsSolution | str) -> np.ndarray:
+        """
+        :param solution: Solution in array or string format.
+        :return: (number of ops, 5) int array of (job, op, machine, start, end) rows in sequence order.
+        """
+        ops = FlexibleJobSchedulingProblem.as_array_solution(solution).ops
+        machine_ready_times = self.machine_release_times[:]
+        job_ready_times = self.job_release_times[:]
+        rows = []
+        for index in range(0, len(ops), 3):
+            job_id = ops[index]
+            op_id = ops[index + 1]
+            machine_id = ops[index + 2]
+            start_time = max(machine_ready_times[machine_id], job_ready_times[job_id])
+            end_time = start_time + self.time_required_for_job_op[job_id][op_id][machine_id]
+            machine_ready_times[machine_id] = end_time
+            job_ready_times[job_id] = end_time
+            rows.append((job_id, op_id, machine_id, start_time, end_time))
+        return np.array(rows, dtype=np.int64).reshape(-1, 5)
+
+    def get_unique_schedules(self, solutions: list[FjsSolution]) -> list[FjsSolution]:
+        """
+        Different sequences often decode to the same schedule (independent ops swapped), keep one solution per
+        canonical key, see FjsSolution
 
-        return latest_machine_end_time - earliest_machine_start_time
+        :param solutions: Solutions in array format.
+        :return: One solution per distinct schedule, in input order.
+        """
+        unique_solutions = dict()
+        for solution, canonical_key in zip(solutions, FjsSolution.compute_canonical_keys(solutions)):
+            unique_solutions.setdefault(canonical_key, solution)
+        return list(unique_solutions.values())
+
+    def get_visualization(self, solution: FjsSolution | str, width: int = 100) -> str:
+        """
+        Classic cell-per-time-unit chart when it fits in about width time units, otherwise a chart scaled down to
+        width characters, so the cost never grows with the makespan
 
-    def get_evaluated_visualization(self, string_solution: str, cell_width: int = 10):
+        :param solution: Solution in array or string format.
+        :param width: Rough character budget for the time axis.
+        :return: Rendered chart.
+        """
+        intervals = self.get_full_schedule(solution)
+        makespan = int(intervals[:, 4].max()) if len(intervals) > 0 else 0
+        # the cell chart only knows the sequence, not ops frozen before it
+        if makespan <= width // 10 and len(self.frozen_schedule) == 0:
+            return self.get_evaluated_visualization(solution)
+        return ScheduleExport.render_text(intervals, self.number_of_machines, width)
+
+    def get_evaluated_visualization(self, string_solution: FjsSolution | str, cell_width: int = 10):
         max_num_of_ops_across_jobs = max([x for x in self.ops_per_job])
         min_cell_width = len(str(self.number_of_jobs)) + len(str(max_num_of_ops_across_jobs)) + 7
         cell_width = min_cell_width if cell_width < min_cell_width else cell_width
-        struct_solution = FlexibleJobSchedulingProblem.parse_solution(string_solution)
+        struct_solution = FlexibleJobSchedulingProblem.as_array_solution(string_solution).to_struct()
         machine_time_table = {machine_id: [-1, 0] for machine_id in range(self.number_of_machines)}
         makespan = self.evaluate_solution(string_solution)
         result = ''
@@ -278,5 +712,5 @@ class FlexibleJobSchedulingProblem(object):
 
         return result
 
-    def visualize(self, string_solution: str, cell_width: int = 10):
+    def visualize(self, string_solution: FjsSolution | str, cell_width: int = 10):
         print(self.get_evaluated_visualization(string_solution, cell_width))
@@ -0,0 +1,141 @@
+from array import array
+from hashlib import blake2b
+import numpy as np
+
+
+class FjsSolution(object):
+    """
+    Array solution: flat array('i') buffer of (job, op, machine) triples, same information as a string/struct
+    solution but without any string work, hashed and compared through a 64-bit fingerprint of the raw buffer.
+
+    Many sequences decode to the same schedule: the decoder appends every op to the end of its machine, so only the
+    machine assignment and each machine's op order matter, not how ops on different machines are interleaved. The
+    canonical key is a 64-bit hash of exactly that, ops grouped by machine in sequence order, so equal canonical keys
+    mean equal schedules
+    """
+    __slots__ = ('ops', '_fingerprint', '_canonical_key')
+
+    ops: array
+
+    def __init__(self, ops: array):
+        self.ops = ops
+        self._fingerprint = None
+        self._canonical_key = None
+
+    @staticmethod
+    def from_string(string_solution: str) -> 'FjsSolution':
+        ops = array('i')
+        for word in string_solution.split():
+            ops.extend(int(num) for num in word.split('-'))
+        return FjsSolution(ops)
+
+    @staticmethod
+    def from_struct(struct_solution: list[list[int]]) -> 'FjsSolution':
+        ops = array('i')
+        for op in struct_solution:
+            ops.extend(op)
+        return FjsSolution(ops)
+
+    @staticmethod
+    def from_bytes(buffer: bytes) -> 'FjsSolution':
+        ops = array('i')
+        ops.frombytes(buffer)
+        return FjsSolution(ops)
+
+    @staticmethod
+    def stack(solutions: list['FjsSolution']) -> np.ndarray:
+        """
+        :param solutions: Array solutions, all with the same number of ops.
+        :return: 2-D int array with one solution per row, the input format of evaluate_batch.
+        """
+        buffer = b''.join([solution.ops.tobytes() for solution in solutions])
+        return np.frombuffer(buffer, dtype=np.intc).reshape(len(solutions), -1)
+
+    @property
+    def fingerprint(self) -> int:
+        if self._fingerprint is None:
+            self._fingerprint = int.from_bytes(blake2b(self.ops, digest_size=8).digest(), 'little')
+        return self._fingerprint
+
+    @property
+    def canonical_key(self) -> int:
+        if self._canonical_key is None:
+            self._canonical_key = FjsSolution.get_canonical_keys(
+                np.frombuffer(self.ops, dtype=np.intc).reshape(1, -1))[0]
+        return self._canonical_key
+
+    @staticmethod
+    def get_canonical_keys(solutions: np.ndarray) -> list[int]:
+        """
+        :param solutions: 2-D int array with one solution per row, see stack.
+        :return: Canonical key of every row.
+        """
+        number_of_solutions = solutions.shape[0]
+        triples = solutions.reshape(number_of_solutions, -1, 3).astype(np.int64)
+        number_of_ops = triples.shape[1]
+        machine_ids = triples[:, :, 2]
+        # one int64 per op, stable sort by machine through machine * n + position so every key is unique
+        packed_ops = (machine_ids << 42) | (triples[:, :, 0] << 21) | triples[:, :, 1]
+        order = np.argsort(machine_ids * number_of_ops + np.arange(number_of_ops), axis=1)
+        canonical_ops = np.take_along_axis(packed_ops, order, axis=1)
+        return [int.from_bytes(blake2b(row, digest_size=8).digest(), 'little') for row in canonical_ops]
+
+    @staticmethod
+    def compute_canonical_keys(solutions: list['FjsSolution']) -> list[int]:
+        """
+        Fill in the canonical keys of many solutions in one batch, much cheaper than one by one
+
+        :param solutions: Array solutions, all with the same number of ops.
+        :return: Their canonical keys, in the same order.
+        """
+        missing_solutions = [solution for solution in solutions if solution._canonical_key is None]
+        if len(missing_solutions) > 0:
+            for solution, canonical_key in zip(missing_solutions,
+                                               FjsSolution.get_canonical_keys(FjsSolution.stack(missing_solutions))):
+                solution._canonical_key = canonical_key
+        return [solution._canonical_key for solution in solutions]
+
+    @property
+    def number_of_ops(self) -> int:
+        return len(self.ops) // 3
+
+    def get_op(self, index: int) -> tuple[int, int, int]:
+        offset = index * 3
+        return self.ops[offset], self.ops[offset + 1], self.ops[offset + 2]
+
+    def to_struct(self) -> list[list[int]]:
+        ops = self.ops
+        return [[ops[i], ops[i + 1], ops[i + 2]] for i in range(0, len(ops), 3)]
+
+    def to_string(self) -> str:
+        ops = self.ops
+        return ' '.join(f'{ops[i]}-{ops[i + 1]}-{ops[i + 2]}' for i in range(0, len(ops), 3))
+
+    def __str__(self):
+        return self.to_string()
+
+    def __repr__(self):
+        return f'FjsSolution({self.to_string()!r})'
+
+    def __len__(self):
+        return self.number_of_ops
+
+    def __hash__(self):
+        return self.fingerprint
+
+    def __eq__(self, other):
+        if not isinstance(other, FjsSolution):
+            return NotImplemented
+        return self.fingerprint == other.fingerprint and self.ops == other.ops
+
+    def __lt__(self, other: 'FjsSolution'):
+        return self.ops < other.ops
+
+    def __getstate__(self):
+        return self.ops.tobytes()
+
+    def __setstate__(self, state: bytes):
+        self.ops = array('i')
+        self.ops.frombytes(state)
+        self._fingerprint = None
+        self._canonical_key = None
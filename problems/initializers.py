@@ -0,0 +1,114 @@
+from problems.fjs import FlexibleJobSchedulingProblem
+from problems.fjs_solution import FjsSolution
+from array import array
+
+
+class SolutionInitializer(object):
+    """
+    Starting solutions for a search. 'random' is FlexibleJobSchedulingProblem's random generator, the rest are greedy
+    list schedulers that build the sequence one op at a time from the next op of every unfinished job:
+    - spt: shortest processing time op first, on the machine where it completes earliest
+    - mwkr: op of the job with the most work remaining first, on the machine where it completes earliest
+    - least_loaded: every op goes to the available machine with the least work assigned so far, the op that can
+      start earliest goes first
+    - grasp: randomized greedy, picks uniformly among the ops whose earliest completion time is within GRASP_ALPHA of
+      the best, different every draw so it gives diverse strong starts
+    Work remaining and processing times are measured with each op's shortest processing time
+    """
+    METHODS = ('random', 'spt', 'mwkr', 'least_loaded', 'grasp')
+    GRASP_ALPHA = 0.3
+
+    @staticmethod
+    def get_initial_solution(fjs: FlexibleJobSchedulingProblem, method: str = 'random',
+                             number_of_candidates: int = 1) -> FjsSolution:
+        """
+        :param fjs: An instance of Flexible Job Shop Scheduling problem, randomness comes from its rng.
+        :param method: One of METHODS.
+        :param number_of_candidates: For random and grasp, generate this many and keep the best.
+        :return: The starting solution.
+        """
+        if method == 'random':
+            if number_of_candidates <= 1:
+                return fjs.get_random_solution()
+            candidates = fjs.get_random_solutions(number_of_candidates)
+        elif method == 'grasp':
+            candidates = [SolutionInitializer.dispatch(fjs, method) for _ in range(max(1, number_of_candidates))]
+        elif method in SolutionInitializer.METHODS:
+            # deterministic rules give the same solution every time
+            return SolutionInitializer.dispatch(fjs, method)
+        else:
+            raise ValueError(f'Unknown initializer {method}, expected one of {SolutionInitializer.METHODS}')
+        makespans = fjs.evaluate_solutions(candidates)
+        return candidates[makespans.index(min(makespans))]
+
+    @staticmethod
+    def dispatch(fjs: FlexibleJobSchedulingProblem, rule: str) -> FjsSolution:
+        """
+        :param fjs: An instance of Flexible Job Shop Scheduling problem.
+        :param rule: spt, mwkr, least_loaded or grasp, see the class docstring.
+        :return: The sequence the list scheduler built.
+        """
+        time_required_for_job_op = fjs.time_required_for_job_op
+        available_machines_for_job_op = fjs.available_machines_for_job_op
+        shortest_times = [[min(times[machine_id] for machine_id in machines)
+                           for times, machines in zip(job_times, job_machines)]
+                          for job_times, job_machines in zip(time_required_for_job_op, available_machines_for_job_op)]
+        work_remaining = [sum(job_shortest_times) for job_shortest_times in shortest_times]
+        next_op_ids = [0] * fjs.number_of_jobs
+        job_ready_times = fjs.job_release_times[:]
+        machine_ready_times = fjs.machine_release_times[:]
+        machine_loads = [0] * fjs.number_of_machines
+        active_job_ids = [job_id for job_id in range(fjs.number_of_jobs) if fjs.ops_per_job[job_id] > 0]
+        ops = array('i')
+
+        while len(active_job_ids) > 0:
+            if rule == 'spt':
+                job_id = min(active_job_ids, key=lambda job: shortest_times[job][next_op_ids[job]])
+                machine_id = SolutionInitializer.__get_earliest_completion(
+                    fjs, job_id, next_op_ids[job_id], job_ready_times, machine_ready_times)[1]
+            elif rule == 'mwkr':
+                job_id = max(active_job_ids, key=lambda job: work_remaining[job])
+                machine_id = SolutionInitializer.__get_earliest_completion(
+                    fjs, job_id, next_op_ids[job_id], job_ready_times, machine_ready_times)[1]
+            elif rule == 'least_loaded':
+                best_start_time = None
+                for job in active_job_ids:
+                    op_id = next_op_ids[job]
+                    times = time_required_for_job_op[job][op_id]
+                    machine = min(available_machines_for_job_op[job][op_id],
+                                  key=lambda m: (machine_loads[m] + times[m], m))
+                    start_time = max(job_ready_times[job], machine_ready_times[machine])
+                    if best_start_time is None or start_time < best_start_time:
+                        best_start_time, job_id, machine_id = start_time, job, machine
+            elif rule == 'grasp':
+                candidates = [(*SolutionInitializer.__get_earliest_completion(
+                    fjs, job, next_op_ids[job], job_ready_times, machine_ready_times), job) for job in active_job_ids]
+                best_completion = min(candidates)[0]
+                worst_completion = max(candidates)[0]
+                threshold = best_completion + SolutionInitializer.GRASP_ALPHA * (worst_completion - best_completion)
+                _, machine_id, job_id = fjs.rng.choice([candidate for candidate in candidates
+                                                        if candidate[0] <= threshold])
+            else:
+                raise ValueError(f'Unknown dispatching rule {rule}')
+
+            op_id = next_op_ids[job_id]
+            time_required = time_required_for_job_op[job_id][op_id][machine_id]
+            end_time = max(job_ready_times[job_id], machine_ready_times[machine_id]) + time_required
+            job_ready_times[job_id] = end_time
+            machine_ready_times[machine_id] = end_time
+            machine_loads[machine_id] += time_required
+            work_remaining[job_id] -= shortest_times[job_id][op_id]
+            ops.extend((job_id, op_id, machine_id))
+            next_op_ids[job_id] += 1
+            if next_op_ids[job_id] == fjs.ops_per_job[job_id]:
+                active_job_ids.remove(job_id)
+
+        return FjsSolution(ops)
+
+    @staticmethod
+    def __get_earliest_completion(fjs: FlexibleJobSchedulingProblem, job_id: int, op_id: int,
+                                  job_ready_times: list[int], machine_ready_times: list[int]) -> tuple[int, int]:
+        times = fjs.time_required_for_job_op[job_id][op_id]
+        job_ready_time = job_ready_times[job_id]
+        return min((max(job_ready_time, machine_ready_times[machine_id]) + times[machine_id], machine_id)
+                   for machine_id in fjs.available_machines_for_job_op[job_id][op_id])
@@ -0,0 +1,137 @@
+import os
+import zipfile
+from typing import Iterator
+import numpy as np
+
+
+class CompiledInstance(object):
+    """
+    Flat array form of an instance: row op_offsets[job_id] + op_id of processing_times holds that op's time on every
+    machine, -1 where the machine can't run it
+    """
+    number_of_jobs: int
+    number_of_machines: int
+    ops_per_job: np.ndarray
+    op_offsets: np.ndarray
+    processing_times: np.ndarray
+    eligible: np.ndarray
+
+    def __init__(self, number_of_machines: int, ops_per_job: np.ndarray, processing_times: np.ndarray):
+        self.number_of_jobs = len(ops_per_job)
+        self.number_of_machines = number_of_machines
+        self.ops_per_job = ops_per_job
+        self.op_offsets = np.concatenate(([0], np.cumsum(ops_per_job))).astype(np.int64)
+        self.processing_times = processing_times
+        self.eligible = processing_times >= 0
+
+
+class InstanceLoader(object):
+    """
+    Streaming parser for both the format described in README.md and the standard Brandimarte/Hurink .fjs format,
+    with a compiled .npz cache so instances are only ever parsed as text once
+    """
+    CACHE_DIRECTORY_NAME = '.fjs_cache'
+    CACHE_VERSION = 1
+
+    @staticmethod
+    def load(input_file_path: str, use_cache: bool = True) -> CompiledInstance:
+        if not use_cache:
+            return InstanceLoader.parse(input_file_path)
+        cache_path = InstanceLoader.get_cache_path(input_file_path)
+        source_stat = os.stat(input_file_path)
+        source_key = np.array([InstanceLoader.CACHE_VERSION, source_stat.st_size, source_stat.st_mtime_ns],
+                              dtype=np.int64)
+        if os.path.exists(cache_path):
+            try:
+                with np.load(cache_path) as cached:
+                    # stale if the source changed since it was compiled
+                    if np.array_equal(cached['source_key'], source_key):
+                        return CompiledInstance(int(cached['number_of_machines']), cached['ops_per_job'],
+                                                cached['processing_times'])
+            except (EOFError, zipfile.BadZipFile, KeyError, ValueError, OSError):
+                # truncated or foreign file, treat it as stale and compile again
+                pass
+        instance = InstanceLoader.parse(input_file_path)
+        # temp file per process then an atomic rename, concurrent loaders never see a half-written cache
+        temporary_path = f'{cache_path}.{os.getpid()}.tmp'
+        try:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            with open(temporary_path, 'wb') as f:
+                np.savez(f, source_key=source_key, number_of_machines=instance.number_of_machines,
+                         ops_per_job=instance.ops_per_job, processing_times=instance.processing_times)
+            os.replace(temporary_path, cache_path)
+        except OSError:
+            # read-only instance library, just don't cache
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+        return instance
+
+    @staticmethod
+    def get_cache_path(input_file_path: str) -> str:
+        directory, filename = os.path.split(os.path.abspath(input_file_path))
+        return os.path.join(directory, InstanceLoader.CACHE_DIRECTORY_NAME, filename + '.npz')
+
+    @staticmethod
+    def parse(input_file_path: str) -> CompiledInstance:
+        with open(input_file_path, 'rt') as fin:
+            lines = InstanceLoader.__read_token_lines(fin)
+            header = next(lines)
+            number_of_jobs = int(header[0])
+            number_of_machines = int(header[1])
+            first_job_line = next(lines)
+
+            # README format puts the op count alone on its line, .fjs puts the whole job on one line
+            is_fjs_format = input_file_path.endswith('.fjs') or len(first_job_line) > 1
+            tokens = InstanceLoader.__chain_tokens(first_job_line, lines)
+            if is_fjs_format:
+                ops_per_job, rows = InstanceLoader.__parse_fjs_jobs(tokens, number_of_jobs, number_of_machines)
+            else:
+                ops_per_job, rows = InstanceLoader.__parse_readme_jobs(tokens, number_of_jobs, number_of_machines)
+
+        processing_times = np.array(rows, dtype=np.int64).reshape(-1, number_of_machines)
+        return CompiledInstance(number_of_machines, np.array(ops_per_job, dtype=np.int64), processing_times)
+
+    @staticmethod
+    def __read_token_lines(fin) -> Iterator[list[str]]:
+        for line in fin:
+            line = line.strip()
+            if not line or line.startswith(('#', '//')):
+                continue
+            yield line.split()
+
+    @staticmethod
+    def __chain_tokens(first_line: list[str], lines: Iterator[list[str]]) -> Iterator[int]:
+        for token in first_line:
+            yield int(token)
+        for line in lines:
+            for token in line:
+                yield int(token)
+
+    @staticmethod
+    def __parse_readme_jobs(tokens: Iterator[int], number_of_jobs: int,
+                            number_of_machines: int) -> tuple[list[int], list[int]]:
+        ops_per_job = []
+        rows = []
+        for _ in range(number_of_jobs):
+            number_of_ops_for_this_job = next(tokens)
+            ops_per_job.append(number_of_ops_for_this_job)
+            for _ in range(number_of_ops_for_this_job * number_of_machines):
+                rows.append(next(tokens))
+        return ops_per_job, rows
+
+    @staticmethod
+    def __parse_fjs_jobs(tokens: Iterator[int], number_of_jobs: int,
+                         number_of_machines: int) -> tuple[list[int], list[int]]:
+        # per job: op count, then per op: number of eligible machines k, then k (1-based machine, time) pairs
+        ops_per_job = []
+        rows = []
+        for _ in range(number_of_jobs):
+            number_of_ops_for_this_job = next(tokens)
+            ops_per_job.append(number_of_ops_for_this_job)
+            for _ in range(number_of_ops_for_this_job):
+                row = [-1] * number_of_machines
+                for _ in range(next(tokens)):
+                    machine_id = next(tokens) - 1
+                    row[machine_id] = next(tokens)
+                rows.extend(row)
+        return ops_per_job, rows
@@ -0,0 +1,74 @@
+import json
+import numpy as np
+
+# column layout of the interval arrays returned by FlexibleJobSchedulingProblem.decode_schedule
+JOB, OP, MACHINE, START, END = range(5)
+
+
+class ScheduleExport(object):
+    """
+    Exporters and a text renderer for decoded schedules, everything here costs O(number of ops) (plus the output
+    width for the renderer) and never depends on the makespan
+    """
+
+    @staticmethod
+    def write(intervals: np.ndarray, path: str):
+        """
+        :param intervals: (n, 5) int array of (job, op, machine, start, end) rows, see decode_schedule.
+        :param path: Output path, .csv writes CSV, anything else JSON.
+        """
+        if path.endswith('.csv'):
+            ScheduleExport.write_csv(intervals, path)
+        else:
+            ScheduleExport.write_json(intervals, path)
+
+    @staticmethod
+    def write_json(intervals: np.ndarray, path: str):
+        makespan = int(intervals[:, END].max()) if len(intervals) > 0 else 0
+        with open(path, 'wt') as f:
+            f.write(f'{{"makespan": {makespan}, "operations": [')
+            for index, (job_id, op_id, machine_id, start_time, end_time) in enumerate(intervals.tolist()):
+                f.write((',\n' if index > 0 else '\n') +
+                        json.dumps({'job': job_id, 'op': op_id, 'machine': machine_id,
+                                    'start': start_time, 'end': end_time}))
+            f.write('\n]}\n')
+
+    @staticmethod
+    def write_csv(intervals: np.ndarray, path: str):
+        with open(path, 'wt') as f:
+            f.write('job,op,machine,start,end\n')
+            for job_id, op_id, machine_id, start_time, end_time in intervals.tolist():
+                f.write(f'{job_id},{op_id},{machine_id},{start_time},{end_time}\n')
+
+    @staticmethod
+    def render_text(intervals: np.ndarray, number_of_machines: int, width: int = 100) -> str:
+        """
+        Gantt chart scaled so the whole makespan fits in width characters per machine, ops too short to fit their
+        label are drawn as bare {} or a single #
+
+        :param intervals: (n, 5) int array of (job, op, machine, start, end) rows, see decode_schedule.
+        :param number_of_machines: Number of machine rows to draw.
+        :param width: Characters available for the time axis.
+        :return: Rendered chart.
+        """
+        makespan = int(intervals[:, END].max()) if len(intervals) > 0 else 0
+        scale = width / max(1, makespan)
+        label_width = len(f'm={number_of_machines - 1}') + 2
+        rows = [[' '] * width for _ in range(number_of_machines)]
+        for job_id, op_id, machine_id, start_time, end_time in intervals.tolist():
+            first_column = min(width - 1, int(start_time * scale))
+            last_column = max(first_column + 1, min(width, int(end_time * scale)))
+            span = last_column - first_column
+            label = f'{job_id}-{op_id}'
+            if span >= len(label) + 2:
+                cell = '{' + label.center(span - 2, '_') + '}'
+            elif span >= 2:
+                cell = '{' + '_' * (span - 2) + '}'
+            else:
+                cell = '#'
+            rows[machine_id][first_column:last_column] = cell
+        axis = 't=0'.ljust(width - len(f't={makespan}')) + f't={makespan}'
+        result = ''.ljust(label_width) + axis + '\n'
+        result += ''.join(f'm={machine_id}'.center(label_width) + ''.join(row) + '\n'
+                          for machine_id, row in enumerate(rows))
+        return result
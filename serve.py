@@ -0,0 +1,51 @@
+from service.solver_service import SolverService
+import asyncio
+import argparse
+import signal
+
+
+def __main__():
+    arg_parser = argparse.ArgumentParser(
+        description='Serve tabu search over local HTTP, with a warm pool of solver processes and a job queue',
+        epilog='Example: python serve.py --port 8765 --workers 4, then ' +
+               'curl -d \'{"instance_path": "data/input_0.txt", "time_budget": 5}\' localhost:8765/jobs'
+    )
+    arg_parser.add_argument('--host',
+                            default='127.0.0.1',
+                            help='Address to listen on. Defaults to 127.0.0.1')
+    arg_parser.add_argument('--port', '-p',
+                            default=8765,
+                            type=int,
+                            help='Port to listen on, 0 picks a free one. Defaults to 8765')
+    arg_parser.add_argument('--workers', '-w',
+                            default=2,
+                            type=int,
+                            help='Number of solver processes, i.e. how many jobs run at once. Defaults to 2')
+    arg_parser.add_argument('--instance_directory',
+                            default='.solver_instances',
+                            help='Where uploaded instances are stored by content hash. Defaults to .solver_instances')
+    args = vars(arg_parser.parse_args())
+
+    service = SolverService(args['host'], args['port'], args['workers'], args['instance_directory'])
+
+    async def serve():
+        await service.start()
+        print(f'Serving on http://{service.host}:{service.port} with {service.number_of_workers} worker(s)')
+        serve_task = asyncio.create_task(service.server.serve_forever())
+        # shut the workers down cleanly on kill too, not just on ctrl+c
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, serve_task.cancel)
+        try:
+            await serve_task
+        except asyncio.CancelledError:
+            pass
+        finally:
+            await service.stop()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    __main__()
@@ -0,0 +1,373 @@
+import asyncio
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+import time
+from multiprocessing.connection import Connection
+from multiprocessing.synchronize import Event
+from problems.fjs import FlexibleJobSchedulingProblem
+from metaheuristics.tabu_search import TabuSearch, TabuSearchRun
+from metaheuristics.neighborhood_sizing import NeighborhoodSizeController
+
+
+def _solver_worker_main(connection: Connection, cancel_event: Event):
+    # long-lived worker, parsed instances stay loaded between jobs so repeat requests skip all the start-up cost
+    problems: dict[str, FlexibleJobSchedulingProblem] = dict()
+    parent_process = multiprocessing.parent_process()
+    while True:
+        # the service may die without saying goodbye (SIGKILL), don't linger as an orphan then
+        if not connection.poll(1.0):
+            if parent_process is not None and not parent_process.is_alive():
+                break
+            continue
+        try:
+            command, payload = connection.recv()
+        except EOFError:
+            break
+        if command == 'stop':
+            break
+        job_id, instance_path, parameters = payload
+        try:
+            if instance_path not in problems:
+                problems[instance_path] = FlexibleJobSchedulingProblem(instance_path)
+            fjs = problems[instance_path]
+            start_time = time.time()
+            deadline = start_time + parameters['time_budget'] if parameters['time_budget'] >= 0 else None
+            neighborhood_sizer = None
+            if parameters['number_of_neighbors'] == -1:
+                neighborhood_sizer = NeighborhoodSizeController()
+                neighborhood_sizer.set_budget(deadline, parameters['number_of_iterations'])
+                number_of_neighbors = neighborhood_sizer.min_size
+            else:
+                number_of_neighbors = TabuSearch.resolve_number_of_neighbors(fjs, parameters['number_of_neighbors'],
+                                                                             parameters['number_of_iterations'])
+            search = TabuSearchRun(fjs, parameters['tabu_size'], parameters['reset_threshold'], number_of_neighbors,
+                                   parameters['evaluator'], seed=parameters['seed'],
+                                   tabu_tenure=parameters['tabu_tenure'], neighborhood=parameters['neighborhood'],
+                                   initializer=parameters['initializer'], neighborhood_sizer=neighborhood_sizer)
+            best_makespan = search.best_makespan
+            connection.send(('improvement', job_id, {'iteration': 0, 'elapsed': time.time() - start_time,
+                                                     'makespan': best_makespan,
+                                                     'solution': str(search.get_best_solution())}))
+            stop_reason = 'completed'
+            while search.completed_iterations < parameters['number_of_iterations']:
+                if cancel_event.is_set():
+                    stop_reason = 'cancelled'
+                    break
+                if deadline is not None and time.time() >= deadline:
+                    stop_reason = 'time budget used up'
+                    break
+                if search.best_makespan <= fjs.lower_bound:
+                    stop_reason = 'reached the lower bound, optimal'
+                    break
+                search.iterate()
+                if search.best_makespan < best_makespan:
+                    best_makespan = search.best_makespan
+                    connection.send(('improvement', job_id, {'iteration': search.completed_iterations,
+                                                             'elapsed': time.time() - start_time,
+                                                             'makespan': best_makespan,
+                                                             'solution': str(search.get_best_solution())}))
+            search.close()
+            connection.send(('finished', job_id, {'reason': stop_reason,
+                                                  'completed_iterations': search.completed_iterations,
+                                                  'elapsed': time.time() - start_time,
+                                                  'makespan': best_makespan, 'lower_bound': fjs.lower_bound,
+                                                  'solution': str(search.get_best_solution())}))
+        except Exception as exception:
+            connection.send(('failed', job_id, {'error': f'{type(exception).__name__}: {exception}'}))
+
+
+class SolveJob(object):
+    """
+    One queued solve request and everything streamed back for it so far
+    """
+    job_id: str
+    instance_path: str
+    parameters: dict
+    status: str
+    events: list[dict]
+    best_makespan: int | None
+    best_solution: str | None
+
+    def __init__(self, job_id: str, instance_path: str, parameters: dict):
+        self.job_id = job_id
+        self.instance_path = instance_path
+        self.parameters = parameters
+        self.status = 'queued'
+        self.events = []
+        self.best_makespan = None
+        self.best_solution = None
+        self.created_time = time.time()
+        self.changed = asyncio.Event()
+
+    def is_final(self) -> bool:
+        return self.status in ('finished', 'cancelled', 'failed')
+
+    def add_event(self, event: dict):
+        self.events.append(event)
+        # wake every streaming client, then re-arm for the next event
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+    def as_dict(self) -> dict:
+        return {'job_id': self.job_id, 'status': self.status, 'instance_path': self.instance_path,
+                'parameters': self.parameters, 'best_makespan': self.best_makespan,
+                'best_solution': self.best_solution, 'number_of_events': len(self.events)}
+
+
+class SolverService(object):
+    """
+    Local HTTP service that keeps a pool of solver processes warm and queues tabu search jobs onto it.
+    Plain asyncio + stdlib HTTP/1.1, JSON in and out:
+    - POST /instances, body is an instance in any supported format, stored by content hash, returns its instance_id
+    - POST /jobs, body {"instance": text | "instance_id": id | "instance_path": path, ...search parameters}, see
+      DEFAULT_PARAMETERS, time_budget is in seconds of solving (queue time doesn't count)
+    - GET /jobs, GET /jobs/<id>: status and best solution so far
+    - GET /jobs/<id>/events: newline-delimited JSON, every event so far then live ones until the job ends
+    - DELETE /jobs/<id>: cancel, queued jobs are dropped, running ones stop after their current iteration
+    """
+    DEFAULT_PARAMETERS = {'number_of_iterations': 1000000, 'time_budget': 15.0, 'tabu_size': 10,
+                          'reset_threshold': 5, 'number_of_neighbors': -1, 'tabu_tenure': 0, 'seed': None,
+                          'evaluator': 'batch', 'neighborhood': 'random', 'initializer': 'random'}
+    MAX_BODY_SIZE = 64 * 1024 * 1024
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 8765, workers: int = 2,
+                 instance_directory: str = '.solver_instances'):
+        self.host = host
+        self.port = port
+        self.number_of_workers = workers
+        self.instance_directory = instance_directory
+        self.jobs: dict[str, SolveJob] = dict()
+        self.next_job_number = 0
+        self.server = None
+        self.worker_connections: list[Connection] = []
+        self.worker_cancel_events: list[Event] = []
+        self.worker_processes = []
+        self.running_jobs: list[SolveJob | None] = []
+
+    async def start(self):
+        os.makedirs(self.instance_directory, exist_ok=True)
+        self.job_queue: asyncio.Queue[SolveJob] = asyncio.Queue()
+        self.worker_connections = [None] * self.number_of_workers
+        self.worker_cancel_events = [None] * self.number_of_workers
+        self.worker_processes = [None] * self.number_of_workers
+        self.running_jobs = [None] * self.number_of_workers
+        for worker_index in range(self.number_of_workers):
+            self.__start_worker(worker_index)
+        self.worker_tasks = [asyncio.create_task(self.__drive_worker(worker_index))
+                             for worker_index in range(self.number_of_workers)]
+        self.server = await asyncio.start_server(self.__handle_connection, self.host, self.port)
+        # port 0 picks a free port, report the real one
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self):
+        await self.start()
+        async with self.server:
+            await self.server.serve_forever()
+
+    async def stop(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        for worker_index, connection in enumerate(self.worker_connections):
+            self.worker_cancel_events[worker_index].set()
+        for task in self.worker_tasks:
+            task.cancel()
+        for connection in self.worker_connections:
+            try:
+                connection.send(('stop', None))
+            except OSError:
+                # that worker is already gone
+                pass
+        for process in self.worker_processes:
+            process.join(timeout=5)
+
+    def submit(self, instance_path: str, parameters: dict) -> SolveJob:
+        unknown_parameters = set(parameters) - set(SolverService.DEFAULT_PARAMETERS)
+        if len(unknown_parameters) > 0:
+            raise ValueError(f'Unknown parameters {sorted(unknown_parameters)}')
+        job_id = str(self.next_job_number)
+        self.next_job_number += 1
+        job = SolveJob(job_id, instance_path, {**SolverService.DEFAULT_PARAMETERS, **parameters})
+        self.jobs[job_id] = job
+        job.add_event({'type': 'queued'})
+        self.job_queue.put_nowait(job)
+        return job
+
+    def cancel(self, job: SolveJob):
+        if job.is_final():
+            return
+        if job.status == 'queued':
+            # the worker loop skips it when it comes out of the queue
+            job.status = 'cancelled'
+            job.add_event({'type': 'cancelled'})
+        else:
+            self.worker_cancel_events[self.running_jobs.index(job)].set()
+
+    def store_instance(self, instance_text: bytes) -> str:
+        instance_id = hashlib.blake2b(instance_text, digest_size=16).hexdigest()
+        instance_path = self.get_instance_path(instance_id)
+        if not os.path.exists(instance_path):
+            with open(instance_path, 'wb') as f:
+                f.write(instance_text)
+        return instance_id
+
+    def get_instance_path(self, instance_id: str) -> str:
+        # first line of the .fjs and README formats is the same, the loader tells them apart by content
+        return os.path.join(self.instance_directory, instance_id + '.txt')
+
+    def __start_worker(self, worker_index: int):
+        # spawned, not forked: a worker replaced mid-serve would otherwise inherit the open client sockets and keep
+        # their event streams from ever closing
+        context = multiprocessing.get_context('spawn')
+        driver_connection, worker_connection = context.Pipe()
+        cancel_event = context.Event()
+        process = context.Process(target=_solver_worker_main, daemon=True, args=(worker_connection, cancel_event))
+        process.start()
+        # only the worker keeps its end open, so recv raises EOFError here once the worker dies
+        worker_connection.close()
+        self.worker_connections[worker_index] = driver_connection
+        self.worker_cancel_events[worker_index] = cancel_event
+        self.worker_processes[worker_index] = process
+
+    async def __drive_worker(self, worker_index: int):
+        loop = asyncio.get_running_loop()
+        while True:
+            job = await self.job_queue.get()
+            if job.is_final():
+                continue
+            connection = self.worker_connections[worker_index]
+            self.worker_cancel_events[worker_index].clear()
+            self.running_jobs[worker_index] = job
+            job.status = 'running'
+            job.add_event({'type': 'started'})
+            try:
+                connection.send(('solve', (job.job_id, job.instance_path, job.parameters)))
+            except OSError:
+                # the worker is gone, the recv below finds that out too
+                pass
+            while True:
+                try:
+                    # recv blocks, so it runs in a thread and the event loop stays free for other clients
+                    message_type, _, payload = await loop.run_in_executor(None, connection.recv)
+                except (EOFError, OSError):
+                    # the worker died mid-job (killed, out of memory), fail the job so its stream ends and replace
+                    # the worker for the jobs still queued
+                    process = self.worker_processes[worker_index]
+                    await loop.run_in_executor(None, process.join, 5)
+                    message_type, payload = 'failed', {'error': f'Solver worker exited with code {process.exitcode}'}
+                    connection.close()
+                    self.__start_worker(worker_index)
+                if message_type == 'improvement':
+                    job.best_makespan = payload['makespan']
+                    job.best_solution = payload['solution']
+                    job.add_event({'type': 'improvement', **payload})
+                    continue
+                if message_type == 'finished':
+                    job.best_makespan = payload['makespan']
+                    job.best_solution = payload['solution']
+                    job.status = 'cancelled' if payload['reason'] == 'cancelled' else 'finished'
+                else:
+                    job.status = 'failed'
+                job.add_event({'type': job.status, **payload})
+                break
+            self.running_jobs[worker_index] = None
+
+    async def __handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            method, path, body = await SolverService.__read_request(reader)
+            await self.__route(method, path, body, writer)
+        except ValueError as exception:
+            SolverService.__write_json(writer, 400, {'error': str(exception)})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            try:
+                await writer.drain()
+                writer.close()
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def __route(self, method: str, path: str, body: bytes, writer: asyncio.StreamWriter):
+        parts = [part for part in path.split('?')[0].split('/') if part]
+        if parts == ['instances'] and method == 'POST':
+            SolverService.__write_json(writer, 201, {'instance_id': self.store_instance(body)})
+        elif parts == ['jobs'] and method == 'POST':
+            request = json.loads(body or b'{}')
+            if not isinstance(request, dict):
+                raise ValueError('Job request must be a JSON object')
+            if 'instance' in request:
+                instance_path = self.get_instance_path(self.store_instance(request.pop('instance').encode()))
+            elif 'instance_id' in request:
+                instance_id = str(request.pop('instance_id'))
+                if re.fullmatch('[0-9a-f]{32}', instance_id) is None:
+                    raise ValueError(f'Malformed instance_id {instance_id}')
+                instance_path = self.get_instance_path(instance_id)
+            elif 'instance_path' in request:
+                instance_path = request.pop('instance_path')
+            else:
+                raise ValueError('Job request needs one of instance, instance_id or instance_path')
+            if not os.path.exists(instance_path):
+                SolverService.__write_json(writer, 404, {'error': f'No instance at {instance_path}'})
+                return
+            SolverService.__write_json(writer, 202, self.submit(instance_path, request).as_dict())
+        elif parts == ['jobs'] and method == 'GET':
+            SolverService.__write_json(writer, 200, [job.as_dict() for job in self.jobs.values()])
+        elif len(parts) >= 2 and parts[0] == 'jobs':
+            job = self.jobs.get(parts[1])
+            if job is None:
+                SolverService.__write_json(writer, 404, {'error': f'No job {parts[1]}'})
+            elif len(parts) == 2 and method == 'GET':
+                SolverService.__write_json(writer, 200, job.as_dict())
+            elif len(parts) == 2 and method == 'DELETE':
+                self.cancel(job)
+                SolverService.__write_json(writer, 202, job.as_dict())
+            elif parts[2:] == ['events'] and method == 'GET':
+                await self.__stream_events(job, writer)
+            else:
+                SolverService.__write_json(writer, 404, {'error': f'No route {method} {path}'})
+        else:
+            SolverService.__write_json(writer, 404, {'error': f'No route {method} {path}'})
+
+    async def __stream_events(self, job: SolveJob, writer: asyncio.StreamWriter):
+        # no content length, the body ends when the job does and the connection closes
+        writer.write(b'HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson\r\nConnection: close\r\n\r\n')
+        sent_events = 0
+        while True:
+            changed = job.changed
+            for event in job.events[sent_events:]:
+                writer.write(json.dumps(event).encode() + b'\n')
+            sent_events = len(job.events)
+            await writer.drain()
+            if job.is_final():
+                break
+            await changed.wait()
+
+    @staticmethod
+    async def __read_request(reader: asyncio.StreamReader) -> tuple[str, str, bytes]:
+        request_line = (await reader.readline()).decode('latin-1').split()
+        if len(request_line) < 2:
+            raise ValueError('Malformed request line')
+        method, path = request_line[0].upper(), request_line[1]
+        content_length = 0
+        while True:
+            header_line = (await reader.readline()).decode('latin-1').strip()
+            if not header_line:
+                break
+            name, _, value = header_line.partition(':')
+            if name.strip().lower() == 'content-length':
+                content_length = int(value.strip())
+        if content_length > SolverService.MAX_BODY_SIZE:
+            raise ValueError('Request body too large')
+        body = await reader.readexactly(content_length) if content_length > 0 else b''
+        return method, path, body
+
+    @staticmethod
+    def __write_json(writer: asyncio.StreamWriter, status: int, payload):
+        reasons = {200: 'OK', 201: 'Created', 202: 'Accepted', 400: 'Bad Request', 404: 'Not Found'}
+        body = json.dumps(payload).encode()
+        writer.write(f'HTTP/1.1 {status} {reasons[status]}\r\nContent-Type: application/json\r\n'
+                     f'Content-Length: {len(body)}\r\nConnection: close\r\n\r\n'.encode() + body)
@@ -0,0 +1,286 @@
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import pytest
+from problems.fjs import FlexibleJobSchedulingProblem
+from problems.fjs_solution import FjsSolution
+from problems.delta_evaluation import DeltaEvaluator
+from problems.instance_loader import InstanceLoader
+from metaheuristics.tabu_search import TabuSearch
+from metaheuristics.run_log import LogSink
+from service.solver_service import SolverService
+
+
+def write_random_instance(directory, seed: int, number_of_jobs: int = 6, number_of_machines: int = 4,
+                          max_ops_per_job: int = 5) -> str:
+    # README format, every op runs on at least one machine
+    rng = random.Random(seed)
+    lines = [f'{number_of_jobs} {number_of_machines}']
+    for _ in range(number_of_jobs):
+        number_of_ops = rng.randint(1, max_ops_per_job)
+        lines.append(str(number_of_ops))
+        for _ in range(number_of_ops):
+            times = [rng.randint(1, 9) if rng.random() < 0.6 else -1 for _ in range(number_of_machines)]
+            times[rng.randrange(number_of_machines)] = rng.randint(1, 9)
+            lines.append(' '.join(map(str, times)))
+    path = directory / f'instance_{seed}.txt'
+    path.write_text('\n'.join(lines) + '\n')
+    return str(path)
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_evaluators_agree(tmp_path, seed):
+    fjs = FlexibleJobSchedulingProblem(write_random_instance(tmp_path, seed), seed=seed, evaluation_cache_size=0)
+    solutions = fjs.get_random_solutions(20)
+    scalar_makespans = [fjs.evaluate_solution(solution) for solution in solutions]
+    assert fjs.evaluate_batch(FjsSolution.stack(solutions)).tolist() == scalar_makespans
+    assert fjs.evaluate_solutions(solutions) == scalar_makespans
+
+    for solution in solutions:
+        delta_evaluator = DeltaEvaluator(fjs, solution)
+        assert delta_evaluator.makespan == fjs.evaluate_solution(solution)
+        for _ in range(20):
+            move = fjs.get_random_neighbor_move(solution)
+            neighbor = FlexibleJobSchedulingProblem.apply_move(solution, move)
+            assert fjs.solution_is_valid(neighbor)
+            assert delta_evaluator.evaluate_move(move) == fjs.evaluate_solution(neighbor)
+
+
+def test_cached_evaluation_matches_uncached(tmp_path):
+    input_file_path = write_random_instance(tmp_path, 0)
+    fjs = FlexibleJobSchedulingProblem(input_file_path, seed=0)
+    uncached_fjs = FlexibleJobSchedulingProblem(input_file_path, evaluation_cache_size=0)
+    solutions = fjs.get_random_solutions(50)
+    # second pass is answered by the cache
+    for _ in range(2):
+        assert fjs.evaluate_solutions(solutions) == uncached_fjs.evaluate_solutions(solutions)
+        assert [fjs.evaluate_solution(solution) for solution in solutions] == \
+            [uncached_fjs.evaluate_solution(solution) for solution in solutions]
+
+
+@pytest.mark.parametrize('evaluator, neighborhood, number_of_neighbors', [('batch', 'random', 30),
+                                                                          ('delta', 'random', 30),
+                                                                          ('batch', 'critical', 30),
+                                                                          ('batch', 'random', -1)])
+def test_resume_follows_uninterrupted_run(tmp_path, evaluator, neighborhood, number_of_neighbors):
+    input_file_path = write_random_instance(tmp_path, 1, number_of_jobs=8, max_ops_per_job=6)
+    checkpoint_path = str(tmp_path / 'run.pkl')
+
+    def run(number_of_iterations: int, **kwargs) -> tuple[int, list[str], str, FjsSolution]:
+        return TabuSearch.run_fjs(FlexibleJobSchedulingProblem(input_file_path), number_of_iterations, 10, 5,
+                                  number_of_neighbors, -1, evaluator, seed=3, log_sink=LogSink(0),
+                                  neighborhood=neighborhood, tabu_tenure=3, **kwargs)
+
+    best_makespan, best_visualized_solutions, _, best_solution = run(60)
+    run(25, checkpoint_path=checkpoint_path)
+    resumed_makespan, resumed_visualized_solutions, _, resumed_solution = run(60, checkpoint_path=checkpoint_path,
+                                                                              resume=True)
+    assert resumed_makespan == best_makespan
+    assert resumed_solution == best_solution
+    assert resumed_visualized_solutions == best_visualized_solutions
+
+
+@pytest.mark.parametrize('extra_makespan', [0, 10])
+def test_run_stopping_at_its_start_keeps_the_start(tmp_path, extra_makespan):
+    input_file_path = write_random_instance(tmp_path, 2, number_of_jobs=8, max_ops_per_job=6)
+    fjs = FlexibleJobSchedulingProblem(input_file_path)
+    initial_solution = fjs.get_random_solution()
+    initial_makespan = fjs.evaluate_solution(initial_solution)
+    best_makespan, best_visualized_solutions, _, best_solution = TabuSearch.run_fjs(
+        fjs, 100, 10, 5, 30, -1, seed=0, log_sink=LogSink(0), target_makespan=initial_makespan + extra_makespan,
+        initial_solution=initial_solution)
+    assert best_makespan == initial_makespan
+    assert best_solution == initial_solution
+    assert best_visualized_solutions == [fjs.get_visualization(initial_solution)]
+
+
+def assert_fits_problem(fjs: FlexibleJobSchedulingProblem, solution: FjsSolution):
+    assert fjs.solution_is_valid(solution)
+    assert solution.number_of_ops == fjs.number_of_ops
+    for job_id, op_id, machine_id in solution.to_struct():
+        assert fjs.time_required_for_job_op[job_id][op_id][machine_id] >= 0
+        assert machine_id not in fjs.disabled_machines
+    makespan = fjs.evaluate_solution(solution)
+    assert fjs.evaluate_batch(FjsSolution.stack([solution])).tolist() == [makespan]
+    assert DeltaEvaluator(fjs, solution).makespan == makespan
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_repair_after_problem_changes(tmp_path, seed):
+    fjs = FlexibleJobSchedulingProblem(write_random_instance(tmp_path, seed, number_of_jobs=8, max_ops_per_job=6),
+                                       seed=seed)
+    rng = random.Random(seed)
+    solution = fjs.get_random_solution()
+    assert fjs.repair_solution(solution) is solution
+    makespan = fjs.evaluate_solution(solution)
+    number_of_ops = fjs.number_of_ops
+
+    remaining = fjs.freeze(solution, makespan // 2)
+    assert_fits_problem(fjs, remaining)
+    assert fjs.evaluate_solution(remaining) == makespan
+    assert len(fjs.get_full_schedule(remaining)) == number_of_ops
+    # nothing new starts before the freeze
+    assert all(start_time >= makespan // 2 for _, _, _, start_time, _ in fjs.decode_schedule(remaining).tolist())
+
+    # a machine that every remaining op can leave
+    disabled_machine_id = next(machine_id for machine_id in range(fjs.number_of_machines)
+                               if all(len(machine_ids) > 1 or machine_ids[0] != machine_id
+                                      for job in fjs.available_machines_for_job_op for machine_ids in job))
+    fjs.disable_machine(disabled_machine_id)
+    assert_fits_problem(fjs, fjs.repair_solution(remaining))
+
+    times_per_op = [[rng.randint(1, 9) for _ in range(fjs.number_of_machines)] for _ in range(3)]
+    job_id = fjs.add_job(times_per_op)
+    assert all(times[disabled_machine_id] == -1 for times in fjs.time_required_for_job_op[job_id])
+    with pytest.raises(ValueError):
+        fjs.add_job([[1 if machine_id == disabled_machine_id else -1 for machine_id in range(fjs.number_of_machines)]])
+    repaired = fjs.repair_solution(remaining)
+    assert_fits_problem(fjs, repaired)
+    assert all(machine_id != disabled_machine_id for _, _, machine_id in fjs.get_random_solution().to_struct())
+
+    fjs.remove_job(0)
+    repaired = fjs.repair_solution(repaired)
+    assert_fits_problem(fjs, repaired)
+    assert fjs.repair_solution(repaired) == repaired
+
+
+def load_processing_times(input_file_path: str) -> list[list[int]]:
+    return InstanceLoader.load(input_file_path).processing_times.tolist()
+
+
+def test_concurrent_cache_loads(tmp_path):
+    input_file_path = write_random_instance(tmp_path, 0, number_of_jobs=30, max_ops_per_job=10)
+    expected_processing_times = InstanceLoader.parse(input_file_path).processing_times.tolist()
+    cache_path = InstanceLoader.get_cache_path(input_file_path)
+    with multiprocessing.Pool(8) as pool:
+        for _ in range(5):
+            # every round races to compile the same uncached instance
+            if os.path.exists(cache_path):
+                os.remove(cache_path)
+            results = pool.map(load_processing_times, [input_file_path] * 16, chunksize=1)
+            assert all(processing_times == expected_processing_times for processing_times in results)
+    # no temp files left behind
+    assert os.listdir(os.path.dirname(cache_path)) == [os.path.basename(cache_path)]
+
+    # a truncated cache is stale, not an error
+    with open(cache_path, 'r+b') as f:
+        f.truncate(os.path.getsize(cache_path) // 2)
+    assert load_processing_times(input_file_path) == expected_processing_times
+    assert load_processing_times(input_file_path) == expected_processing_times
+
+
+def get_machine_sequences(solution: FjsSolution) -> tuple[tuple[tuple[int, int], ...], ...]:
+    # what a schedule is made of: the (job, op) order on every machine
+    machine_sequences = dict()
+    for job_id, op_id, machine_id in solution.to_struct():
+        machine_sequences.setdefault(machine_id, []).append((job_id, op_id))
+    return tuple(sorted((machine_id, tuple(sequence)) for machine_id, sequence in machine_sequences.items()))
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_canonical_key_identifies_schedules(tmp_path, seed):
+    fjs = FlexibleJobSchedulingProblem(write_random_instance(tmp_path, seed, number_of_jobs=4, number_of_machines=3,
+                                                             max_ops_per_job=3), seed=seed, evaluation_cache_size=0)
+    solutions = fjs.get_random_solutions(300)
+    # swapping adjacent ops of different jobs on different machines gives another sequence of the same schedule
+    for solution in solutions[:50]:
+        ops = solution.to_struct()
+        for index in range(len(ops) - 1):
+            if ops[index][0] != ops[index + 1][0] and ops[index][2] != ops[index + 1][2]:
+                ops[index], ops[index + 1] = ops[index + 1], ops[index]
+                solutions.append(FjsSolution.from_struct(ops))
+                break
+
+    canonical_keys = FjsSolution.compute_canonical_keys(solutions)
+    schedules_by_key = dict()
+    keys_by_machine_sequences = dict()
+    for solution, canonical_key in zip(solutions, canonical_keys):
+        assert solution.canonical_key == canonical_key
+        schedule = sorted(fjs.decode_schedule(solution).tolist())
+        # same key, same schedule, and the other way around
+        assert schedules_by_key.setdefault(canonical_key, schedule) == schedule
+        assert keys_by_machine_sequences.setdefault(get_machine_sequences(solution), canonical_key) == canonical_key
+    assert len(schedules_by_key) == len(keys_by_machine_sequences)
+    assert len(schedules_by_key) < len(solutions)
+
+
+async def send_request(port: int, method: str, path: str, body: bytes = b'') -> tuple[int, bytes]:
+    # the service closes every connection after its response, so reading to EOF gets all of it
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(f'{method} {path} HTTP/1.1\r\nContent-Length: {len(body)}\r\n\r\n'.encode() + body)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    await writer.wait_closed()
+    head, _, response_body = response.partition(b'\r\n\r\n')
+    return int(head.split()[1]), response_body
+
+
+async def submit_job(port: int, request: dict) -> str:
+    status, body = await send_request(port, 'POST', '/jobs', json.dumps(request).encode())
+    assert status == 202
+    return json.loads(body)['job_id']
+
+
+async def get_events(port: int, job_id: str) -> list[dict]:
+    status, body = await send_request(port, 'GET', f'/jobs/{job_id}/events')
+    assert status == 200
+    return [json.loads(line) for line in body.splitlines()]
+
+
+async def wait_until_running(port: int, job_id: str):
+    while True:
+        _, body = await send_request(port, 'GET', f'/jobs/{job_id}')
+        if json.loads(body)['status'] == 'running':
+            return
+        await asyncio.sleep(0.05)
+
+
+def test_solver_service(tmp_path):
+    input_file_path = write_random_instance(tmp_path, 0)
+
+    async def exercise_service():
+        service = SolverService(port=0, workers=1, instance_directory=str(tmp_path / 'instances'))
+        await service.start()
+        try:
+            port = service.port
+            short_job = {'instance_path': input_file_path, 'number_of_iterations': 50, 'seed': 0}
+            long_job = {'instance_path': input_file_path, 'time_budget': 60, 'seed': 0}
+
+            events = await get_events(port, await submit_job(port, short_job))
+            assert [event['type'] for event in events[:3]] == ['queued', 'started', 'improvement']
+            assert events[-1]['type'] == 'finished'
+            assert events[-1]['completed_iterations'] <= 50
+            with open(input_file_path) as f:
+                events = await get_events(port, await submit_job(port, {'instance': f.read(), 'seed': 0,
+                                                                        'number_of_iterations': 50}))
+            assert events[-1]['type'] == 'finished'
+
+            # one worker, so the second job waits behind the first
+            running_job_id = await submit_job(port, long_job)
+            queued_job_id = await submit_job(port, long_job)
+            await wait_until_running(port, running_job_id)
+            status, body = await send_request(port, 'DELETE', f'/jobs/{queued_job_id}')
+            assert status == 202 and json.loads(body)['status'] == 'cancelled'
+            assert [event['type'] for event in await get_events(port, queued_job_id)] == ['queued', 'cancelled']
+            status, _ = await send_request(port, 'DELETE', f'/jobs/{running_job_id}')
+            assert status == 202
+            assert (await get_events(port, running_job_id))[-1]['type'] == 'cancelled'
+
+            # a dead worker fails its job and gets replaced
+            job_id = await submit_job(port, long_job)
+            await wait_until_running(port, job_id)
+            service.worker_processes[0].kill()
+            assert (await get_events(port, job_id))[-1]['type'] == 'failed'
+            assert (await get_events(port, await submit_job(port, short_job)))[-1]['type'] == 'finished'
+
+            for body in [b'not json', b'[1, 2]', b'{}', json.dumps({**short_job, 'no_such_parameter': 1}).encode(),
+                         json.dumps({'instance_id': '../escape'}).encode()]:
+                status, _ = await send_request(port, 'POST', '/jobs', body)
+                assert status == 400
+        finally:
+            await service.stop()
+
+    asyncio.run(exercise_service())